@@ -23,8 +23,15 @@ THE SOFTWARE.
 """
 
 import numpy as np
+import warnings
 
 from scipy.linalg import eigvals, block_diag, qz, norm, kron
+from scipy.sparse import (issparse, csr_matrix, block_diag as sp_block_diag,
+                          vstack as sp_vstack, hstack as sp_hstack,
+                          bmat as sp_bmat, eye as sp_eye)
+from scipy.sparse.linalg import (eigs, ArpackError, ArpackNoConvergence,
+                                 splu, onenormest, LinearOperator,
+                                 norm as sp_norm)
 from tabulate import tabulate
 from itertools import zip_longest, chain
 
@@ -39,6 +46,16 @@ from copy import deepcopy
 __all__ = ['Transfer', 'State', 'state_to_transfer', 'transfer_to_state',
            'transmission_zeros', 'concatenate_state_matrices']
 
+# Maximum number of restarts and the Krylov subspace dimension of the Arnoldi
+# iterations for the rightmost poles of the sparse models
+_arnoldi_max_restarts = 300
+_arnoldi_ncv = 40
+
+# Ratio of the Cayley shift to the geometric mean of the extreme pole moduli
+# and the relative tolerance of the Arnoldi iteration on the Cayley transform
+_cayley_shift_ratio = 10.
+_cayley_tol = 1e-6
+
 
 class Transfer:
     """
@@ -1574,6 +1591,25 @@ class State:
     the system continous time again and relevant properties are reset
     to continuous-time properties.
 
+    The zeros are computed when they are accessed for the first time.
+
+    The A, B, C matrices can also be given as ``scipy.sparse`` matrices
+    for large models. Then all three are stored in the CSR format and the
+    D matrix as a dense array. Only the rightmost poles of such models are
+    computed to decide the stability, via the Arnoldi iteration and, for
+    stiff continuous-time models, its Cayley transformed variant. Hence
+    the ``poles`` and ``zeros`` properties are not available. If neither
+    converges, a warning is emitted and the stability is undecided, i.e.,
+    ``_isstable`` is None. See ``dominant_poles()``. The arithmetic
+    operations, indexing and the frequency response work with the sparse
+    matrices. The functions that need dense matrices raise an error
+    instead of silently converting them.::
+
+        >>>> A = scipy.sparse.diags([1, -2, 1], [-1, 0, 1], shape=(500, 500))
+        >>>> G = State(A, np.eye(500, 1), np.eye(1, 500))
+        >>>> G._isstable
+        True
+
     Warning: A discrete time system needs a specified sampling period
     (and better a discretization method if known) because a model without
     a sampling period doesn't make sense for analysis. If you don't care,
@@ -1592,6 +1628,7 @@ class State:
         *abcd, self._shape, self._isgain = self.validate_arguments(a, b, c, d)
 
         self._a, self._b, self._c, self._d = abcd
+        self._issparse = issparse(self._a)
         self._p, self._m = self._shape
         self._n = None if self._isgain else self._a.shape[0]
 
@@ -1694,6 +1731,38 @@ class State:
         """
         return self._a, self._b, self._c, self._d
 
+    @property
+    def poles(self):
+        """
+        A read only property that holds the poles of the model. They are
+        computed at the first access. For the sparse models, only the
+        rightmost poles are computed to decide the stability hence this
+        property is not available. See ``dominant_poles()`` instead.
+        """
+        if self._issparse:
+            raise ValueError('The poles of sparse models are not computed. '
+                             'Only the rightmost poles are computed to '
+                             'check the stability. Use "dominant_poles" '
+                             'for a subset of the poles.')
+        if self._poles is None:
+            self._poles = eigvals(self._a)
+        return self._poles
+
+    @property
+    def zeros(self):
+        """
+        A read only property that holds the transmission zeros of the model.
+        They are computed at the first access. Not available for the sparse
+        models.
+        """
+        if self._issparse:
+            raise ValueError('The transmission zeros of sparse models are '
+                             'not computed.')
+        if self._zeros is None:
+            self._zeros = transmission_zeros(self._a, self._b, self._c,
+                                             self._d)
+        return self._zeros
+
     @property
     def DiscretizedWith(self):
         """
@@ -1795,47 +1864,19 @@ class State:
 
     @a.setter
     def a(self, value):
-        value = self.validate_arguments(
-            value,
-            np.zeros_like(self._b),
-            np.zeros_like(self._c),
-            np.zeros_like(self._d)
-            )[0]
-        self._a = value
-        self._recalc()
+        self._set_matrix(0, value)
 
     @b.setter
     def b(self, value):
-        value = self.validate_arguments(
-            np.zeros_like(self._a),
-            value,
-            np.zeros_like(self._c),
-            np.zeros_like(self._d)
-            )[1]
-        self._b = value
-        self._recalc()
+        self._set_matrix(1, value)
 
     @c.setter
     def c(self, value):
-        value = self.validate_arguments(
-            np.zeros_like(self._a),
-            np.zeros_like(self._b),
-            value,
-            np.zeros_like(self._d)
-            )[2]
-        self._c = value
-        self._recalc()
+        self._set_matrix(2, value)
 
     @d.setter
     def d(self, value):
-        value = self.validate_arguments(
-            np.zeros_like(self._a),
-            np.zeros_like(self._b),
-            np.zeros_like(self._c),
-            value
-            )[3]
-        self._d = value
-        self._recalc()
+        self._set_matrix(3, value)
 
     @SamplingPeriod.setter
     def SamplingPeriod(self, value):
@@ -1895,22 +1936,51 @@ class State:
             else:
                 self._PrewarpFrequency = value
 
+    def _set_matrix(self, index, value):
+        # Only the shape of the remaining matrices is needed for validation
+        abcd = [csr_matrix(x.shape) if issparse(x) else np.zeros_like(x)
+                for x in self.matrices]
+        abcd[index] = value
+        abcd = self.validate_arguments(*abcd)[:4]
+
+        # A sparse matrix turns the whole model into a sparse one
+        if issparse(abcd[index]) and not self._issparse:
+            self._a, self._b, self._c = [csr_matrix(x) for x in
+                                         self.matrices[:3]]
+            self._issparse = True
+
+        setattr(self, ('_a', '_b', '_c', '_d')[index], abcd[index])
+        self._recalc()
+
     def _recalc(self):
         if self._isgain:
-            self.poles = []
-            self.zeros = []
+            self._poles, self._zeros, self._rightmost = [], [], []
         else:
-            self.zeros = transmission_zeros(self._a, self._b, self._c, self._d)
-            self.poles = eigvals(self._a)
+            # The zeros are computed when they are accessed for the first
+            # time.
+            self._poles, self._zeros = None, None
+            if self._issparse:
+                # Only the rightmost poles decide the stability
+                self._rightmost = _rightmost_poles(self._a, self._rz == 'Z')
+                if self._rightmost is None:
+                    warnings.warn('The Arnoldi iterations did not converge '
+                                  'to the rightmost poles of the sparse '
+                                  'model hence its stability is undecided.',
+                                  RuntimeWarning)
+            else:
+                self._rightmost = self.poles
 
         self._set_stability()
         self._set_representation()
 
     def _set_stability(self):
-        if self._rz == 'Z':
-            self._isstable = all(1 > np.abs(self.poles))
+        # None marks the undecided stability of sparse models
+        if self._rightmost is None:
+            self._isstable = None
+        elif self._rz == 'Z':
+            self._isstable = all(1 > np.abs(self._rightmost))
         else:
-            self._isstable = all(0 > np.real(self.poles))
+            self._isstable = all(0 > np.real(self._rightmost))
 
     def _set_representation(self):
         self._repr_type = 'State'
@@ -1987,9 +2057,14 @@ class State:
                 # Now, we are sure that there are no empty arrays in the
                 # system matrices hence concatenation should be OK.
 
-                adda = block_diag(self._a, other.a)
-                addb = np.vstack((self._b, other.b))
-                addc = np.hstack((self._c, other.c))
+                if self._issparse or other._issparse:
+                    adda = sp_block_diag((self._a, other.a), format='csr')
+                    addb = sp_vstack((self._b, other.b), format='csr')
+                    addc = sp_hstack((self._c, other.c), format='csr')
+                else:
+                    adda = block_diag(self._a, other.a)
+                    addb = np.vstack((self._b, other.b))
+                    addc = np.hstack((self._c, other.c))
                 addd = self._d + other.d
                 return State(adda, addb, addc, addd)
 
@@ -2068,6 +2143,11 @@ class State:
                                                 other.shape))
 
             if isinstance(other, State):
+                if ((self._issparse or other._issparse) and
+                        not self._isSISO):
+                    raise ValueError('Elementwise multiplication of MIMO '
+                                     'sparse models is not supported.')
+
                 # First get the static gain case out of the way.
                 if self._isgain:
                     if other._isgain:
@@ -2259,11 +2339,20 @@ class State:
         # 4, 5, 6
         if isinstance(s, State):
             # 6
+            multd = self._d @ other.d
+            if self._issparse or other._issparse:
+                a1, b1, c1, d1 = [csr_matrix(x) for x in self.matrices]
+                a2, b2, c2, d2 = [csr_matrix(x) for x in other.matrices]
+                multa = sp_bmat([[a1, b1 @ c2], [None, a2]], format='csr')
+                multb = sp_vstack((b1 @ d2, b2), format='csr')
+                multc = sp_hstack((c1, d1 @ c2), format='csr')
+                return State(multa, multb, multc, multd, dt=self._dt)
+
+            # The states of the right factor drive the left one via b c
             multa = block_diag(self._a, other.a)
-            multa[self._n:, :other.a.shape[0]] = self._b @ other.c
+            multa[:self._n, self._n:] = self._b @ other.c
             multb = np.vstack((self._b @ other.d, other.b))
             multc = np.hstack((self._c, self._d @ other.c))
-            multd = self._d @ other.d
             return State(multa, multb, multc, multd, dt=self._dt)
 
         if isinstance(s, np.ndarray):
@@ -2350,6 +2439,13 @@ class State:
         else:
             rows_of_c, cols_of_b = num_or_slice, slice(None, None, None)
 
+        # Sparse matrices are always 2D, hence no fancy indexing is needed
+        if self._issparse:
+            rc = np.atleast_1d(np.arange(self.NumberOfOutputs)[rows_of_c])
+            cb = np.atleast_1d(np.arange(self.NumberOfInputs)[cols_of_b])
+            return State(self._a, self._b[:, cb], self._c[rc, :],
+                         self._d[np.ix_(rc, cb)], dt=self._dt)
+
         # Handle the ndim losing behavior of NumPy indexing
         rc = np.atleast_2d(np.arange(self.NumberOfOutputs)[rows_of_c])
         cb = np.arange(self.NumberOfInputs)[cols_of_b]
@@ -2393,6 +2489,20 @@ class State:
         if self._isgain:
             desc_text += '\n{}x{} Static Gain\n'.format(self.NumberOfOutputs,
                                                         self.NumberOfInputs)
+        elif self._issparse:
+            desc_text += (' {0} input(s) and {1} output(s)\n Sparse model '
+                          'with {2} states ({3} nonzeros in A)\n'
+                          ''.format(self.NumberOfInputs, self.NumberOfOutputs,
+                                    self.NumberOfStates, self._a.nnz))
+
+            if self._rightmost is None:
+                desc_text += '\n The rightmost poles could not be computed.'
+            else:
+                desc_text += '\n' + tabulate(zip(np.real(self._rightmost),
+                                                 np.imag(self._rightmost)),
+                                             headers=['Rightmost poles(real)',
+                                                      'Rightmost poles(imag)']
+                                             )
         else:
             desc_text += ' {0} input(s) and {1} output(s)\n'.format(
                                                         self.NumberOfInputs,
@@ -2440,6 +2550,8 @@ class State:
         State() instance are valid and compatible.
 
         It also checks if the lists are 2D numpy.array'able entries.
+        Sparse matrices are converted to the CSR format instead, and if
+        any of A, B, C is sparse then all three are returned as sparse.
 
         """
 
@@ -2476,11 +2588,19 @@ class State:
                 None_flags[abcd_index] = True
                 continue
 
+            # Sparse matrices are kept as they are, only the format is fixed
+            if issparse(abcd):
+                if verbose:
+                    print('{0} is a sparse matrix'
+                          ''.format(entrytext[abcd_index]))
+                returned_abcd_list[abcd_index] = csr_matrix(abcd, dtype=float)
+                continue
+
             # Check for obvious choices
             if not isinstance(abcd, possible_types):
                 raise TypeError('{0} matrix should be, regardless of the shape'
-                                ', an int, float, list or,\n'
-                                'much better, a properly typed 2D Numpy '
+                                ', an int, float, list, a sparse matrix '
+                                'or,\nmuch better, a properly typed 2D Numpy '
                                 'array. Instead I found a {1} object.'
                                 ''.format(entrytext[abcd_index],
                                           type(abcd).__qualname__))
@@ -2521,6 +2641,10 @@ class State:
 
         [a, b, c, d] = returned_abcd_list
 
+        # The feedthrough matrix is always small hence kept dense
+        if issparse(d):
+            d = d.toarray()
+
         if not Gain_flag:
             # Here check everything is compatible unless we have a
             # static gain
@@ -2569,6 +2693,10 @@ class State:
                                      'but got ({1[0]:d},{1[1]:d}).'
                                      ''.format(user_shape, d.shape))
 
+            # If any of A, B, C is sparse then all of them are stored sparse
+            if any(issparse(x) for x in (a, b, c)):
+                a, b, c = [csr_matrix(x) for x in (a, b, c)]
+
             return a, b, c, d, user_shape, Gain_flag
         else:
             return a, b, c, d, d.shape, Gain_flag
@@ -2697,6 +2825,126 @@ def _investigate_other(self_, other_, method_):
     return other_, other_type
 
 
+def _rightmost_poles(A, discrete=False, k=6):
+    '''
+    Computes the k rightmost eigenvalues of A, or the ones with the largest
+    moduli for discrete-time models. These are sufficient to decide the
+    stability of the model.
+
+    For dense matrices, the full spectrum is computed since the dense
+    Arnoldi iteration is rarely cheaper and can't be trusted to converge.
+    For sparse matrices, the implicitly restarted Arnoldi iteration of
+    ARPACK is used which only needs products with A. For stiff
+    continuous-time models, the rightmost eigenvalues are clustered
+    relative to the fast ones and the iteration typically doesn't converge.
+    Then the eigenvalues of the Cayley transform
+
+    .. math::
+
+        C = (A - sI)^{-1}(A + sI) = I + 2s(A - sI)^{-1}
+
+    with the largest moduli are computed instead. The transform maps the
+    right half plane outside and the left half plane inside of the unit
+    circle hence an unstable eigenvalue, wherever it is, dominates the
+    stable ones. The shift s is placed above the geometric mean of the
+    estimated smallest and largest eigenvalue moduli such that the slow
+    eigenvalues are separated from the fast ones.
+
+    If an iteration doesn't converge to all k eigenvalues but some of the
+    converged ones are unstable, only these are returned since they
+    already decide the stability.
+
+    Parameters
+    ----------
+    A : ndarray, sparse matrix
+        The square system matrix
+    discrete : bool, optional
+        If True, the largest moduli are sought instead of the largest real
+        parts.
+    k : int, optional
+        The number of eigenvalues
+
+    Returns
+    -------
+    poles : ndarray, None
+        The computed eigenvalues sorted with respect to the real parts, or
+        the moduli, in descending order. None if the iterations did not
+        converge for a sparse A.
+
+    '''
+    n = A.shape[0]
+    # ARPACK needs k < n - 1 hence tiny matrices are handled densely
+    if not issparse(A) or n < k + 2:
+        poles = eigvals(A.toarray() if issparse(A) else A)
+    else:
+        ncv = min(n, max(2*k + 1, _arnoldi_ncv))
+        try:
+            poles = eigs(A, k=k, which='LM' if discrete else 'LR', ncv=ncv,
+                         maxiter=_arnoldi_max_restarts,
+                         return_eigenvectors=False)
+        except ArpackError as err:
+            poles = _converged_unstable_poles(err, discrete)
+            if poles is None and not discrete:
+                poles = _cayley_rightmost_poles(A, k, ncv)
+            if poles is None:
+                return None
+
+    order = np.argsort(-np.abs(poles) if discrete else -poles.real,
+                       kind='stable')
+    return poles[order][:k]
+
+
+def _cayley_rightmost_poles(A, k, ncv):
+    '''
+    Computes the k eigenvalues of a sparse A that are mapped to the largest
+    moduli by the Cayley transform. See ``_rightmost_poles()``.
+
+    Returns None if A, or A - sI, is singular, or if the Arnoldi iteration
+    does not converge or can't separate the moduli from the unit circle
+    at its tolerance.
+    '''
+    n = A.shape[0]
+    A = A.tocsc()
+    try:
+        lu = splu(A)
+        # The smallest eigenvalue modulus is bounded by the inverse norm
+        inv = LinearOperator((n, n), matvec=lu.solve,
+                             rmatvec=lambda x: lu.solve(x, 'T'), dtype=float)
+        s = _cayley_shift_ratio * np.sqrt(sp_norm(A, 1) / onenormest(inv))
+        lu_s = splu((A - s*sp_eye(n, format='csc')).tocsc())
+    except RuntimeError:
+        # SuperLU reports the exact singularity
+        return None
+
+    C = LinearOperator((n, n), matvec=lambda x: x + 2*s*lu_s.solve(x),
+                       dtype=float)
+    try:
+        mu = eigs(C, k=k, which='LM', ncv=ncv, tol=_cayley_tol,
+                  maxiter=_arnoldi_max_restarts, return_eigenvectors=False)
+    except ArpackError as err:
+        mu = _converged_unstable_poles(err, True)
+        if mu is None:
+            return None
+
+    if np.any(np.abs(np.abs(mu) - 1) <= _cayley_tol):
+        return None
+
+    return s * (mu + 1) / (mu - 1)
+
+
+def _converged_unstable_poles(err, discrete=False):
+    '''
+    Returns the unstable eigenvalues among the converged ones of a failed
+    ARPACK iteration, or None if there is none.
+    '''
+    if not isinstance(err, ArpackNoConvergence):
+        return None
+
+    ev = np.asarray(err.eigenvalues)
+    ev = ev[np.abs(ev) >= 1] if discrete else ev[ev.real >= 0]
+    return ev if ev.size else None
+
+
 def _pole_properties(poles, dt=None, output_data=False):
     '''
     This function provides the natural frequency, damping and time constant
@@ -2801,6 +3049,7 @@ def state_to_transfer(*state_or_abcd, output='system'):
     # If a discrete time system is given this will be modified to the
     # SamplingPeriod later.
     ZR = None
+    _reject_sparse(state_or_abcd[0], 'state_to_transfer')
     system_given, validated_matrices = _state_or_abcd(state_or_abcd[0], 4)
 
     if system_given:
@@ -3266,6 +3515,7 @@ def _state_or_abcd(arg, n=4):
     try:
         repr_str = arg._repr_type
         if repr_str == 'State':
+            _reject_sparse(arg)
             return True, None
         else:
             raise TypeError('The argument needs to be a State model '
@@ -3315,9 +3565,36 @@ def _state_or_abcd(arg, n=4):
                         'a State() object. The argument is of the type "{}"'
                         ''.format(type(arg).__qualname__))
 
+    if any(issparse(x) for x in (returned_args if n != 1 else
+                                 (returned_args,))):
+        raise ValueError('This function does not support sparse matrices. '
+                         'Convert them to arrays explicitly if this is '
+                         'intended.')
+
     return system_or_not, returned_args
 
 
+def _reject_sparse(G, name=None):
+    """
+    Raises a ValueError if G is a sparse State() model. This is used by the
+    functions that need the dense system matrices such that the matrices
+    are not silently converted to dense arrays.
+
+    Parameters
+    ----------
+    G : State, Transfer
+        The model to be checked
+    name : str, optional
+        The name of the function to be reported in the error message.
+
+    """
+    if getattr(G, '_issparse', False):
+        raise ValueError('{0} does not support sparse State models. Convert '
+                         'the system matrices to arrays explicitly if this '
+                         'is intended.'.format('This function' if name is None
+                                               else '"{0}"'.format(name)))
+
+
 def concatenate_state_matrices(G):
     """
     Takes a State() model as input and returns the A, B, C, D matrices
@@ -3341,4 +3618,6 @@ def concatenate_state_matrices(G):
                         'instead.'.format(type(G).__name__))
     if G._isgain:
         return G.d
+    if G._issparse:
+        return sp_bmat([[G.a, G.b], [G.c, G.d]], format='csr')
     return np.vstack((np.hstack((G.a, G.b)), np.hstack((G.c, G.d))))
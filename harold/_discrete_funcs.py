@@ -25,7 +25,8 @@ import numpy as np
 from numpy.linalg import cond
 from scipy.linalg import expm, logm, kron, solve
 
-from ._classes import Transfer, State, transfer_to_state, state_to_transfer
+from ._classes import (Transfer, State, transfer_to_state, state_to_transfer,
+                       _reject_sparse)
 from ._global_constants import _KnownDiscretizationMethods
 from ._aux_linalg import matrix_slice
 
@@ -37,6 +38,8 @@ def discretize(G, dt, method='tustin', PrewarpAt=0., q=None):
         raise TypeError('I can only convert State or Transfer objects but I '
                         'found a \"{0}\" object.'.format(type(G).__name__)
                         )
+    _reject_sparse(G, 'discretize')
+
     if G.SamplingSet == 'Z':
         raise TypeError('The argument is already modeled as a '
                         'discrete-time system.')
@@ -229,6 +232,8 @@ def undiscretize(G, use_method=None):
                         'function or a state\nspace model.'
                         )
 
+    _reject_sparse(G, 'undiscretize')
+
     if G.SamplingSet == 'R':
         raise TypeError('The argument is already modeled as a '
                         'continuous time system.')
@@ -23,14 +23,36 @@ THE SOFTWARE.
 """
 import numpy as np
 import matplotlib.pyplot as plt
+from scipy.linalg import eig, solve, hessenberg
+from scipy.sparse import identity
+from scipy.sparse.linalg import splu, norm as sparse_norm
 
 from ._classes import State, Transfer
 from ._system_funcs import staircase, minimal_realization
 
-__all__ = ['frequency_response', 'bode_plot', 'nyquist_plot']
+__all__ = ['frequency_response', 'frequency_response_chunks',
+           'FrequencyResponsePlan', 'bode_plot', 'nyquist_plot']
 
+# Memory budget of the batched frequency response working arrays
+_freq_chunk_bytes = 2**23
 
-def _State_frequency_response_generator(mA, mb, sc, f):
+# Eigenvector condition number above which the modal engine is not trusted.
+# The modal sum loses about log10(kappa) digits to cancellation whereas the
+# Hessenberg elimination is backward stable, hence the limit is kept low.
+_modal_cond_limit = 1e4
+
+# Polynomial degree above which the Transfer entries are evaluated via roots
+_horner_degree_limit = 16
+
+# Damping ratio below which the poles are seeded into the adaptive grids
+_adaptive_damping_limit = 0.5
+
+# FFT length per grid point above which the FFT path is not used by default
+_fft_oversampling_limit = 8
+
+
+def _State_frequency_response_generator(mA, mb, sc, f, chunk_size=None,
+                                        dt=None):
     """
     This is the low level function to generate the frequency response
     values for a state space representation. The realization must be
@@ -38,6 +60,9 @@ def _State_frequency_response_generator(mA, mb, sc, f):
 
     Implements the inner loop of Misra, Patel SIMAX 1988 Algo. 3.1 in
     batches of B matrices instead of looping over every column of B.
+    Moreover, the elimination is performed for a chunk of frequencies at
+    once on a (n, n+m, chunk) array such that the only remaining Python
+    loop is over the Hessenberg rows.
 
     Parameters
     ----------
@@ -50,83 +75,1054 @@ def _State_frequency_response_generator(mA, mb, sc, f):
         The only nonzero coefficient of the o'ble-Hessenberg form
     f  : array_like
         The frequency grid
+    chunk_size : int, optional
+        The number of frequencies that are processed at once. If omitted,
+        it is chosen such that the working array stays within
+        ``_freq_chunk_bytes``.
+    dt : float, optional
+        The sampling period of a discrete-time model. See
+        ``_frequency_points``.
 
     Returns
     -------
     r  : complex-valued numpy array
 
     """
-
+    f = _frequency_points(f, dt)
     nn, m = mA.shape[0], mb.shape[1]
     r = np.empty((f.size, m), dtype=complex)
     Ab = np.hstack((-mA, mb)).astype(complex)
-    X = np.empty_like(Ab)
 
-    imag_indices = np.diag_indices(nn)
+    if chunk_size is None:
+        chunk_size = _freq_chunk_length(Ab.size)
 
-    for ind, val in enumerate(f):
-        X[:, :] = Ab  # Working copy
-        X[imag_indices] += val*1j
+    # The frequencies are kept on the last axis such that the row
+    # operations below work on contiguous memory.
+    imag_indices = np.diag_indices(nn) + (slice(None),)
+
+    for cs in range(0, f.size, chunk_size):
+        fc = f[cs:cs+chunk_size]
+        X = np.empty(Ab.shape + (fc.size,), dtype=complex)
+        X[...] = Ab[:, :, None]  # Working copies
+        X[imag_indices] += fc
+        # Rows above x are already eliminated hence only the entries
+        # starting from the subdiagonal need to be updated.
         for x in range(1, nn):
-            X[x] -= (X[x, x-1] / X[x-1, x-1]) * X[x-1]
+            X[x, x-1:] -= (X[x, x-1] / X[x-1, x-1]) * X[x-1, x-1:]
 
-        r[ind, :] = X[-1, -m:]/X[-1, -1-m]
+        r[cs:cs+chunk_size, :] = (X[-1, -m:]/X[-1, -1-m]).T
 
     return r*sc
 
 
-def frequency_response(G, custom_grid=None, high=None, low=None, samples=None,
-                       custom_logspace=None,
-                       input_freq_unit='Hz', output_freq_unit='Hz'):
+def _frequency_points(f, dt=None):
     """
-    Computes the frequency response matrix of a State() or Transfer()
-    object.
+    Maps the frequency grid to the points on which the transfer function
+    is evaluated, i.e., :math:`s = j\\omega` for continuous-time and
+    :math:`z = e^{j\\omega dt}` for discrete-time models.
+
+    Parameters
+    ----------
+    f  : array_like
+        The frequency grid
+    dt : float, optional
+        The sampling period of a discrete-time model. If None, the model
+        is assumed to be continuous-time.
+
+    Returns
+    -------
+    s  : complex-valued numpy array
+        The evaluation points
+
+    """
+    f = np.asarray(f, dtype=float).ravel()
+    if dt is None:
+        return f*1j
+
+    return np.exp(f*(1j*dt))
 
-    The State representations are always checked for minimality and,
-    if any, unobservable/uncontrollable modes are removed.
+
+def _freq_chunk_length(row_size):
+    """
+    Computes the number of frequencies that can be processed at once
+    such that the complex-valued working array of ``row_size`` entries
+    per frequency doesn't exceed ``_freq_chunk_bytes``.
+    """
+    return max(1, _freq_chunk_bytes // (16 * max(1, row_size)))
+
+
+def _State_frequency_response_hessenberg(mA, mb, mc, f, chunk_size=None,
+                                         dt=None):
+    """
+    This is the low level function to generate the frequency response
+    values of a MIMO state space representation. The realization must be
+    in the upper Hessenberg form, e.g., via ``scipy.linalg.hessenberg``.
+
+    Instead of reducing every row of C separately to the observer-
+    Hessenberg form, :math:`[sI-A | B]` is triangularized for a chunk of
+    frequencies at once via the Hessenberg elimination with adjacent row
+    interchanges. Then the back substitution gives
+    :math:`(sI-A)^{-1}B` for every frequency of the chunk and a single
+    product with C completes the response of all outputs and inputs.
 
     Parameters
     ----------
-    G: State of Transfer
-        The realization for which the frequency response is computed
-    custom_grid : array_like
-        An array of sorted positive numbers denoting the frequencies
-    high : float
-        Power of 10 denoting the maximum frequency. If a discrete
-        realization is given this is overridden by the Nyquist frequency.
-    low : float
-        Power of 10 denoting the minimum frequency.
-    samples: int
-        Number of samples to be created between `high` and `low`
-    custom_logspace: 3-tuple
 
+    mA : array_like {n x n}
+        The A matrix of the realization in the upper Hessenberg form
+    mb : array_like {n x m}
+        The B matrix of the realization
+    mc : array_like {p x n}
+        The C matrix of the realization
+    f  : array_like
+        The frequency grid
+    chunk_size : int, optional
+        The number of frequencies that are processed at once. If omitted,
+        it is chosen such that the working array stays within
+        ``_freq_chunk_bytes``.
+    dt : float, optional
+        The sampling period of a discrete-time model. See
+        ``_frequency_points``.
+
+    Returns
+    -------
+    r  : complex-valued numpy array
+        The frequency response with the shape (p, m, len(f))
+
+    """
+    f = _frequency_points(f, dt)
+    nn, m, p = mA.shape[0], mb.shape[1], mc.shape[0]
+    r = np.empty((p, m, f.size), dtype=complex)
+    Ab = np.hstack((-mA, mb)).astype(complex)
+
+    if chunk_size is None:
+        chunk_size = _freq_chunk_length(Ab.size + nn*m)
+
+    imag_indices = np.diag_indices(nn) + (slice(None),)
+
+    for cs in range(0, f.size, chunk_size):
+        fc = f[cs:cs+chunk_size]
+        X = np.empty(Ab.shape + (fc.size,), dtype=complex)
+        X[...] = Ab[:, :, None]
+        X[imag_indices] += fc
+
+        for x in range(1, nn):
+            # Swap the rows if the subdiagonal entry is bigger
+            piv = np.abs(X[x, x-1]) > np.abs(X[x-1, x-1])
+            if np.any(piv):
+                tmp = X[x-1, x-1:, piv]
+                X[x-1, x-1:, piv] = X[x, x-1:, piv]
+                X[x, x-1:, piv] = tmp
+            X[x, x-1:] -= (X[x, x-1] / X[x-1, x-1]) * X[x-1, x-1:]
+
+        # Back substitution on the upper triangular part
+        Z = np.empty((nn, m, fc.size), dtype=complex)
+        for x in range(nn-1, -1, -1):
+            Z[x] = (X[x, nn:] - np.einsum('jk,jmk->mk',
+                                          X[x, x+1:nn],
+                                          Z[x+1:])) / X[x, x]
+
+        r[:, :, cs:cs+chunk_size] = np.einsum('pj,jmk->pmk', mc, Z)
+
+    return r
+
+
+def _State_frequency_response_modal(lam, res, f, chunk_size=None,
+                                    dt=None):
+    """
+    This is the low level function to generate the frequency response
+    values of a state space representation from its eigendecomposition.
+
+    If :math:`A = V \\Lambda V^{-1}` then the response can be written as
+    the sum of the modal contributions
+
+    .. math::
+
+        C(sI-A)^{-1}B = \\sum_{k=1}^{n} \\frac{R_k}{s - \\lambda_k}
+
+    with the residue matrices :math:`R_k = (CV)_{:,k}(V^{-1}B)_{k,:}`.
+    Hence, each frequency costs only a product of the (p*m, n) residues
+    with the resolvent values which is performed for a chunk of
+    frequencies at once.
+
+    Parameters
+    ----------
+    lam : array_like
+        The eigenvalues of the A matrix
+    res : array_like {p x m x n}
+        The residue matrices of each eigenvalue stacked on the last axis
+    f  : array_like
+        The frequency grid
+    chunk_size : int, optional
+        The number of frequencies that are processed at once. If omitted,
+        it is chosen such that the working array stays within
+        ``_freq_chunk_bytes``.
+    dt : float, optional
+        The sampling period of a discrete-time model. See
+        ``_frequency_points``.
+
+    Returns
+    -------
+    r  : complex-valued numpy array
+        The frequency response with the shape (p, m, len(f))
+
+    """
+    f = _frequency_points(f, dt)
+    p, m, nn = res.shape
+    r = np.empty((p*m, f.size), dtype=complex)
+    res_mat = res.reshape(p*m, nn)
+
+    if chunk_size is None:
+        chunk_size = _freq_chunk_length(nn)
+
+    for cs in range(0, f.size, chunk_size):
+        fc = f[cs:cs+chunk_size]
+        r[:, cs:cs+chunk_size] = res_mat @ (1 / (fc - lam[:, None]))
+
+    return r.reshape(p, m, f.size)
+
+
+def _State_frequency_response_sparse(mA, mb, mc, f, dt=None):
+    """
+    This is the low level function to generate the frequency response
+    values of a state space representation with sparse system matrices.
+
+    For every frequency, the sparse LU decomposition of :math:`sI-A` is
+    computed via SuperLU and :math:`C(sI-A)^{-1}B` is obtained from the
+    triangular solves with the columns of B. Hence the cost is governed by
+    the fill-in of the factors and no dense n x n array is formed.
+
+    Parameters
+    ----------
+
+    mA : sparse matrix {n x n}
+        The A matrix of the realization in the CSC format
+    mb : array_like {n x m}
+        The B matrix of the realization
+    mc : sparse matrix {p x n}
+        The C matrix of the realization
+    f  : array_like
+        The frequency grid
+    dt : float, optional
+        The sampling period of a discrete-time model. See
+        ``_frequency_points``.
+
+    Returns
+    -------
+    r  : complex-valued numpy array
+        The frequency response with the shape (p, m, len(f))
+
+    """
+    f = _frequency_points(f, dt)
+    nn, m, p = mA.shape[0], mb.shape[1], mc.shape[0]
+    r = np.empty((p, m, f.size), dtype=complex)
+    eye = identity(nn, dtype=complex, format='csc')
+    mb = mb.astype(complex)
+
+    for x, s in enumerate(f):
+        r[:, :, x] = mc @ splu((s*eye - mA).tocsc()).solve(mb)
+
+    return r
+
+
+def _State_modal_data(A, B, C):
+    """
+    Computes the eigendecomposition of A and the residue matrices
+    needed for the modal frequency response engine.
+
+    Returns
+    -------
+    lam : ndarray
+        Eigenvalues of A
+    res : ndarray
+        The (p, m, n) array of residue matrices
+    kappa : float
+        The condition number of the eigenvector matrix. For defective or
+        nearly defective A matrices, this is infinity.
+
+    """
+    lam, V = eig(A)
+    kappa = np.linalg.cond(V)
+    if not np.isfinite(kappa) or kappa > 1/np.finfo(float).eps:
+        return lam, None, np.inf
+
+    cv = C @ V
+    vb = solve(V, B)
+    res = cv[:, None, :] * vb.T[None, :, :]
+    return lam, res, kappa
+
+
+def _State_frequency_engine(A, B, C, engine='auto'):
+    """
+    Selects the frequency response engine of a State realization.
+
+    For the 'auto' option, the modal engine is selected if the
+    eigenvector matrix of A has a condition number less than
+    ``_modal_cond_limit`` since the accuracy of the modal sum degrades
+    proportional to it. Otherwise, the Hessenberg elimination is used such
+    that moderately nonnormal models are not evaluated with a few digits
+    less than the Hessenberg engine would give.
+
+    Returns
+    -------
+    engine : str
+        Either 'modal' or 'hessenberg'
+    modal_data : tuple, None
+        If the modal engine is selected, the eigenvalues and the residue
+        matrices. Otherwise None.
+
+    """
+    if engine == 'hessenberg':
+        return engine, None
+
+    lam, res, kappa = _State_modal_data(A, B, C)
+
+    if engine == 'modal':
+        if res is None:
+            raise ValueError('The A matrix is not diagonalizable hence '
+                             'the modal engine can not be used.')
+        return engine, (lam, res)
+
+    if kappa < _modal_cond_limit:
+        return 'modal', (lam, res)
+
+    return 'hessenberg', None
+
+
+def _Transfer_frequency_data(num, den, discrete=False):
+    """
+    Prepares the data of a Transfer representation for the
+    ``_Transfer_frequency_response`` evaluations.
+
+    All numerators and denominators are padded with leading zeros into
+    (k, d+1) coefficient arrays except the entries with degrees higher
+    than ``_horner_degree_limit``. These lose accuracy in the coefficient
+    form hence their zeros, poles and gains are stored instead. On the
+    unit circle, the coefficient form doesn't suffer from the growth of
+    the powers hence the discrete-time entries are always kept in the
+    coefficient form.
+
+    Parameters
+    ----------
+    num : list of lists of 2D arrays
+        The numerator entries of the representation
+    den : list of lists of 2D arrays
+        The denominator entries of the representation
+    discrete : bool, optional
+        If True, all entries are stored in the coefficient form.
+
+    Returns
+    -------
+    tf_data : tuple
+        The shape, the masks of the Horner/root entries, the padded
+        coefficient arrays and the NaN-padded zeros, poles with the gains.
+
+    """
+    p, m = len(num), len(num[0])
+    nums = [np.atleast_1d(np.squeeze(x)) for row in num for x in row]
+    dens = [np.atleast_1d(np.squeeze(x)) for row in den for x in row]
+    degs = np.array([max(x.size, y.size) - 1 for x, y in zip(nums, dens)])
+    by_roots = (degs > _horner_degree_limit) & (not discrete)
+    by_horner = ~by_roots
+    nc, dc, zz, pp, k = (None,)*5
+
+    if np.any(by_horner):
+        d = np.max(degs[by_horner]) + 1
+        nc = np.zeros((np.count_nonzero(by_horner), d))
+        dc = np.zeros_like(nc)
+        for ind, x in enumerate(np.flatnonzero(by_horner)):
+            nc[ind, d - nums[x].size:] = nums[x]
+            dc[ind, d - dens[x].size:] = dens[x]
+
+    if np.any(by_roots):
+        ents = np.flatnonzero(by_roots)
+        # Pad with NaNs such that nansum skips the dummy factors
+        zs = [np.roots(nums[x]) for x in ents]
+        ps = [np.roots(dens[x]) for x in ents]
+        zz = np.full((ents.size, max(x.size for x in zs)), np.nan,
+                     dtype=complex)
+        pp = np.full((ents.size, max(x.size for x in ps)), np.nan,
+                     dtype=complex)
+        for ind, (z, pl) in enumerate(zip(zs, ps)):
+            zz[ind, :z.size] = z
+            pp[ind, :pl.size] = pl
+
+        k = np.array([nums[x][np.flatnonzero(nums[x])[0]] /
+                      dens[x][np.flatnonzero(dens[x])[0]]
+                      if np.any(nums[x]) else 0. for x in ents])
+
+    return (p, m), by_horner, by_roots, nc, dc, zz, pp, k
+
+
+def _Transfer_frequency_response(tf_data, f, chunk_size=None, dt=None):
+    """
+    This is the low level function to generate the frequency response
+    values of a Transfer representation.
+
+    Every entry in the coefficient form is evaluated on a chunk of
+    frequencies at once with a single Horner pass over the coefficients.
+    The remaining entries are evaluated in the pole/zero product form
+
+    .. math::
+
+        k\\frac{\\prod_i (s-z_i)}{\\prod_j (s-p_j)}
+
+    computed as a sum of logarithms to avoid overflows.
+
+    Parameters
+    ----------
+    tf_data : tuple
+        The output of ``_Transfer_frequency_data``
+    f  : array_like
+        The frequency grid
+    chunk_size : int, optional
+        The number of frequencies that are processed at once. If omitted,
+        it is chosen such that the working array stays within
+        ``_freq_chunk_bytes``.
+    dt : float, optional
+        The sampling period of a discrete-time model. See
+        ``_frequency_points``.
+
+    Returns
+    -------
+    r  : complex-valued numpy array
+        The frequency response with the shape (p, m, len(f))
+
+    """
+    f = _frequency_points(f, dt)
+    (p, m), by_horner, by_roots, nc, dc, zz, pp, k = tf_data
+    r = np.empty((p*m, f.size), dtype=complex)
+
+    if chunk_size is None:
+        chunk_size = _freq_chunk_length(2*p*m)
+
+    if nc is not None:
+        for cs in range(0, f.size, chunk_size):
+            iw = f[cs:cs+chunk_size]
+            n_val = np.zeros((nc.shape[0], iw.size), dtype=complex)
+            d_val = np.zeros_like(n_val)
+            for x in range(nc.shape[1]):
+                n_val *= iw
+                n_val += nc[:, [x]]
+                d_val *= iw
+                d_val += dc[:, [x]]
+            r[by_horner, cs:cs+chunk_size] = n_val / d_val
+
+    if zz is not None:
+        for cs in range(0, f.size, chunk_size):
+            iw = f[cs:cs+chunk_size]
+            with np.errstate(divide='ignore'):
+                log_val = (np.nansum(np.log(iw - zz[:, :, None]), axis=1) -
+                           np.nansum(np.log(iw - pp[:, :, None]), axis=1))
+            r[by_roots, cs:cs+chunk_size] = k[:, None] * np.exp(log_val)
+
+    return r.reshape(p, m, f.size)
+
+
+def _fft_grid(f, dt):
+    """
+    Checks whether the frequency grid is a uniform grid that coincides
+    with the FFT bins of some length on the unit circle, i.e.,
+
+    .. math::
+
+        \\omega_k dt = \\frac{2\\pi (k_0 + k)}{M}, \\quad k=0,\\ldots,N-1
+
+    for some integers :math:`M` and :math:`k_0`.
+
+    Parameters
+    ----------
+    f  : array_like
+        The frequency grid
+    dt : float
+        The sampling period
+
+    Returns
+    -------
+    fft_data : tuple, None
+        The FFT length :math:`M` and the bin indices of the grid points. If
+        the grid is not uniform or not on the bins then None.
+
+    """
+    f = np.asarray(f, dtype=float).ravel()
+    if f.size < 2:
+        return None
+
+    df = (f[-1] - f[0]) / (f.size - 1)
+    if df <= 0 or not np.allclose(np.diff(f), df, rtol=1e-9, atol=0.):
+        return None
+
+    nfft, k0 = 2*np.pi/(df*dt), f[0]/df
+    if not (np.isclose(nfft, np.round(nfft), rtol=1e-9, atol=1e-9) and
+            np.isclose(k0, np.round(k0), rtol=1e-9, atol=1e-9)):
+        return None
+
+    nfft = int(np.round(nfft))
+    return nfft, (int(np.round(k0)) + np.arange(f.size)) % nfft
+
+
+def _Transfer_frequency_response_fft(tf_data, fft_data):
+    """
+    This is the low level function to generate the frequency response
+    values of a discrete-time Transfer representation on the FFT bins.
+
+    For a numerator and a denominator padded to the same length
+    :math:`d`, the common factor :math:`z^{d-1}` cancels out and
+
+    .. math::
+
+        G(e^{j\\omega_k dt}) = \\frac{\\sum_i n_i e^{-j 2\\pi ik/M}}
+                                {\\sum_i d_i e^{-j 2\\pi ik/M}}
+
+    which is the ratio of the length-M FFTs of the coefficient arrays.
+    All entries are transformed at once as the rows of the padded
+    coefficient arrays. If the coefficients are longer than :math:`M`,
+    they are folded modulo :math:`M` first since :math:`z^M = 1` on the
+    bins.
+
+    Parameters
+    ----------
+    tf_data : tuple
+        The output of ``_Transfer_frequency_data`` with ``discrete=True``
+    fft_data : tuple
+        The output of ``_fft_grid``
+
+    Returns
+    -------
+    r  : complex-valued numpy array
+        The frequency response with the shape (p, m, number of bins)
+
+    """
+    (p, m), _, _, nc, dc = tf_data[:5]
+    nfft, bins = fft_data
+    coefs = np.vstack((nc, dc))
+
+    if coefs.shape[1] > nfft:
+        fold = -(-coefs.shape[1] // nfft) * nfft
+        coefs = np.hstack((coefs, np.zeros((coefs.shape[0],
+                                            fold - coefs.shape[1]))))
+        coefs = coefs.reshape(coefs.shape[0], -1, nfft).sum(axis=1)
+
+    # Real coefficients have Hermitian spectra hence the half suffices
+    if np.all(bins <= nfft // 2):
+        vals = np.fft.rfft(coefs, n=nfft, axis=1)[:, bins]
+    else:
+        vals = np.fft.fft(coefs, n=nfft, axis=1)[:, bins]
+
+    k = nc.shape[0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = vals[:k] / vals[k:]
+
+    return r.reshape(p, m, bins.size)
+
+
+def _czt(x, m, dw, a0):
+    """
+    Computes the chirp-z transform of the rows of x on the unit circle
+    arc :math:`z_k = e^{j(a_0 + k\\Delta\\omega)}, k=0,\\ldots,m-1`, i.e.,
+
+    .. math::
+
+        X_k = \\sum_{i=0}^{n-1} x_i z_k^{-i}
+
+    via Bluestein's algorithm. Using :math:`ik = (i^2 + k^2 - (k-i)^2)/2`
+    the sum is written as a convolution with the chirp
+    :math:`e^{j\\Delta\\omega k^2/2}` which is performed with FFTs of
+    length at least n+m-1.
+
+    Parameters
+    ----------
+    x : array_like
+        The 2D array of which the rows are transformed
+    m : int
+        The number of points on the arc
+    dw : float
+        The angle between the points on the arc
+    a0 : float
+        The angle of the first point
+
+    Returns
+    -------
+    X : complex-valued numpy array
+        The (x.shape[0], m) array of transforms
+
+    """
+    x = np.atleast_2d(x)
+    n = x.shape[1]
+    L = 1 << int(n + m - 2).bit_length()
+    k = np.arange(max(n, m), dtype=float)
+    chirp = np.exp(0.5j*dw*k**2)
+
+    y = np.fft.fft(x * (np.exp(-1j*a0*k[:n]) / chirp[:n]), n=L, axis=1)
+    v = np.zeros(L, dtype=complex)
+    v[:m] = chirp[:m]
+    v[L-n+1:] = chirp[n-1:0:-1]
+
+    return np.fft.ifft(y * np.fft.fft(v), axis=1)[:, :m] / chirp[:m]
+
+
+def _frequency_response_czt(nc, dc, shape, low, high, samples, dt):
+    """
+    This is the low level function to generate the frequency response
+    values of a discrete-time model from its padded coefficient arrays on
+    the uniform grid ``np.linspace(low, high, samples)`` via the chirp-z
+    transform. Since the numerators and the denominators have the same
+    length, the response is the ratio of their transforms.
+
+    Parameters
+    ----------
+    nc, dc : ndarray
+        The padded numerator and denominator coefficients of each entry
+    shape : tuple
+        The shape (p, m) of the model
+    low, high : float
+        The frequency band
+    samples : int
+        The number of frequencies in the band
+    dt : float
+        The sampling period
+
+    Returns
+    -------
+    r  : complex-valued numpy array
+        The frequency response with the shape (p, m, samples)
+
+    """
+    dw = (high - low) / (samples - 1) * dt if samples > 1 else 0.
+    # The denominators of State models are identical
+    if np.all(dc == dc[0]):
+        X = _czt(np.vstack((nc, dc[:1])), samples, dw, low*dt)
+        n_val, d_val = X[:-1], X[-1:]
+    else:
+        X = _czt(np.vstack((nc, dc)), samples, dw, low*dt)
+        n_val, d_val = X[:nc.shape[0]], X[nc.shape[0]:]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = n_val / d_val
+
+    return r.reshape(shape + (samples,))
+
+
+class FrequencyResponsePlan:
+    """
+    FrequencyResponsePlan() holds the preprocessed data of a State() or
+    Transfer() model for repeated frequency response evaluations.
+
+    Similar to the FFTW plans, the expensive steps that only depend on the
+    model, i.e., the minimal realization, the engine selection and the
+    Hessenberg reduction or the eigendecomposition are performed once at
+    instantiation. Then any frequency grid, a single frequency or a chunk
+    of a grid can be evaluated at the cost of the engine itself.::
+
+        >>>> G = State([[0,1],[-4,-5]],[[0],[1]],[[1,0]])
+        >>>> P = FrequencyResponsePlan(G)
+        >>>> P.engine
+        'modal'
+        >>>> fr = P.evaluate(np.logspace(-2, 2, 500))
+        >>>> P.at(1.)
+        (0.14705882352941177-0.058823529411764705j)
+
+    The plan can also be given to ``frequency_response()`` in place of the
+    model.
+
+    Parameters
+    ----------
+    G : State, Transfer
+        The model for which the frequency response will be evaluated.
+    engine : {'auto', 'hessenberg', 'modal'}, optional
+        The frequency response engine of the State models. See
+        ``frequency_response()`` for the details.
+    minimal : bool, optional
+        If False, the minimal realization of the State models is skipped.
+        This saves the cost of the staircase reductions if the model is
+        known to be minimal or the uncontrollable/unobservable modes are
+        harmless, e.g., stable.
+
+    """
+    def __init__(self, G, engine='auto', minimal=True):
+        if not isinstance(G, (State, Transfer)):
+            raise ValueError('The argument should either be a State() or '
+                             'Transfer() object. I have found a {0}'
+                             ''.format(type(G).__qualname__))
+
+        if engine not in ('auto', 'hessenberg', 'modal'):
+            raise ValueError('The "engine" keyword can only be "auto", '
+                             '"hessenberg" or "modal". I don\'t know "{0}".'
+                             ''.format(engine))
+
+        self._model = G
+        self._shape = G.shape
+        self._isSISO = G._isSISO
+        self._d = None
+        self._data = None
+        self._dt = G.SamplingPeriod if G.SamplingSet == 'Z' else None
+
+        if G._isgain:
+            self._engine = 'gain'
+            self._d = G.to_array()
+        elif isinstance(G, Transfer):
+            self._engine = 'transfer'
+            num, den = ([[G.num]], [[G.den]]) if G._isSISO else (G.num, G.den)
+            self._data = _Transfer_frequency_data(num, den,
+                                                  self._dt is not None)
+        elif G._issparse:
+            if engine != 'auto':
+                raise ValueError('The "{0}" engine needs dense matrices. '
+                                 'Sparse models can only be evaluated with '
+                                 'the "auto" engine.'.format(engine))
+            # The minimal realization needs dense matrices and is skipped
+            self._engine = 'sparse'
+            self._d = G.d
+            self._data = (G.a.tocsc(), G.b.toarray(), G.c)
+        else:
+            self._d = G.d
+            aa, bb, cc = (minimal_realization(G) if minimal
+                          else G).matrices[:-1]
+            self._engine, self._data = _State_frequency_engine(aa, bb, cc,
+                                                               engine)
+            if self._engine == 'hessenberg':
+                if G._isSISO:
+                    aa, bb, cc = staircase(aa, bb, cc, form='o', invert=True)
+                    self._data = (aa, bb, cc[0, -1])
+                else:
+                    aa, q = hessenberg(aa, calc_q=True)
+                    self._data = (aa, q.T @ bb, cc @ q)
+
+    @property
+    def model(self):
+        """
+        The model for which the plan is created.
+        """
+        return self._model
+
+    @property
+    def engine(self):
+        """
+        The selected evaluation method. For State models it is either
+        'hessenberg' or 'modal' and 'sparse' for the models with sparse
+        matrices. Transfer models and static gains report 'transfer' and
+        'gain'.
+        """
+        return self._engine
+
+    @property
+    def shape(self):
+        """
+        The shape of the model.
+        """
+        return self._shape
+
+    def evaluate(self, w, chunk_size=None, use_fft=None):
+        """
+        Evaluates the frequency response on the given frequency grid.
+
+        Parameters
+        ----------
+        w : array_like
+            The frequency grid
+        chunk_size : int, optional
+            The number of frequencies that are processed at once by the
+            engine.
+        use_fft : bool, optional
+            Controls the FFT evaluation of the discrete-time Transfer
+            models on uniform grids. If None, the FFT is used whenever the
+            grid points lie on the FFT bins of a length that is at most
+            ``_fft_oversampling_limit`` times the number of points. If
+            True, the FFT is used regardless of the length and a
+            ValueError is raised if not possible. If False, it is not used.
+
+        Returns
+        -------
+        freq_resp_array : Complex_valued numpy array
+            The frequency response with the shape (len(w),) for SISO
+            and (p, m, len(w)) for MIMO models.
+
+        """
+        w = np.asarray(w, dtype=float).ravel()
+        p, m = self._shape
+        dt = self._dt
+
+        fft_data = None
+        if use_fft or use_fft is None:
+            if self._engine == 'transfer' and dt is not None:
+                fft_data = _fft_grid(w, dt)
+            if use_fft and fft_data is None:
+                raise ValueError('The FFT evaluation is only possible for '
+                                 'discrete-time Transfer models on uniform '
+                                 'grids with the spacing 2*pi/(M*dt) for '
+                                 'some integer M.')
+            if (use_fft is None and fft_data is not None and
+                    fft_data[0] > _fft_oversampling_limit*w.size):
+                fft_data = None
+
+        if self._engine == 'gain':
+            fr = np.zeros((p, m, w.size), dtype=complex)
+        elif fft_data is not None:
+            fr = _Transfer_frequency_response_fft(self._data, fft_data)
+        elif self._engine == 'transfer':
+            fr = _Transfer_frequency_response(self._data, w, chunk_size, dt)
+        elif self._engine == 'modal':
+            fr = _State_frequency_response_modal(*self._data, w, chunk_size,
+                                                 dt)
+        elif self._engine == 'sparse':
+            fr = _State_frequency_response_sparse(*self._data, w, dt)
+        elif self._isSISO:
+            fr = _State_frequency_response_generator(*self._data, w,
+                                                     chunk_size, dt).T[None]
+        else:
+            fr = _State_frequency_response_hessenberg(*self._data, w,
+                                                      chunk_size, dt)
+
+        if self._d is not None and np.any(self._d):
+            fr += self._d[:, :, None]
+
+        return fr[0, 0] if self._isSISO else fr
+
+    __call__ = evaluate
+
+    def zoom(self, low, high, samples=1000):
+        """
+        Evaluates the frequency response of a discrete-time model on the
+        uniform grid ``np.linspace(low, high, samples)``.
+
+        Transfer models are evaluated via the chirp-z transform of their
+        coefficients. The cost is :math:`O(L\\log L)` with :math:`L` being
+        the number of samples plus the number of coefficients regardless
+        of the width of the band. Hence, a narrow band can be resolved
+        finely without evaluating the rest of the unit circle.
+
+        State models are evaluated with the engine of the plan on the
+        same grid instead. Their characteristic polynomials are severely
+        ill-conditioned for the lightly damped poles, that are the typical
+        reason of zooming, and lose all accuracy already for moderate
+        orders.
+
+        Parameters
+        ----------
+        low, high : float
+            The frequency band
+        samples : int, optional
+            The number of frequencies in the band
+
+        Returns
+        -------
+        freq_resp_array : Complex_valued numpy array
+            The frequency response with the shape (samples,) for SISO
+            and (p, m, samples) for MIMO models.
+
+        """
+        if self._dt is None:
+            raise ValueError('The zoomed evaluation is only available for '
+                             'discrete-time models.')
+
+        samples = int(samples)
+        if samples < 1:
+            raise ValueError('The number of samples must be positive.')
+
+        if self._engine != 'transfer':
+            return self.evaluate(np.linspace(low, high, samples))
+
+        nc, dc = self._data[3:5]
+        fr = _frequency_response_czt(nc, dc, self._shape, low, high,
+                                     samples, self._dt)
+
+        return fr[0, 0] if self._isSISO else fr
+
+    def at(self, w):
+        """
+        Evaluates the frequency response at a single frequency.
+
+        Parameters
+        ----------
+        w : float
+            The frequency
+
+        Returns
+        -------
+        g : complex, ndarray
+            The complex value for SISO and the (p, m) array for MIMO
+            models.
+
+        """
+        fr = self.evaluate([w])
+        return fr[0] if self._isSISO else fr[:, :, 0]
+
+
+def _adaptive_frequency_response(plan, w, tol=1e-2, max_samples=1000):
+    """
+    Computes the frequency response on a grid that is refined only where
+    it is needed.
+
+    The initial grid is augmented with the natural frequencies of the
+    lightly damped poles, and the half-power points around them, reported
+    by ``pole_properties()``. Then every interval is bisected in the
+    logarithmic scale and the midpoint value is compared with the
+    interpolation of the endpoints, i.e.,
+
+    .. math::
+
+        \\left|\\log\\frac{G(j\\omega_m)}{G(j\\omega_l)} -
+        \\frac{1}{2}\\log\\frac{G(j\\omega_r)}{G(j\\omega_l)}\\right|
+
+    which measures the magnitude (in nepers) and the phase (in radians)
+    curvature at once. The intervals with a larger error than ``tol`` in
+    any of the entries are bisected again until either all intervals are
+    accepted or ``max_samples`` is reached.
+
+    Parameters
+    ----------
+    plan : FrequencyResponsePlan
+        The plan of the model
+    w : array_like
+        The initial (coarse) frequency grid
+    tol : float, optional
+        The accepted interpolation error
+    max_samples : int, optional
+        The maximum number of frequencies to be evaluated
 
     Returns
     -------
     freq_resp_array : Complex_valued numpy array
-        The frequency response of the system G
+        The frequency response of the model
     w : 1D numpy array
-        Frequency grid that is used to evaluate the frequency response
+        The refined frequency grid
+
+    """
+    w = np.unique(np.asarray(w, dtype=float))
+    G = plan.model
+
+    # Only the rightmost poles of the sparse models are known, hence the
+    # grid is refined from the curvature alone
+    if not G._isgain and w.size > 1 and not getattr(G, '_issparse', False):
+        props = np.real(G.pole_properties())
+        wn, zeta = props[:, 1], props[:, 2]
+        light = (zeta < _adaptive_damping_limit) & (wn > 0)
+        wn, zeta = wn[light], zeta[light]
+        seeds = np.r_[wn*(1-zeta), wn, wn*(1+zeta)]
+        w = np.unique(np.r_[w, seeds[(seeds > w[0]) & (seeds < w[-1])]])
+
+    fr = plan.evaluate(w).reshape(-1, w.size)
+    active = np.ones(w.size - 1, dtype=bool)
+
+    while np.any(active) and w.size < max_samples:
+        ind = np.flatnonzero(active)[:max_samples - w.size]
+        wl, wr = w[ind], w[ind+1]
+        wm = np.where(wl > 0, np.sqrt(np.abs(wl*wr)), (wl + wr)/2)
+        fm = plan.evaluate(wm).reshape(-1, wm.size)
+        fl, fr_r = fr[:, ind], fr[:, ind+1]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            err = np.max(np.abs(np.log(fm/fl) - np.log(fr_r/fl)/2), axis=0)
+
+        # NaNs and infs, e.g., hitting a zero, are refined too but stop
+        # when the intervals are at the floating point resolution
+        refine = ~(err <= tol) & (wr - wl > 1e-10*np.abs(wr))
+
+        pos = ind + 1 + np.arange(ind.size)
+        w = np.insert(w, ind+1, wm)
+        fr = np.insert(fr, ind+1, fm, axis=1)
+        active = np.zeros(w.size - 1, dtype=bool)
+        active[pos-1] = refine
+        active[pos] = refine
 
+    if G._isSISO:
+        return fr[0], w
+
+    return fr.reshape(G.shape + (w.size,)), w
 
 
+def _frequency_response_reduce(fr, output):
     """
-    ############################################################
-    # TODO: Investigate if *args,*kwargs is a better syntax here for
-    # better argument parsing.
-    ############################################################
+    Reduces a chunk of frequency response values to the requested output
+    quantities.
 
-    if not isinstance(G, (State, Transfer)):
-        raise ValueError('The argument should either be a State() or '
-                         'Transfer() object. I have found a {0}'
-                         ''.format(type(G).__qualname__))
+    Parameters
+    ----------
+    fr : ndarray
+        The frequency response with the shape (N,) or (p, m, N)
+    output : str
+        One of 'complex', 'sv', 'maxsv', 'magphase'. See
+        ``frequency_response()``.
+
+    Returns
+    -------
+    r : ndarray, tuple
+        The reduced values with the frequencies on the last axis. For the
+        'magphase' output, a tuple of magnitude and phase arrays.
+
+    """
+    if output == 'complex':
+        return fr
+    elif output == 'magphase':
+        return np.abs(fr), np.angle(fr)
+    elif fr.ndim == 1:
+        return np.abs(fr)[None, :] if output == 'sv' else np.abs(fr)
+
+    # Stacked SVDs of the (p, m) matrices of each frequency. Gram matrix
+    # shortcuts for 'maxsv' square the values and under/overflow outside
+    # roughly [1e-154, 1e154], hence the SVD is used for both.
+    sv = np.linalg.svd(np.moveaxis(fr, -1, 0), compute_uv=False)
+    return sv.T if output == 'sv' else sv[:, 0]
+
+
+def _frequency_response_chunked(plan, w, output, chunk_size=None,
+                                use_fft=None):
+    """
+    Evaluates the frequency response of a plan chunk by chunk and only
+    stores the reduced output quantities of each chunk. Hence the full
+    complex array is never allocated unless requested.
+
+    Parameters
+    ----------
+    plan : FrequencyResponsePlan
+        The plan of the model
+    w : array_like
+        The frequency grid
+    output : str
+        See ``_frequency_response_reduce``
+    chunk_size : int, optional
+        The number of frequencies of each chunk. If omitted, it is chosen
+        such that the response of the chunk stays within
+        ``_freq_chunk_bytes``.
+    use_fft : bool, optional
+        See ``FrequencyResponsePlan.evaluate()``
+
+    Returns
+    -------
+    r : ndarray, tuple
+        The reduced values with the frequencies on the last axis
+
+    """
+    if output == 'complex':
+        return plan.evaluate(w, use_fft=use_fft)
+
+    w = np.asarray(w, dtype=float).ravel()
+    p, m = plan.shape
+    if chunk_size is None:
+        chunk_size = _freq_chunk_length(p*m)
+
+    # The uniform grids are not chunked to keep them on the FFT bins
+    if use_fft or (use_fft is None and plan.engine == 'transfer' and
+                   plan._dt is not None and _fft_grid(w, plan._dt)):
+        chunk_size = max(w.size, 1)
+
+    parts = [_frequency_response_reduce(plan.evaluate(w[cs:cs+chunk_size],
+                                                      use_fft=use_fft),
+                                        output)
+             for cs in range(0, w.size, chunk_size)]
+
+    if output == 'magphase':
+        return tuple(np.concatenate(x, axis=-1) for x in zip(*parts))
+
+    return np.concatenate(parts, axis=-1)
 
-    for x in (input_freq_unit, output_freq_unit):
-        if x not in ('Hz', 'rad/s'):
-            raise ValueError('I can only handle "Hz" and "rad/s" as '
-                             'frequency units. "{0}" is not recognized.'
-                             ''.format(x))
 
+def _frequency_grid(G, custom_grid=None, high=None, low=None, samples=None,
+                    custom_logspace=None, input_freq_unit='Hz'):
+    """
+    Computes the frequency grid of ``frequency_response()`` from the
+    grid options. See its docstring for the details.
+    """
     _is_discrete = G.SamplingSet == 'Z'
 
     if _is_discrete:
@@ -145,7 +1141,13 @@ def frequency_response(G, custom_grid=None, high=None, low=None, samples=None,
             high = 2
             low = -2
     else:
-        pz_list = np.append(G.poles, G.zeros)
+        if getattr(G, '_issparse', False):
+            # At most the rightmost poles are known and the largest pole is
+            # bounded by the 1-norm of A
+            pz_list = np.append([] if G._rightmost is None else G._rightmost,
+                                sparse_norm(G.a, 1))
+        else:
+            pz_list = np.append(G.poles, G.zeros)
 
         if _is_discrete:
             nat_freq = np.abs(np.log(pz_list / G.SamplingPeriod))
@@ -164,10 +1166,9 @@ def frequency_response(G, custom_grid=None, high=None, low=None, samples=None,
     #           .. low     --> -3 decade from the slowest pole/zero
     #           .. samples --> 1000 points
 
-    # TODO: Implement a better/nonuniform algo for discovering new points
-    # around  poles and zeros. Right now there is a chance to hit a pole
-    # or a zero head on. matlab coarseness in practice leads to some
-    # weirdness even when granularity = 1.
+    # Fixed grids have a chance to hit a pole or a zero head on or miss
+    # the sharp resonances. The adaptive option refines the grid around
+    # lightly damped poles and wherever the curvature is high instead.
 
     if G._isgain:
         w = np.logspace(low, high, samples)
@@ -186,86 +1187,247 @@ def frequency_response(G, custom_grid=None, high=None, low=None, samples=None,
     if not input_freq_unit == 'Hz':
         w = np.rad2deg(w)
 
-    if G._isgain:
-        if G._isSISO:
-            if isinstance(G, Transfer):
-                freq_resp_array = np.array([1]*2)*G.num[0, 0]
-            else:
-                freq_resp_array = np.array([1]*2)*G.d[0, 0]
-        else:
-            if isinstance(G, Transfer):
-                freq_resp_array = np.zeros((2,)+G.shape) + np.array(G.num)
-            else:
-                freq_resp_array = np.zeros((2,)+G.shape) + np.array(G.d)
+    return w
 
-            freq_resp_array = np.rollaxis(freq_resp_array, 0, 3)
 
-    elif G._isSISO:
-        freq_resp_array = np.zeros_like(w, dtype='complex')
+def frequency_response(G, custom_grid=None, high=None, low=None, samples=None,
+                       custom_logspace=None,
+                       input_freq_unit='Hz', output_freq_unit='Hz',
+                       engine='auto', adaptive=False, adaptive_tol=1e-2,
+                       use_fft=None, zoom=None, output='complex'):
+    """
+    Computes the frequency response matrix of a State() or Transfer()
+    object.
 
-        if isinstance(G, State):
-            aa, bb, cc = staircase(
-                            *minimal_realization(G).matrices[:-1],
-                            form='o',
-                            invert=True
-                            )
-            freq_resp_array = _State_frequency_response_generator(
-                                                        aa, bb, cc[0, -1], w)
+    The State representations are always checked for minimality and,
+    if any, unobservable/uncontrollable modes are removed.
 
-            if np.any(G.d):
-                freq_resp_array += G.d[0, 0]
+    Parameters
+    ----------
+    G: State, Transfer, FrequencyResponsePlan
+        The realization for which the frequency response is computed. If
+        a plan is given, its preprocessed data is reused and ``engine`` is
+        ignored.
+    custom_grid : array_like
+        An array of sorted positive numbers denoting the frequencies
+    high : float
+        Power of 10 denoting the maximum frequency. If a discrete
+        realization is given this is overridden by the Nyquist frequency.
+    low : float
+        Power of 10 denoting the minimum frequency.
+    samples: int
+        Number of samples to be created between `high` and `low`
+    custom_logspace: 3-tuple
 
-        else:
-            iw = w.flatten()*1j
-            freq_resp_array = (np.polyval(G.num[0], iw) /
-                               np.polyval(G.den[0], iw)
-                               )
+    engine : {'auto', 'hessenberg', 'modal'}, optional
+        Selects the method of evaluating the State models. 'hessenberg'
+        uses the observer-Hessenberg form elimination and 'modal' uses
+        the eigendecomposition of the A matrix. The default 'auto' picks
+        the modal engine if the eigenvector matrix is well-conditioned,
+        i.e., its condition number is below 1e4.
+        Models with sparse matrices are always evaluated via a sparse LU
+        decomposition per frequency with the 'auto' option. Ignored for
+        Transfer models.
+    adaptive : bool, optional
+        If True, the grid is refined around the lightly damped poles and
+        wherever the magnitude or phase curvature is high instead of using
+        a fixed grid. The grid given by the other options is used as the
+        coarse initial grid (if not given, 50 points between ``low`` and
+        ``high``) and ``samples`` sets the maximum number of evaluations.
+    adaptive_tol : float, optional
+        The accepted error of interpolating the logarithm of the response,
+        i.e., magnitude in nepers and phase in radians, between the grid
+        points in the adaptive mode.
+    use_fft : bool, optional
+        The discrete-time Transfer models are evaluated via the FFTs of
+        the coefficients if the grid is uniform with a spacing of
+        ``2*pi/(M*dt)`` for some integer ``M``, e.g.,
+        ``np.arange(N)*np.pi/(N*dt)``. The default None picks the FFT if
+        ``M`` is not much larger than the number of points. If True, the
+        FFT is enforced and, if no custom grid is given, the grid is
+        replaced with ``samples`` (default 1000) uniformly spaced points
+        from zero up to the Nyquist frequency. If False, the FFT is not
+        used.
+    zoom : 2-tuple, optional
+        The band (low, high) of a discrete-time model that is evaluated
+        on ``samples`` (default 1000) uniformly spaced frequencies, via the
+        chirp-z transform for Transfer models. The other grid options are
+        ignored. See ``FrequencyResponsePlan.zoom()``.
+    output : {'complex', 'sv', 'maxsv', 'magphase'}, optional
+        Selects the returned quantity. The default 'complex' returns the
+        complex-valued response. 'sv' returns the singular values in the
+        descending order with the shape (min(p, m), len(w)) and 'maxsv'
+        only the largest one with the shape (len(w),). 'magphase' returns
+        a tuple of the magnitude and the phase (in radians) arrays with
+        the shape of the complex response. Except the zoom and the
+        adaptive modes, the response is evaluated and reduced chunk by
+        chunk such that the full complex array is not stored.
+
+    Returns
+    -------
+    freq_resp_array : Complex_valued numpy array
+        The frequency response of the system G or the quantities selected
+        by ``output``
+    w : 1D numpy array
+        Frequency grid that is used to evaluate the frequency response
+
+
+
+    """
+    ############################################################
+    # TODO: Investigate if *args,*kwargs is a better syntax here for
+    # better argument parsing.
+    ############################################################
+
+    if isinstance(G, FrequencyResponsePlan):
+        plan, G = G, G.model
     else:
-        p, m = G.shape
-        freq_resp_array = np.empty((len(w), m, p), dtype='complex')
-
-        if isinstance(G, State):
-            aa, bb, cc = minimal_realization(G).matrices[:-1]
-
-            for rows in range(p):
-                aaa, bbb, ccc = staircase(
-                                          aa, bb, cc[[rows], :],
-                                          form='o', invert=True
-                                          )
-                freq_resp_array[:,
-                                :,
-                                rows] = _State_frequency_response_generator(
-                                                            aaa,
-                                                            bbb,
-                                                            ccc[0, -1],
-                                                            w
-                                                            )
-
-            if np.any(G.d):
-                freq_resp_array += G.d[0, 0].T
-
-            # Currently the shape is (freqs,cols,rows) for broadcasting.
-            # roll axes in the correct places to have (row, col, freq) shape
-            freq_resp_array = np.rollaxis(
-                                          np.rollaxis(freq_resp_array, 0, 3),
-                                          1)
+        plan = None
 
-        else:
-            iw = w.flatten()*1j
-            freq_resp_array = np.empty((len(w), m, p), dtype='complex')
-            for rows in range(p):
-                for cols in range(m):
-                    freq_resp_array[:, cols, rows] = (
-                            np.polyval(G.num[rows][cols].flatten(), iw) /
-                            np.polyval(G.den[rows][cols].flatten(), iw)
-                            )
-            freq_resp_array = np.rollaxis(
-                                          np.rollaxis(freq_resp_array, 0, 3),
-                                          1)
+    if not isinstance(G, (State, Transfer)):
+        raise ValueError('The argument should either be a State() or '
+                         'Transfer() object. I have found a {0}'
+                         ''.format(type(G).__qualname__))
+
+    for x in (input_freq_unit, output_freq_unit):
+        if x not in ('Hz', 'rad/s'):
+            raise ValueError('I can only handle "Hz" and "rad/s" as '
+                             'frequency units. "{0}" is not recognized.'
+                             ''.format(x))
+
+    if engine not in ('auto', 'hessenberg', 'modal'):
+        raise ValueError('The "engine" keyword can only be "auto", '
+                         '"hessenberg" or "modal". I don\'t know "{0}".'
+                         ''.format(engine))
+
+    if output not in ('complex', 'sv', 'maxsv', 'magphase'):
+        raise ValueError('The "output" keyword can only be "complex", '
+                         '"sv", "maxsv" or "magphase". I don\'t know "{0}".'
+                         ''.format(output))
+
+    if plan is None:
+        plan = FrequencyResponsePlan(G, engine=engine)
+
+    if zoom is not None:
+        if G.SamplingSet != 'Z':
+            raise ValueError('The "zoom" option is only available for '
+                             'discrete-time models.')
+        lo, hi = np.asarray(zoom, dtype=float)
+        if not input_freq_unit == 'Hz':
+            lo, hi = np.rad2deg([lo, hi])
+        samples = 1000 if samples is None else samples
+        return (_frequency_response_reduce(plan.zoom(lo, hi, samples),
+                                           output),
+                np.linspace(lo, hi, samples))
+
+    if (use_fft and G.SamplingSet == 'Z' and custom_grid is None and
+            custom_logspace is None):
+        samples = 1000 if samples is None else samples
+        w = np.arange(samples) * np.pi / (samples * G.SamplingPeriod)
+    else:
+        w = _frequency_grid(G, custom_grid, high, low, samples,
+                            custom_logspace, input_freq_unit)
+
+    if adaptive:
+        if custom_grid is None and custom_logspace is None:
+            w = np.logspace(np.log10(w[0]), np.log10(w[-1]),
+                            min(50, len(w)))
+        freq_resp_array, w = _adaptive_frequency_response(
+                                        plan, w, tol=adaptive_tol,
+                                        max_samples=1000 if samples is None
+                                        else samples)
+        freq_resp_array = _frequency_response_reduce(freq_resp_array, output)
+    else:
+        freq_resp_array = _frequency_response_chunked(plan, w, output,
+                                                      use_fft=use_fft)
 
     return freq_resp_array, w
 
 
+def frequency_response_chunks(G, custom_grid=None, high=None, low=None,
+                              samples=None, custom_logspace=None,
+                              input_freq_unit='Hz', engine='auto',
+                              chunk_size=1000, out=None):
+    """
+    Computes the frequency response of a State() or Transfer() object
+    in chunks of the frequency grid instead of allocating the full
+    response array.
+
+    This is a generator that yields a ``(w, freq_resp_array)`` pair for
+    every ``chunk_size`` consecutive frequencies of the grid such that
+    the memory used at a time is limited by the chunk. The grid options
+    are the same as of ``frequency_response()``.::
+
+        >>>> for w, fr in frequency_response_chunks(G, samples=10**6):
+        ....     peak = max(peak, np.abs(fr).max())
+
+    Moreover, if an array is given as ``out``, each chunk is written into
+    the corresponding slice of ``out`` and the yielded array is that
+    slice. For sweeps larger than the memory, ``out`` can be a
+    ``numpy.memmap`` which is flushed after the last chunk.::
+
+        >>>> out = np.memmap('G.dat', dtype=complex, mode='w+',
+        ....                 shape=G.shape + (10**8,))
+        >>>> for _ in frequency_response_chunks(G, samples=10**8, out=out):
+        ....     pass
+
+    Parameters
+    ----------
+    G: State, Transfer, FrequencyResponsePlan
+        The realization for which the frequency response is computed.
+    custom_grid, high, low, samples, custom_logspace, input_freq_unit
+        The grid options of ``frequency_response()``.
+    engine : {'auto', 'hessenberg', 'modal'}, optional
+        Selects the method of evaluating the State models.
+    chunk_size : int, optional
+        The number of frequencies in each chunk.
+    out : ndarray, optional
+        A complex array with the shape (len(w),) for SISO and
+        (p, m, len(w)) for MIMO models.
+
+    Yields
+    ------
+    w : 1D numpy array
+        The frequencies of the chunk
+    freq_resp_array : Complex_valued numpy array
+        The frequency response of the chunk with the frequencies on the
+        last axis.
+
+    """
+    if isinstance(G, FrequencyResponsePlan):
+        plan, G = G, G.model
+    else:
+        plan = FrequencyResponsePlan(G, engine=engine)
+
+    chunk_size = int(chunk_size)
+    if chunk_size < 1:
+        raise ValueError('The chunk_size must be a positive integer.')
+
+    w = _frequency_grid(G, custom_grid, high, low, samples, custom_logspace,
+                        input_freq_unit)
+
+    if out is not None:
+        shape = (w.size,) if G._isSISO else G.shape + (w.size,)
+        if not isinstance(out, np.ndarray) or out.shape != shape:
+            raise ValueError('The "out" argument should be an array with '
+                             'the shape {0}.'.format(shape))
+        if not np.iscomplexobj(out):
+            raise ValueError('The "out" argument should be a complex-valued'
+                             ' array.')
+
+    for cs in range(0, w.size, chunk_size):
+        wc = w[cs:cs+chunk_size]
+        fr = plan.evaluate(wc)
+        if out is not None:
+            out[..., cs:cs+chunk_size] = fr
+            fr = out[..., cs:cs+chunk_size]
+
+        yield wc, fr
+
+    if isinstance(out, np.memmap):
+        out.flush()
+
+
 def bode_plot(G, w=None, use_db=False, use_radians=False):
     """
     Draws the Bode plot of the system G. As the name implies, this only
@@ -23,7 +23,7 @@ THE SOFTWARE.
 """
 import numpy as np
 from scipy.linalg import block_diag
-from ._classes import State, _state_or_abcd
+from ._classes import State, _state_or_abcd, _reject_sparse
 from ._aux_linalg import haroldsvd
 
 
@@ -223,6 +223,8 @@ def kalman_decomposition(G, compute_T=False, output='system',
     if not isinstance(G, State):
         raise TypeError('The argument must be a State() object')
 
+    _reject_sparse(G, 'kalman_decomposition')
+
     # If a static gain, then skip and return the argument
     if G._isgain:
         if output == 'matrices':
@@ -21,13 +21,32 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
+import warnings
 import numpy as np
 from numpy.linalg._umath_linalg import solve
 
-from scipy.linalg import qz, schur
+from scipy.linalg import (qz, schur, lu_factor, lu_solve, eigvals, qr, svd,
+                          qr_insert, solve_triangular)
+from scipy.sparse import issparse, identity
+from scipy.sparse.linalg import splu
 
+# Problems larger than this are split recursively and the diagonal blocks of
+# at most this size are solved with the block-walking kernels below.
+_lyapunov_block_size = 32
 
-def lyapunov_eq_solver(A, Y, E=None, form='c'):
+# Size of the off-diagonal Sylvester blocks that are solved directly
+_sylvester_block_size = 8
+
+# Spectral radius beyond which the doubling iteration gives up and the
+# Schur method is used instead
+_doubling_radius_limit = 0.95
+
+# Relative residual above which a batched modal solution is recomputed with
+# the Schur method
+_batch_residual_limit = 1e-10
+
+
+def lyapunov_eq_solver(A, Y, E=None, form='c', method='schur', tol=1e-14):
     '''
     This function solves the Lyapunov and the generalized Lyapunov
     equations of the forms
@@ -51,11 +70,27 @@ def lyapunov_eq_solver(A, Y, E=None, form='c'):
     and for (2), (2') QZ decomposition is used. Then all have a similar
     forward substitution step. The method is a a modified implementation
     of T. Penzl (1998) which is essentially a modification of Bartels -
-    Stewart method.
+    Stewart method. For large problems, the substitution is done
+    recursively as in I. Jonsson, B. Kagstrom (2002) where the reduced
+    equation is split into two Lyapunov equations and a Sylvester equation
+    which are coupled via matrix-matrix products.
 
     If the argument `E` is not exactly a `None`-type then (2) is
     assumed.
 
+    If the equation is solved for many Y matrices with the same A (and E),
+    ``LyapunovSolver`` reuses the decomposition across the solutions.
+
+    For (1') and strongly stable A, the doubling (squared Smith) iteration
+
+    .. math::
+
+        X_{k+1} = X_k + A_k^T X_k A_k, \\quad A_{k+1} = A_k^2
+
+    with :math:`X_0 = Y, A_0 = A` converges in a few matrix products. If
+    the iteration has not converged in as many steps as it would take
+    for a spectral radius of 0.95, the Schur method is used instead.
+
     Parameters
     ----------
     A , Y , E: nxn array_like
@@ -65,6 +100,13 @@ def lyapunov_eq_solver(A, Y, E=None, form='c'):
         The string selector to define which form of Lyapunov equation is
         going to be used.
 
+    method : 'schur' , 'doubling'
+        The solution method. 'doubling' is only available for (1').
+
+    tol : float
+        The convergence tolerance of the doubling iteration relative to
+        the norm of the solution.
+
     Returns
     -------
 
@@ -101,8 +143,20 @@ def lyapunov_eq_solver(A, Y, E=None, form='c'):
         raise ValueError('The keyword "form" accepts only the following'
                          'choices:\n\'c\',\'continuous\',\'d\',\'discrete\'')
 
+    if method not in ('schur', 'doubling'):
+        raise ValueError('The "method" keyword can only be "schur" or '
+                         '"doubling". I don\'t know "{0}".'.format(method))
+
     A, Y, E = check_matrices(A, Y, E)
 
+    if method == 'doubling':
+        if form in ('c', 'continuous') or E is not None:
+            raise ValueError('The doubling method is only available for the '
+                             'discrete-time Lyapunov equation without E.')
+        X_sol = _solve_discrete_lyapunov_doubling(A, Y, tol)
+        if X_sol is not None:
+            return X_sol
+
     if form in ('c', 'continuous'):
         if E is None:
             X_sol = _solve_continuous_lyapunov(A, Y)
@@ -117,80 +171,587 @@ def lyapunov_eq_solver(A, Y, E=None, form='c'):
     return X_sol
 
 
-def _solve_continuous_generalized_lyapunov(A, E, Y, tol=1e-12):
+class LyapunovSolver:
     '''
-    Solves
+    A Lyapunov equation solver for a fixed A (and E) and many Y matrices.
 
-                A.T X E + E.T X A + Y = 0
+    The equations are the same as in ``lyapunov_eq_solver``. The real Schur
+    form of A or the QZ decomposition of (A, E) is computed once at the
+    initialization and each call of ``solve`` only performs the forward
+    substitution on the transformed Y hence is typically several times
+    cheaper than calling ``lyapunov_eq_solver`` repeatedly.
 
-    for symmetric Y
-    '''
-    mat33 = np.zeros((3, 3), dtype=float)
-    mat44 = np.zeros((4, 4), dtype=float)
+    Parameters
+    ----------
+    A , E: nxn array_like
+        Data matrices for the equation. If E is None, (1), (1') is solved
+        otherwise (2), (2').
 
-    # =============================
-    # Declare the inner functions
-    # =============================
+    form : 'c' , 'continuous' , 'd' , 'discrete'
+        The string selector to define which form of Lyapunov equation is
+        going to be used.
 
-    def mini_sylvester(R, S, Yt, U=None, V=None):
+    '''
+    def __init__(self, A, E=None, form='c'):
+        if form not in ('c', 'continuous', 'd', 'discrete'):
+            raise ValueError('The keyword "form" accepts only the following'
+                             'choices:\n\'c\',\'continuous\',\'d\','
+                             '\'discrete\'')
+        A = np.atleast_2d(np.asarray(A, dtype=float))
+        if A.ndim != 2 or A.shape[0] != A.shape[1]:
+            raise ValueError('The argument A must be square. '
+                             'Its shape is {}'.format(A.shape))
+        if E is not None:
+            E = np.atleast_2d(np.asarray(E, dtype=float))
+            if E.shape != A.shape:
+                raise ValueError('The sizes of the arguments are not '
+                                 'compatible. For convenience I have '
+                                 'received A , E matrices shaped as {}'
+                                 ''.format([A.shape, E.shape]))
+
+        self.n = A.shape[0]
+        self._form = 'c' if form in ('c', 'continuous') else 'd'
+        if E is None:
+            self._As, self._S = schur(A, output='real')
+            self._Es, self._Z = None, self._S
+        else:
+            self._As, self._Es, self._S, self._Z = qz(A, E)
+
+    def solve(self, Y):
         '''
-        A helper function to solve the 1x1 or 2x2 Sylvester equations
-        arising in the solution of the generalized continuous-time
-        Lyapunov equations
+        Solves the equation for the symmetric Y.
+
+        Parameters
+        ----------
+        Y : nxn or kxnxn array_like
+            A single symmetric matrix or a stack of k matrices.
+
+        Returns
+        -------
+        X : nxn or kxnxn numpy array
+            Solution(s) with the same shape as Y.
 
-        Note that, this doesn't have any protection against LinAlgError
-        hence the caller needs to `try` to see whether it is properly
-        executed.
         '''
-        if U is None:
-            if R.size == 1:
-                return -Yt / (2 * R * S)
+        Y = np.asarray(Y, dtype=float)
+        if Y.ndim not in (2, 3) or Y.shape[-2:] != (self.n, self.n):
+            raise ValueError('Y must be a {0}x{0} array or a stack of them '
+                             'but its shape is {1}'.format(self.n, Y.shape))
+
+        Ys = self._Z.T @ Y @ self._Z
+        Xs = np.empty_like(Ys)
+        for X, Yk in zip(Xs.reshape(-1, self.n, self.n),
+                         Ys.reshape(-1, self.n, self.n)):
+            if self._Es is None:
+                if self._form == 'c':
+                    X[...] = _solve_continuous_lyapunov_reduced(self._As, Yk)
+                else:
+                    X[...] = _solve_discrete_lyapunov_reduced(self._As, Yk)
+            elif self._form == 'c':
+                X[...] = _solve_continuous_generalized_lyapunov_reduced(
+                                                    self._As, self._Es, Yk)
             else:
-                a, b, c, d = R.ravel().tolist()
-                e, f, g, h = S.ravel().tolist()
+                X[...] = _solve_discrete_generalized_lyapunov_reduced(
+                                                    self._As, self._Es, Yk)
 
-                mat33[0, :] = [2*a*e, 2*(a*g + e*c), 2*c*g]
-                mat33[1, :] = [a*f + e*b, a*h + e*d + c*f + b*g, c*h + g*d]
-                mat33[2, :] = [2*b*f, 2*(b*h + f*d), 2*d*h]
+        return self._S @ Xs @ self._S.T
 
-                a, b, c = solve(mat33, -Yt.reshape(-1, 1)[[0, 1, 3], :]
-                                ).ravel().tolist()
 
-                return np.array([[a, b], [b, c]], dtype=float)
+def lyapunov_batch_solver(A, Y, form='c'):
+    '''
+    This function solves the Lyapunov equations (1) or (1') of
+    ``lyapunov_eq_solver`` for a stack of k matrices A and Y at once.
 
-        elif R.size == 4:
-            if S.size == 4:
-                a, b, c, d = R.reshape(1, 4).tolist()[0]
-                e, f, g, h = S.reshape(1, 4).tolist()[0]
-                k, l, m, n = U.reshape(1, 4).tolist()[0]
-                p, q, r, s = V.reshape(1, 4).tolist()[0]
+    The arguments are validated once for the whole batch. Since there is
+    no batched real Schur decomposition, the equations are diagonalized
+    with the batched eigendecomposition :math:`A = V\\Lambda V^{-1}` and
+    the transformed solution is obtained elementwise, e.g., for (1)
 
-                mat44[0, :] = [a*e + k*p, a*g + k*r, c*e + m*p, c*g + m*r]
-                mat44[1, :] = [a*f + k*q, a*h + k*s, c*f + m*q, c*h + m*s]
-                mat44[2, :] = [b*e + l*p, b*g + l*r, d*e + n*p, d*g + n*r]
-                mat44[3, :] = [b*f + l*q, b*h + l*s, d*f + n*q, d*h + n*s]
+    .. math::
 
-                return solve(mat44, -Yt.reshape(-1, 1)).reshape(2, 2)
-            else:
-                return solve(S[0, 0]*R.T + V[0, 0]*U.T, -Yt)
-        elif S.size == 4:
-            return solve(R[0, 0]*S.T+U[0, 0]*V.T, -Yt.T).T
+        \\tilde{X}_{ij} = -\\frac{\\tilde{Y}_{ij}}{\\lambda_i + \\lambda_j},
+        \\quad \\tilde{Y} = V^T Y V, \\quad X = V^{-T}\\tilde{X}V^{-1}
+
+    which are all vectorized over the batch. The accuracy of this solution
+    degrades with the condition number of V, hence the residuals are
+    checked and the solutions with relative residuals larger than 1e-10,
+    e.g., for defective A matrices, are recomputed with the Schur method.
+
+    Parameters
+    ----------
+    A : kxnxn array_like
+        Stack of the data matrices.
+
+    Y : kxnxn or nxn array_like
+        Stack of symmetric matrices or a single one used for all A.
+
+    form : 'c' , 'continuous' , 'd' , 'discrete'
+        The string selector to define which form of Lyapunov equation is
+        going to be used.
+
+    Returns
+    -------
+
+    X : kxnxn numpy array
+        Solutions to the selected Lyapunov equations.
+
+    '''
+    if form not in ('c', 'continuous', 'd', 'discrete'):
+        raise ValueError('The keyword "form" accepts only the following'
+                         'choices:\n\'c\',\'continuous\',\'d\',\'discrete\'')
+    A = np.asarray(A, dtype=float)
+    Y = np.asarray(Y, dtype=float)
+    if A.ndim != 3 or A.shape[1] != A.shape[2]:
+        raise ValueError('A must be a stack of square matrices shaped as '
+                         '(k, n, n) but its shape is {}'.format(A.shape))
+    if Y.shape not in (A.shape, A.shape[1:]):
+        raise ValueError('The sizes of the arguments are not compatible. '
+                         'For convenience I have received A , Y '
+                         'matrices shaped as {}'.format([A.shape, Y.shape]))
+    Y = np.broadcast_to(Y, A.shape)
+    cont = form in ('c', 'continuous')
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        lam, V = np.linalg.eig(A)
+        try:
+            Vi = np.linalg.inv(V)
+        except np.linalg.LinAlgError:
+            # Some eigenvector matrix is exactly singular
+            Vi = np.full_like(V, np.nan)
+
+        Vt = V.swapaxes(1, 2)
+        if cont:
+            den = lam[:, :, None] + lam[:, None, :]
+        else:
+            den = lam[:, :, None] * lam[:, None, :] - 1
+        X = (Vi.swapaxes(1, 2) @ (-(Vt @ Y @ V) / den) @ Vi).real
+
+        At = A.swapaxes(1, 2)
+        R = At @ X + X @ A + Y if cont else At @ X @ A - X + Y
+        res = np.abs(R).max(axis=(1, 2)) / np.maximum(np.abs(Y).max(
+                                    axis=(1, 2)), np.finfo(float).tiny)
+
+    for k in np.flatnonzero(~(res <= _batch_residual_limit)):
+        if cont:
+            X[k] = _solve_continuous_lyapunov(A[k], Y[k])
+        else:
+            X[k] = _solve_discrete_lyapunov(A[k], Y[k])
+
+    return X
+
+
+def sylvester_eq_solver(A, B, C, form='c'):
+    '''
+    This function solves the Sylvester equations of the forms
+
+    (1)                A X + X B = C
+
+    (1')               A X B - X = C
+
+    for the unknown matrix `X` given square matrices A, B and C with
+    compatible sizes. The `form` keyword selects between the continuous
+    (1) and discrete (1') time forms.
+
+    Both `A` and `B` are brought to real Schur form and the resulting
+    quasi-triangular equation is solved with the blocked Bartels - Stewart
+    method. The equation is split recursively along the larger dimension
+    and the coupling terms are updated with matrix products. The small
+    blocks at the bottom of the recursion are solved directly, the 1x1
+    and 2x2 diagonal blocks with the same kernels as the Lyapunov solvers.
+
+    Parameters
+    ----------
+    A : nxn array_like
+        Left coefficient matrix.
+
+    B : mxm array_like
+        Right coefficient matrix.
+
+    C : nxm array_like
+        The constant term.
+
+    form : 'c' , 'continuous' , 'd' , 'discrete'
+        The string selector to define which form of Sylvester equation is
+        going to be used.
+
+    Returns
+    -------
+
+    X : nxm numpy array
+        Solution to the selected Sylvester equation.
+
+    '''
+    if form not in ('c', 'continuous', 'd', 'discrete'):
+        raise ValueError('The keyword "form" accepts only the following'
+                         'choices:\n\'c\',\'continuous\',\'d\',\'discrete\'')
+    A = np.atleast_2d(np.asarray(A, dtype=float))
+    B = np.atleast_2d(np.asarray(B, dtype=float))
+    C = np.atleast_2d(np.asarray(C, dtype=float))
+    for name, mat in (('A', A), ('B', B)):
+        if mat.ndim != 2 or mat.shape[0] != mat.shape[1]:
+            raise ValueError('The argument {} must be square. '
+                             'Its shape is {}'.format(name, mat.shape))
+    if C.shape != (A.shape[0], B.shape[0]):
+        raise ValueError('The sizes of the arguments are not compatible. '
+                         'For convenience I have received A , B , C '
+                         'matrices shaped as {}'
+                         ''.format([A.shape, B.shape, C.shape]))
+
+    # With A.T = U T U.T and B = V S V.T, (1) becomes T.T Y + Y S = F and
+    # (1') T.T Y S - Y = F for Y = U.T X V and F = U.T C V
+    T, U = schur(A.T, output='real')
+    S, V = schur(B, output='real')
+    Y = _sylvester_recursive(-U.T @ C @ V, (T, None), (S, None),
+                             form='c' if form in ('c', 'continuous') else 'd')
+
+    return U @ Y @ V.T
+
+
+def lyapunov_lowrank_solver(A, B, tol=1e-10, max_iter=200, shifts=None,
+                            num_shifts=20):
+    '''
+    This function computes a low-rank factor Z of the solution
+    :math:`X \\approx ZZ^T` of the continuous-time Lyapunov equation
+
+    .. math::
+
+        X A + A^T X + B B^T = 0
+
+    for a stable, typically large and sparse, `A` and a `B` with few
+    columns. The low-rank alternating direction implicit (LR-ADI)
+    iteration is used in the residual-based form of P. Benner,
+    P. Kurschner, J. Saak (2013) where the complex shifts are processed
+    in conjugate pairs with real arithmetic. Each iteration requires a
+    linear solve with :math:`A^T + pI` and the factorizations are reused
+    when the shifts are cycled.
+
+    If not given, the shifts are computed with the heuristic of T. Penzl
+    (1999) from the Ritz values of `A` and of its inverse obtained via the
+    Arnoldi iteration.
+
+    Parameters
+    ----------
+    A : nxn array_like or sparse matrix
+        Stable system matrix of the equation.
+
+    B : nxm array_like
+        The factor of the constant term. Typically m << n.
+
+    tol : float
+        The iteration stops when the 2-norm of the residual relative to
+        the norm of :math:`BB^T` is below this value.
+
+    max_iter : int
+        The maximum number of ADI iterations. If the tolerance is not met
+        in as many iterations, a RuntimeWarning is emitted and the factor
+        of the last iterate is returned.
+
+    shifts : array_like
+        The shifts with negative real parts and the complex ones given in
+        conjugate pairs. If None, they are computed automatically.
+
+    num_shifts : int
+        The number of shifts that are computed if `shifts` is None.
+
+    Returns
+    -------
+
+    Z : nxr numpy array
+        Low-rank factor of the solution. The columns are compressed such
+        that r is the numerical rank of the factor.
+
+    '''
+    if not issparse(A):
+        A = np.atleast_2d(np.asarray(A, dtype=float))
+    B = np.asarray(B, dtype=float)
+    if B.ndim == 1:
+        B = B[:, None]
+
+    if A.ndim != 2 or A.shape[0] != A.shape[1]:
+        raise ValueError('The argument A must be square. '
+                         'Its shape is {}'.format(A.shape))
+    if B.ndim != 2 or B.shape[0] != A.shape[0]:
+        raise ValueError('The sizes of the arguments are not compatible. '
+                         'For convenience I have received A , B '
+                         'matrices shaped as {}'.format([A.shape, B.shape]))
+
+    # The LR-ADI iteration solves F X + X F^T + B B^T = 0 with F = A^T
+    F = A.T.tocsc() if issparse(A) else A.T
+    n = F.shape[0]
+
+    def factorize(p):
+        if issparse(F):
+            return splu((F + p*identity(n, format='csc')).tocsc()).solve
+        lu = lu_factor(F + p*np.eye(n))
+        return lambda rhs: lu_solve(lu, rhs)
+
+    if shifts is None:
+        shifts = _adi_shifts(F, factorize(0.), B, num_shifts)
+    else:
+        shifts = np.atleast_1d(np.asarray(shifts, dtype=complex))
+        if np.any(shifts.real >= 0.):
+            raise ValueError('The ADI shifts should have negative real '
+                             'parts.')
+
+    solvers = {}
+    W = B.copy()
+    res0 = np.linalg.norm(B, 2)**2
+    Zs = []
+    k = 0
+    for it in range(max_iter):
+        p = shifts[k]
+        if k not in solvers:
+            solvers[k] = factorize(p if p.imag != 0. else p.real)
+        V = solvers[k](W)
+        if p.imag == 0.:
+            p = p.real
+            W = W - 2*p*V
+            Zs += [np.sqrt(-2*p)*V]
+            k += 1
+        else:
+            # The pair p, conj(p) with a single complex solve
+            g, d = 2*np.sqrt(-p.real), p.real / p.imag
+            Vr = V.real + d*V.imag
+            W = W + g**2 * Vr
+            Zs += [g*Vr, g*np.sqrt(d**2 + 1)*V.imag]
+            k += 2
+        k %= shifts.size
+
+        res = np.linalg.norm(W, 2)**2 / res0
+        if res <= tol:
+            break
+    else:
+        warnings.warn('The ADI iteration did not converge in {0} iterations.'
+                      ' The relative residual is {1:.3e} instead of {2:.3e}.'
+                      ''.format(max_iter, res, tol), RuntimeWarning)
+
+    return _column_compress(np.hstack(Zs))
+
+
+def lyapunov_cholesky_solver(A, B, form='c'):
+    '''
+    This function computes the upper triangular Cholesky factor U of the
+    solution :math:`X = U^T U` of the Lyapunov equations
+
+    (1)                X A + A^T X + B B^T = 0
+
+    (1')               A^T X A - X + B B^T = 0
+
+    without forming X. Hence the factor is accurate even if X is
+    ill-conditioned or singular, e.g., the gramians of nonminimal models.
+
+    The method of S. Hammarling (1982) is used on the complex Schur form
+    of A such that the diagonal blocks are all 1x1. The rows of the factor
+    are solved one at a time with a triangular solve and the remaining
+    part of the constant term is updated by a triangular row insertion.
+    The solution is unique and positive semidefinite only if A is stable,
+    hence A is required to be stable for the selected form.
+
+    Parameters
+    ----------
+    A : nxn array_like
+        Stable matrix of the equation.
+
+    B : nxm array_like
+        The factor of the constant term.
+
+    form : 'c' , 'continuous' , 'd' , 'discrete'
+        The string selector to define which form of Lyapunov equation is
+        going to be used.
+
+    Returns
+    -------
+
+    U : nxn numpy array
+        Upper triangular factor with nonnegative diagonal entries.
+
+    '''
+    if form not in ('c', 'continuous', 'd', 'discrete'):
+        raise ValueError('The keyword "form" accepts only the following'
+                         'choices:\n\'c\',\'continuous\',\'d\',\'discrete\'')
+    A = np.atleast_2d(np.asarray(A, dtype=float))
+    B = np.asarray(B, dtype=float)
+    if B.ndim < 2:
+        B = np.atleast_2d(B).T
+
+    if A.shape[0] != A.shape[1]:
+        raise ValueError('The argument A must be square. '
+                         'Its shape is {}'.format(A.shape))
+    if B.ndim != 2 or B.shape[0] != A.shape[0]:
+        raise ValueError('The sizes of the arguments are not compatible. '
+                         'For convenience I have received A , B '
+                         'matrices shaped as {}'.format([A.shape, B.shape]))
+
+    cont = form in ('c', 'continuous')
+    n = A.shape[0]
+    T, S = schur(A, output='complex')
+    lams = np.diag(T)
+    if (cont and np.any(lams.real >= 0.)) or \
+            (not cont and np.any(np.abs(lams) >= 1.)):
+        raise ValueError('The Cholesky factor of the solution exists only '
+                         'for stable A matrices.')
+
+    # With X = S Xs S^H and the triangular R with R^H R = S^H B B^T S, the
+    # equations become T^H Xs + Xs T + R^H R = 0 (or the discrete analogue)
+    R = np.zeros((n, n), dtype=complex)
+    Rb = qr(B.T @ S, mode='r')[0]
+    R[:min(Rb.shape[0], n)] = Rb[:n]
+    U = np.zeros((n, n), dtype=complex)
+    for k in range(n):
+        # Rotate the row such that the diagonal is real and nonnegative
+        if R[k, k] != 0.:
+            R[k, k:] *= np.abs(R[k, k]) / R[k, k]
+        lam = T[k, k]
+        g = np.sqrt(-2*lam.real) if cont else np.sqrt(1 - np.abs(lam)**2)
+        U[k, k] = R[k, k].real / g
+        if k == n - 1:
+            break
+
+        tau, rho, T22 = T[k, k+1:], R[k, k+1:], T[k+1:, k+1:]
+        # Solve the row of U and form the row y such that the remaining
+        # constant term is R22^H R22 + y^H y
+        if cont:
+            mu = solve_triangular(T22 + lam.conj()*np.eye(n-k-1),
+                                  -(U[k, k]*tau + g*rho), trans='T')
+            y = rho - g*mu
         else:
-            return -Yt / (R * S + U * V)
+            mu = solve_triangular(lam.conj()*T22 - np.eye(n-k-1),
+                                  -(lam.conj()*U[k, k]*tau + g*rho),
+                                  trans='T')
+            y = lam*rho - g*(U[k, k]*tau + mu @ T22)
+
+        U[k, k+1:] = mu
+        R[k+1:, k+1:] = qr_insert(np.eye(n-k-1, dtype=complex),
+                                  R[k+1:, k+1:], y, n-k-1, which='row',
+                                  check_finite=False)[1][:n-k-1]
+
+    # X = (U S^H)^H (U S^H) is real hence the real triangular factor is
+    # obtained from the stacked real and imaginary parts.
+    M = U @ S.conj().T
+    U = qr(np.vstack([M.real, M.imag]), mode='r')[0][:n]
+    return U * np.where(np.diag(U) < 0., -1., 1.)[:, None]
+
+
+def _adi_shifts(F, F_solve, B, num_shifts):
+    '''
+    Computes the ADI shifts with the heuristic of Penzl from the Ritz
+    values of F and inv(F). Among the candidates, the shift which
+    minimizes the ADI rational function over the candidate set is taken
+    first, and then the candidate with the largest value of the current
+    rational function is added until num_shifts are selected.
+    '''
+    n = F.shape[0]
+    v = B.sum(axis=1)
+    if not np.any(v):
+        v = np.ones(n)
+    kp, km = min(2*num_shifts, n - 1), min(num_shifts, n - 1)
+    ritz = np.r_[_arnoldi_ritz(lambda x: F @ x, v, max(kp, 1)),
+                 1/_arnoldi_ritz(lambda x: F_solve(x), v, max(km, 1))]
+
+    if np.any(ritz.real >= 0.):
+        raise ValueError('The ADI iteration requires a stable A matrix but '
+                         'there are Ritz values in the closed right half '
+                         'plane.')
+
+    # Keep one from each conjugate pair, the conjugates are added back
+    R = ritz[ritz.imag >= 0.]
+
+    def rfun(P, t):
+        return np.prod(np.abs((t[:, None] - P[None, :]) /
+                              (t[:, None] + P[None, :])), axis=1)
+
+    def with_conj(p):
+        return np.array([p, p.conj()]) if p.imag != 0. else np.array([p])
+
+    if R.size <= num_shifts:
+        return np.concatenate([with_conj(p) for p in R])
+
+    Rc = np.concatenate([with_conj(p) for p in R])
+    p0 = R[np.argmin([rfun(with_conj(p), Rc).max() for p in R])]
+    P = [with_conj(p0)]
+    while sum(x.size for x in P) < num_shifts:
+        p = R[np.argmax(rfun(np.concatenate(P), R))]
+        P += [with_conj(p)]
+
+    return np.concatenate(P)
+
+
+def _arnoldi_ritz(op, v, k):
+    '''
+    Returns the Ritz values of the linear operator op after k steps of the
+    Arnoldi iteration starting from v.
+    '''
+    n = v.size
+    Q = np.zeros((n, k+1), dtype=float)
+    H = np.zeros((k+1, k), dtype=float)
+    Q[:, 0] = v / np.linalg.norm(v)
+    for j in range(k):
+        w = op(Q[:, j]).real
+        # Two passes of Gram-Schmidt for orthogonality
+        for _ in range(2):
+            h = Q[:, :j+1].T @ w
+            w -= Q[:, :j+1] @ h
+            H[:j+1, j] += h
+        H[j+1, j] = np.linalg.norm(w)
+        if H[j+1, j] <= np.sqrt(np.finfo(float).eps)*np.abs(H[:j+1, j]).max():
+            # Invariant subspace found
+            k = j + 1
+            break
+        Q[:, j+1] = w / H[j+1, j]
+
+    return eigvals(H[:k, :k])
+
+
+def _column_compress(Z, tol=None):
+    '''
+    Removes the numerically redundant columns of Z without changing Z Z^T
+    via the singular values of the triangular factor of Z.
+    '''
+    if Z.shape[1] == 0:
+        return Z
+    Q, R = qr(Z, mode='economic')
+    U, sv, _ = svd(R)
+    if tol is None:
+        tol = max(Z.shape)*np.finfo(float).eps
+    r = np.count_nonzero(sv > tol*sv[0])
+    return Q @ (U[:, :r] * sv[:r])
+
+
+def _solve_continuous_generalized_lyapunov(A, E, Y):
+    '''
+    Solves
 
+                A.T X E + E.T X A + Y = 0
+
+    for symmetric Y
+    '''
+    # if the problem is small then solve directly
+    if A.shape[0] < 3:
+        return _solve_continuous_generalized_lyapunov_reduced(A, E, Y)
+
+    As, Es, Q, Z = qz(A, E)
+    Xs = _solve_continuous_generalized_lyapunov_reduced(As, Es, Z.T @ Y @ Z)
+    return Q @ Xs @ Q.T
+
+
+def _solve_continuous_generalized_lyapunov_reduced(As, Es, Ys, tol=1e-12):
+    '''
+    Solves the generalized continuous-time Lyapunov equation for the
+    upper quasi-triangular As and upper triangular Es of the QZ
+    decomposition.
+    '''
     # =============================
     # Prepare the data
     # =============================
 
-    # if the problem is small then solve directly
-    if A.shape[0] < 3:
-        return mini_sylvester(A, E, Y)
+    n = As.shape[0]
+    if n < 3:
+        return _mini_sylvester_generalized_continuous(As, Es, Ys)
+    if n > _lyapunov_block_size:
+        return _lyapunov_recursive(Ys, As, Es, form='c')
 
     # If there are nontrivial entries on the subdiagonal, we have a 2x2 block.
     # Based on that we have the block sizes `bz` and starting positions `bs`.
-    As, Es, Q, Z = qz(A, E)
-    Ys = Z.T @ Y @ Z
-    n = A.shape[0]
+    Ys = Ys.copy()
     subdiag_entries = np.abs(As[range(1, n), range(0, n-1)]) > tol
     subdiag_indices = [ind for ind, x in enumerate(subdiag_entries) if x]
     bz = np.ones(n)
@@ -201,7 +762,7 @@ def _solve_continuous_generalized_lyapunov(A, E, Y, tol=1e-12):
     bz = bz[~np.isnan(bz)].astype(int)
     bs = [0] + np.cumsum(bz[:-1]).tolist() + [None]
     total_blk = bz.size
-    Xs = np.empty_like(Y)
+    Xs = np.empty_like(Ys)
 
     # =============================
     #  Main Loop
@@ -227,9 +788,10 @@ def _solve_continuous_generalized_lyapunov(A, E, Y, tol=1e-12):
                             As[:thisr, thisr:nextr]
 
         # (**) Solve for the diagonal via Akk , Ekk , Ykk and place it in Xkk
-        tempx = mini_sylvester(As[thisr:nextr, thisr:nextr],
-                               Es[thisr:nextr, thisr:nextr],
-                               Ys[thisr:nextr, thisr:nextr])
+        tempx = _mini_sylvester_generalized_continuous(
+            As[thisr:nextr, thisr:nextr],
+            Es[thisr:nextr, thisr:nextr],
+            Ys[thisr:nextr, thisr:nextr])
 
         # Place it in the data
         Xs[thisr:nextr, thisr:nextr] = tempx
@@ -249,11 +811,12 @@ def _solve_continuous_generalized_lyapunov(A, E, Y, tol=1e-12):
             thisc = bs[col]
             nextc = bs[col+1]
             # The corresponding Y term has already been updated, solve for X
-            tempx = mini_sylvester(As[thisr:nextr, thisr:nextr],
-                                   Es[thisc:nextc, thisc:nextc],
-                                   Ys[thisr:nextr, thisc:nextc],
-                                   Es[thisr:nextr, thisr:nextr],
-                                   As[thisc:nextc, thisc:nextc])
+            tempx = _mini_sylvester_generalized_continuous(
+                As[thisr:nextr, thisr:nextr],
+                Es[thisc:nextc, thisc:nextc],
+                Ys[thisr:nextr, thisc:nextc],
+                Es[thisr:nextr, thisr:nextr],
+                As[thisc:nextc, thisc:nextc])
 
             # Place it in the data
             Xs[thisr:nextr, thisc:nextc] = tempx
@@ -279,77 +842,90 @@ def _solve_continuous_generalized_lyapunov(A, E, Y, tol=1e-12):
                 As[thisr:nextr, nextr:nextc].T @ XE_of_row[:, ugly_sl] + \
                 Es[thisr:nextr, nextr:nextc].T @ XA_of_row[:, ugly_sl]
 
-    return Q @ Xs @ Q.T
+    return Xs
 
 
-def _solve_discrete_generalized_lyapunov(A, E, Y, tol=1e-12):
+def _mini_sylvester_generalized_continuous(R, S, Yt, U=None, V=None):
     '''
-    Solves
-
-                A.T X A - E.T X E + Y = 0
+    A helper function to solve the 1x1 or 2x2 Sylvester equations
+    arising in the solution of the generalized continuous-time
+    Lyapunov equations
 
-    for symmetric Y
+    Note that, this doesn't have any protection against LinAlgError
+    hence the caller needs to `try` to see whether it is properly
+    executed.
     '''
     mat33 = np.zeros((3, 3), dtype=float)
     mat44 = np.zeros((4, 4), dtype=float)
+    if U is None:
+        if R.size == 1:
+            return -Yt / (2 * R * S)
+        else:
+            a, b, c, d = R.ravel().tolist()
+            e, f, g, h = S.ravel().tolist()
 
-    def mini_sylvester(S, V, Yt, R=None, U=None):
-        '''
-        A helper function to solve the 1x1 or 2x2 Sylvester equations
-        arising in the solution of the generalized continuous-time
-        Lyapunov equations
+            mat33[0, :] = [2*a*e, 2*(a*g + e*c), 2*c*g]
+            mat33[1, :] = [a*f + e*b, a*h + e*d + c*f + b*g, c*h + g*d]
+            mat33[2, :] = [2*b*f, 2*(b*h + f*d), 2*d*h]
 
-        Note that, this doesn't have any protection against LinAlgError
-        hence the caller needs to `try` to see whether it is properly
-        executed.
-        '''
-        if R is None:
-            if S.size == 1:
-                return -Yt / (S ** 2 - V ** 2)
-            else:
-                a, b, c, d = S.ravel().tolist()
-                e, f, g, h = V.ravel().tolist()
+            a, b, c = solve(mat33, -Yt.reshape(-1, 1)[[0, 1, 3], :]
+                            ).ravel().tolist()
 
-                mat33[0, :] = [a*a - e*e, 2 * (a*c - e*g), c*c - g*g]
-                mat33[1, :] = [a*b - e*f, a*d - e*h + c*b - g*f, c*d - g*h]
-                mat33[2, :] = [b*b - f*f, 2 * (b*d - f*h), d*d - h*h]
+            return np.array([[a, b], [b, c]], dtype=float)
 
-                a, b, c = solve(mat33, -Yt.reshape(-1, 1)[[0, 1, 3], :]
-                                ).ravel().tolist()
+    elif R.size == 4:
+        if S.size == 4:
+            a, b, c, d = R.reshape(1, 4).tolist()[0]
+            e, f, g, h = S.reshape(1, 4).tolist()[0]
+            k, l, m, n = U.reshape(1, 4).tolist()[0]
+            p, q, r, s = V.reshape(1, 4).tolist()[0]
 
-                return np.array([[a, b], [b, c]], dtype=float)
+            mat44[0, :] = [a*e + k*p, a*g + k*r, c*e + m*p, c*g + m*r]
+            mat44[1, :] = [a*f + k*q, a*h + k*s, c*f + m*q, c*h + m*s]
+            mat44[2, :] = [b*e + l*p, b*g + l*r, d*e + n*p, d*g + n*r]
+            mat44[3, :] = [b*f + l*q, b*h + l*s, d*f + n*q, d*h + n*s]
 
-        elif S.size == 4:
-            if R.size == 4:
-                a, b, c, d = R.ravel().tolist()
-                e, f, g, h = S.ravel().tolist()
-                k, l, m, n = U.ravel().tolist()
-                p, q, r, s = V.ravel().tolist()
+            return solve(mat44, -Yt.reshape(-1, 1)).reshape(2, 2)
+        else:
+            return solve(S[0, 0]*R.T + V[0, 0]*U.T, -Yt)
+    elif S.size == 4:
+        return solve(R[0, 0]*S.T+U[0, 0]*V.T, -Yt.T).T
+    else:
+        return -Yt / (R * S + U * V)
 
-                mat44[0, :] = [a*e - k*p, a*g - k*r, c*e - m*p, c*g - m*r]
-                mat44[1, :] = [a*f - k*q, a*h - k*s, c*f - m*q, c*h - m*s]
-                mat44[2, :] = [b*e - l*p, b*g - l*r, d*e - n*p, d*g - n*r]
-                mat44[3, :] = [b*f - l*q, b*h - l*s, d*f - n*q, d*h - n*s]
 
-                return solve(mat44, -Yt.reshape(-1, 1)).reshape(2, 2)
+def _solve_discrete_generalized_lyapunov(A, E, Y):
+    '''
+    Solves
 
-            else:
-                return solve(R[0, 0]*S.T - U[0, 0]*V.T, -Yt.T).T
-        elif R.size == 4:
-            return solve(S[0, 0]*R.T - V[0, 0]*U.T, -Yt)
-        else:
-            return -Yt / (R * S - U * V)
+                A.T X A - E.T X E + Y = 0
 
-    # =============================
-    # Prepare the data
-    # =============================
+    for symmetric Y
+    '''
     # if the problem is small then solve directly
     if A.shape[0] < 3:
-        return mini_sylvester(A, E, Y)
+        return _solve_discrete_generalized_lyapunov_reduced(A, E, Y)
+
+    As, Es, Q, Z = qz(A, E)
+    Xs = _solve_discrete_generalized_lyapunov_reduced(As, Es, Z.T @ Y @ Z)
+    return Q @ Xs @ Q.T
+
 
-    As, Es, Q, Z = qz(A, E, overwrite_a=True, overwrite_b=True)
-    Ys = Z.T @ Y @ Z
+def _solve_discrete_generalized_lyapunov_reduced(As, Es, Ys, tol=1e-12):
+    '''
+    Solves the generalized discrete-time Lyapunov equation for the upper
+    quasi-triangular As and upper triangular Es of the QZ decomposition.
+    '''
+    # =============================
+    # Prepare the data
+    # =============================
     n = As.shape[0]
+    if n < 3:
+        return _mini_sylvester_generalized_discrete(As, Es, Ys)
+    if n > _lyapunov_block_size:
+        return _lyapunov_recursive(Ys, As, Es, form='d')
+
+    Ys = Ys.copy()
     # If there are nontrivial entries on the subdiagonal, we have a 2x2 block.
     # Based on that we have the block sizes `bz` and starting positions `bs`.
 
@@ -363,7 +939,7 @@ def _solve_discrete_generalized_lyapunov(A, E, Y, tol=1e-12):
     bz = bz[~np.isnan(bz)].astype(int)
     bs = [0] + np.cumsum(bz[:-1]).tolist() + [None]
     total_blk = bz.size
-    Xs = np.empty_like(Y)
+    Xs = np.empty_like(Ys)
 
     # =============================
     #  Main Loop
@@ -390,9 +966,10 @@ def _solve_discrete_generalized_lyapunov(A, E, Y, tol=1e-12):
                 Es[:thisr, thisr:nextr]
 
         # (**) Solve for the diagonal via Akk , Ekk , Ykk and place it in Xkk
-        tempx = mini_sylvester(As[thisr:nextr, thisr:nextr],
-                               Es[thisr:nextr, thisr:nextr],
-                               Ys[thisr:nextr, thisr:nextr])
+        tempx = _mini_sylvester_generalized_discrete(
+            As[thisr:nextr, thisr:nextr],
+            Es[thisr:nextr, thisr:nextr],
+            Ys[thisr:nextr, thisr:nextr])
 
         # Place it in the data
         Xs[thisr:nextr, thisr:nextr] = tempx
@@ -414,11 +991,12 @@ def _solve_discrete_generalized_lyapunov(A, E, Y, tol=1e-12):
             nextc = bs[col+1]
 
             # The corresponding Y term has already been updated, solve for X
-            tempx = mini_sylvester(As[thisc:nextc, thisc:nextc],
-                                   Es[thisc:nextc, thisc:nextc],
-                                   Ys[thisr:nextr, thisc:nextc],
-                                   As[thisr:nextr, thisr:nextr],
-                                   Es[thisr:nextr, thisr:nextr])
+            tempx = _mini_sylvester_generalized_discrete(
+                As[thisc:nextc, thisc:nextc],
+                Es[thisc:nextc, thisc:nextc],
+                Ys[thisr:nextr, thisc:nextc],
+                As[thisr:nextr, thisr:nextr],
+                Es[thisr:nextr, thisr:nextr])
 
             # Place it in the data
             Xs[thisr:nextr, thisc:nextc] = tempx
@@ -444,74 +1022,87 @@ def _solve_discrete_generalized_lyapunov(A, E, Y, tol=1e-12):
                 As[thisr:nextr, nextr:nextc].T @ XA_of_row[:, ugly_sl] - \
                 Es[thisr:nextr, nextr:nextc].T @ XE_of_row[:, ugly_sl]
 
-    return Q @ Xs @ Q.T
+    return Xs
 
 
-def _solve_continuous_lyapunov(A, Y):
+def _mini_sylvester_generalized_discrete(S, V, Yt, R=None, U=None):
     '''
-            Solves A.T X + X A + Y = 0
+    A helper function to solve the 1x1 or 2x2 Sylvester equations
+    arising in the solution of the generalized continuous-time
+    Lyapunov equations
 
+    Note that, this doesn't have any protection against LinAlgError
+    hence the caller needs to `try` to see whether it is properly
+    executed.
     '''
     mat33 = np.zeros((3, 3), dtype=float)
     mat44 = np.zeros((4, 4), dtype=float)
-    i2 = np.eye(2, dtype=float)
+    if R is None:
+        if S.size == 1:
+            return -Yt / (S ** 2 - V ** 2)
+        else:
+            a, b, c, d = S.ravel().tolist()
+            e, f, g, h = V.ravel().tolist()
 
-    def mini_sylvester(Ar, Yt, Al=None):
-        '''
-        A helper function to solve the 1x1 or 2x2 Sylvester equations
-        arising in the solution of the continuous-time Lyapunov equations
+            mat33[0, :] = [a*a - e*e, 2 * (a*c - e*g), c*c - g*g]
+            mat33[1, :] = [a*b - e*f, a*d - e*h + c*b - g*f, c*d - g*h]
+            mat33[2, :] = [b*b - f*f, 2 * (b*d - f*h), d*d - h*h]
 
-        Note that, this doesn't have any protection against LinAlgError
-        hence the caller needs to `try` to see whether it is properly
-        executed.
-        '''
+            a, b, c = solve(mat33, -Yt.reshape(-1, 1)[[0, 1, 3], :]
+                            ).ravel().tolist()
 
-        # The symmetric problem
-        if Al is None:
-            if Ar.size == 1:
-                return - Yt / (Ar * 2)
-            else:
-                a, b, c, d = Ar.reshape(1, 4).tolist()[0]
+            return np.array([[a, b], [b, c]], dtype=float)
 
-                mat33[0, :] = [2*a, 2*c, 0]
-                mat33[1, :] = [b, a + d, c]
-                mat33[2, :] = [0, 2*b, 2*d]
-                a, b, c = solve(mat33, -Yt.reshape(-1, 1)[[0, 1, 3], :]
-                                ).ravel().tolist()
+    elif S.size == 4:
+        if R.size == 4:
+            a, b, c, d = R.ravel().tolist()
+            e, f, g, h = S.ravel().tolist()
+            k, l, m, n = U.ravel().tolist()
+            p, q, r, s = V.ravel().tolist()
 
-                return np.array([[a, b], [b, c]], dtype=float)
+            mat44[0, :] = [a*e - k*p, a*g - k*r, c*e - m*p, c*g - m*r]
+            mat44[1, :] = [a*f - k*q, a*h - k*s, c*f - m*q, c*h - m*s]
+            mat44[2, :] = [b*e - l*p, b*g - l*r, d*e - n*p, d*g - n*r]
+            mat44[3, :] = [b*f - l*q, b*h - l*s, d*f - n*q, d*h - n*s]
 
-        # Nonsymmetric
-        elif Ar.size == 4:
-            if Al.size == 4:
-                a00, a01, a10, a11 = Al.reshape(1, 4).tolist()[0]
-                b00, b01, b10, b11 = Ar.reshape(1, 4).tolist()[0]
+            return solve(mat44, -Yt.reshape(-1, 1)).reshape(2, 2)
 
-                mat44[0, :] = [a00+b00, b10, a10, 0]
-                mat44[1, :] = [b01, a00 + b11, 0, a10]
-                mat44[2, :] = [a01, 0, a11 + b00, b10]
-                mat44[3, :] = [0, a01, b01, a11 + b11]
+        else:
+            return solve(R[0, 0]*S.T - U[0, 0]*V.T, -Yt.T).T
+    elif R.size == 4:
+        return solve(S[0, 0]*R.T - V[0, 0]*U.T, -Yt)
+    else:
+        return -Yt / (R * S - U * V)
 
-                return solve(mat44, -Yt.reshape(-1, 1)).reshape(2, 2)
-            # Ar is 2x2 , Al is scalar
-            else:
-                return solve(Ar.T + Al[0, 0] * i2, -Yt.T).T
 
-        elif Al.size == 4:
-            return solve(Al.T + Ar[0, 0] * i2, -Yt)
-        else:
-            return -Yt / (Ar + Al)
+def _solve_continuous_lyapunov(A, Y):
+    '''
+            Solves A.T X + X A + Y = 0
 
-    # =============================
-    # Prepare the data
-    # =============================
+    '''
     # if the problem is small then solve directly
     if A.shape[0] < 3:
-        return mini_sylvester(A, Y)
+        return _solve_continuous_lyapunov_reduced(A, Y)
 
     As, S = schur(A, output='real')
-    Ys = S.T @ Y @ S
+    return S @ _solve_continuous_lyapunov_reduced(As, S.T @ Y @ S) @ S.T
+
+
+def _solve_continuous_lyapunov_reduced(As, Ys):
+    '''
+    Solves the continuous-time Lyapunov equation for the upper
+    quasi-triangular As of the real Schur form.
+    '''
+    # =============================
+    # Prepare the data
+    # =============================
     n = As.shape[0]
+    if n < 3:
+        return _mini_sylvester_continuous(As, Ys)
+    if n > _lyapunov_block_size:
+        return _lyapunov_recursive(Ys, As, form='c')
+
+    Ys = Ys.copy()
 
     # If there are nontrivial entries on the subdiagonal, we have a 2x2 block.
     # Based on that we have the block sizes `bz` and starting positions `bs`.
@@ -526,7 +1117,7 @@ def _solve_continuous_lyapunov(A, Y):
     bz = bz[~np.isnan(bz)].astype(int)
     bs = [0] + np.cumsum(bz[:-1]).tolist() + [None]
     total_blk = bz.size
-    Xs = np.empty_like(Y)
+    Xs = np.empty_like(Ys)
 
     # =============================
     #  Main Loop
@@ -546,8 +1137,9 @@ def _solve_continuous_lyapunov(A, Y):
                       Xs[thisr:nextr, 0:thisr] @ As[0:thisr, thisr:]
 
         # (**) Solve for the diagonal via Akk , Ykk and place it in Xkk
-        tempx = mini_sylvester(As[thisr:nextr, thisr:nextr],
-                               Ys[thisr:nextr, thisr:nextr])
+        tempx = _mini_sylvester_continuous(
+            As[thisr:nextr, thisr:nextr],
+            Ys[thisr:nextr, thisr:nextr])
 
 #        X_placer( tempx , row , row )
         Xs[thisr:nextr, thisr:nextr] = tempx
@@ -560,9 +1152,10 @@ def _solve_continuous_lyapunov(A, Y):
             nextc = bs[col+1]
 
             # The corresponding Y term has already been updated, solve for X
-            tempx = mini_sylvester(As[thisc:nextc, thisc:nextc],
-                                   Ys[thisr:nextr, thisc:nextc],
-                                   As[thisr:nextr, thisr:nextr])
+            tempx = _mini_sylvester_continuous(
+                As[thisc:nextc, thisc:nextc],
+                Ys[thisr:nextr, thisc:nextc],
+                As[thisr:nextr, thisr:nextr])
 
             # Place it in the data
             Xs[thisr:nextr, thisc:nextc] = tempx
@@ -575,72 +1168,110 @@ def _solve_continuous_lyapunov(A, Y):
             Ys[nextr:nextc, thisc:nextc] += \
                 As[thisr:nextr, nextr:nextc].T @ tempx
 
-    return S @ Xs @ S.T
+    return Xs
 
 
-def _solve_discrete_lyapunov(A, Y):
+def _mini_sylvester_continuous(Ar, Yt, Al=None):
     '''
-                 Solves     A.T X A - X + Y = 0
+    A helper function to solve the 1x1 or 2x2 Sylvester equations
+    arising in the solution of the continuous-time Lyapunov equations
+
+    Note that, this doesn't have any protection against LinAlgError
+    hence the caller needs to `try` to see whether it is properly
+    executed.
     '''
     mat33 = np.zeros((3, 3), dtype=float)
     mat44 = np.zeros((4, 4), dtype=float)
-    i2 = np.eye(2)
+    i2 = np.eye(2, dtype=float)
 
-    def mini_sylvester(Al, Yt, Ar=None):
-        '''
-        A helper function to solve the 1x1 or 2x2 Sylvester equations
-        arising in the solution of the continuous-time Lyapunov equations
+    # The symmetric problem
+    if Al is None:
+        if Ar.size == 1:
+            return - Yt / (Ar * 2)
+        else:
+            a, b, c, d = Ar.reshape(1, 4).tolist()[0]
 
-        Note that, this doesn't have any protection against LinAlgError
-        hence the caller needs to `try` to see whether it is properly
-        executed.
-        '''
-        # The symmetric problem
-        if Ar is None:
-            if Al.size == 1:
-                return - Yt / (Al ** 2 - 1)
-            else:
-                a, b, c, d = Al.reshape(1, 4).tolist()[0]
+            mat33[0, :] = [2*a, 2*c, 0]
+            mat33[1, :] = [b, a + d, c]
+            mat33[2, :] = [0, 2*b, 2*d]
+            a, b, c = solve(mat33, -Yt.reshape(-1, 1)[[0, 1, 3], :]
+                            ).ravel().tolist()
 
-                mat33[0, :] = [a**2 - 1, 2*a*c, c ** 2]
-                mat33[1, :] = [a*b, a*d + b*c - 1, c*d]
-                mat33[2, :] = [b ** 2, 2*b*d, d ** 2 - 1]
-                a, b, c = solve(mat33, -Yt.reshape(-1, 1)[[0, 1, 3], :]
-                                ).ravel().tolist()
+            return np.array([[a, b], [b, c]], dtype=float)
 
-                return np.array([[a, b], [b, c]], dtype=float)
+    # Nonsymmetric
+    elif Ar.size == 4:
+        if Al.size == 4:
+            a00, a01, a10, a11 = Al.reshape(1, 4).tolist()[0]
+            b00, b01, b10, b11 = Ar.reshape(1, 4).tolist()[0]
 
-        # Nonsymmetric
-        elif Al.size == 4:
-            if Ar.size == 4:
-                a00, a01, a10, a11 = Al.ravel().tolist()
-                b00, b01, b10, b11 = Ar.ravel().tolist()
+            mat44[0, :] = [a00+b00, b10, a10, 0]
+            mat44[1, :] = [b01, a00 + b11, 0, a10]
+            mat44[2, :] = [a01, 0, a11 + b00, b10]
+            mat44[3, :] = [0, a01, b01, a11 + b11]
 
-                mat44[0, :] = [a00*b00 - 1, a00*b10, a10*b00, a10*b10]
-                mat44[1, :] = [a00*b01, a00*b11 - 1, a10*b01, a10*b11]
-                mat44[2, :] = [a01*b00, a01*b10, a11*b00 - 1, a11*b10]
-                mat44[3, :] = [a01*b01, a01*b11, a11*b01, a11*b11 - 1]
+            return solve(mat44, -Yt.reshape(-1, 1)).reshape(2, 2)
+        # Ar is 2x2 , Al is scalar
+        else:
+            return solve(Ar.T + Al[0, 0] * i2, -Yt.T).T
 
-                return solve(mat44, -Yt.reshape(-1, 1)).reshape(2, 2)
-            else:
-                return solve(Al.T * Ar[0, 0] - i2, -Yt)
+    elif Al.size == 4:
+        return solve(Al.T + Ar[0, 0] * i2, -Yt)
+    else:
+        return -Yt / (Ar + Al)
 
-        elif Ar.size == 4:
-            return solve(Ar.T * Al[0, 0] - i2, -Yt.T).T
-        else:
-            return -Yt / (Ar * Al - 1)
 
-    # =====================================
+def _solve_discrete_lyapunov_doubling(A, Y, tol=1e-14):
+    '''
+    Solves A.T X A - X + Y = 0 via the doubling iteration. Returns None if
+    the iteration does not converge within the number of steps that is
+    sufficient for the spectral radius `_doubling_radius_limit`.
+    '''
+    X = Y.astype(float)
+    Ak = A.astype(float)
+    max_iter = int(np.ceil(np.log2(np.log(tol) /
+                                   np.log(_doubling_radius_limit)))) + 1
+    with np.errstate(over='ignore', invalid='ignore'):
+        for _ in range(max_iter):
+            dX = Ak.T @ X @ Ak
+            X += dX
+            if not np.isfinite(dX).all():
+                return None
+            if np.abs(dX).max() <= tol * np.abs(X).max():
+                return X
+            Ak = Ak @ Ak
+
+    return None
+
 
+def _solve_discrete_lyapunov(A, Y):
+    '''
+                 Solves     A.T X A - X + Y = 0
+    '''
     if A.shape[0] < 3:
-        return mini_sylvester(A, Y)
+        return _solve_discrete_lyapunov_reduced(A, Y)
 
     As, S = schur(A, output='real')
-    Ys = S.T @ Y @ S
+    return S @ _solve_discrete_lyapunov_reduced(As, S.T @ Y @ S) @ S.T
+
+
+def _solve_discrete_lyapunov_reduced(As, Ys):
+    '''
+    Solves the discrete-time Lyapunov equation for the upper
+    quasi-triangular As of the real Schur form.
+    '''
+    # =====================================
+
+    n = As.shape[0]
+    if n < 3:
+        return _mini_sylvester_discrete(As, Ys)
+    if n > _lyapunov_block_size:
+        return _lyapunov_recursive(Ys, As, form='d')
+
+    Ys = Ys.copy()
 
     # If there are nontrivial entries on the subdiagonal, we have a 2x2 block.
     # Based on that we have the block sizes `bz` and starting positions `bs`.
-    n = As.shape[0]
     subdiag_entries = np.abs(As[range(1, n), range(0, n-1)]) > 0
     subdiag_indices = [ind for ind, x in enumerate(subdiag_entries) if x]
     bz = np.ones(n)
@@ -651,7 +1282,7 @@ def _solve_discrete_lyapunov(A, Y):
     bz = bz[~np.isnan(bz)].astype(int)
     bs = [0] + np.cumsum(bz[:-1]).tolist() + [None]
     total_blk = bz.size
-    Xs = np.empty_like(Y)
+    Xs = np.empty_like(Ys)
 
     # =============================
     #  Main Loop
@@ -672,8 +1303,9 @@ def _solve_discrete_lyapunov(A, Y):
                 As[:thisr, thisr:nextr]
 
         # (**) Solve for the diagonal via Akk , Ykk and place it in Xkk
-        tempx = mini_sylvester(As[thisr:nextr, thisr:nextr],
-                               Ys[thisr:nextr, thisr:nextr])
+        tempx = _mini_sylvester_discrete(
+            As[thisr:nextr, thisr:nextr],
+            Ys[thisr:nextr, thisr:nextr])
 
         Xs[thisr:nextr, thisr:nextr] = tempx
         XA_of_row = Xs[thisr:nextr, :nextr] @ As[:nextr, thisr:]
@@ -687,9 +1319,10 @@ def _solve_discrete_lyapunov(A, Y):
             nextc = bs[col+1]
 
             # The corresponding Y term has already been updated, solve for X
-            tempx = mini_sylvester(As[thisr:nextr, thisr:nextr],
-                                   Ys[thisr:nextr, thisc:nextc],
-                                   As[thisc:nextc, thisc:nextc])
+            tempx = _mini_sylvester_discrete(
+                As[thisr:nextr, thisr:nextr],
+                Ys[thisr:nextr, thisc:nextc],
+                As[thisc:nextc, thisc:nextc])
 
             # Place it in the data
             Xs[thisr:nextr, thisc:nextc] = tempx
@@ -709,4 +1342,194 @@ def _solve_discrete_lyapunov(A, Y):
             Ys[nextr:nextc, thisc:nextc] += \
                 As[thisr:nextr, nextr:nextc].T @ XA_of_row[:, ugly_sl]
 
-    return S @ Xs @ S.T
+    return Xs
+
+
+def _mini_sylvester_discrete(Al, Yt, Ar=None):
+    '''
+    A helper function to solve the 1x1 or 2x2 Sylvester equations
+    arising in the solution of the continuous-time Lyapunov equations
+
+    Note that, this doesn't have any protection against LinAlgError
+    hence the caller needs to `try` to see whether it is properly
+    executed.
+    '''
+    mat33 = np.zeros((3, 3), dtype=float)
+    mat44 = np.zeros((4, 4), dtype=float)
+    i2 = np.eye(2)
+    # The symmetric problem
+    if Ar is None:
+        if Al.size == 1:
+            return - Yt / (Al ** 2 - 1)
+        else:
+            a, b, c, d = Al.reshape(1, 4).tolist()[0]
+
+            mat33[0, :] = [a**2 - 1, 2*a*c, c ** 2]
+            mat33[1, :] = [a*b, a*d + b*c - 1, c*d]
+            mat33[2, :] = [b ** 2, 2*b*d, d ** 2 - 1]
+            a, b, c = solve(mat33, -Yt.reshape(-1, 1)[[0, 1, 3], :]
+                            ).ravel().tolist()
+
+            return np.array([[a, b], [b, c]], dtype=float)
+
+    # Nonsymmetric
+    elif Al.size == 4:
+        if Ar.size == 4:
+            a00, a01, a10, a11 = Al.ravel().tolist()
+            b00, b01, b10, b11 = Ar.ravel().tolist()
+
+            mat44[0, :] = [a00*b00 - 1, a00*b10, a10*b00, a10*b10]
+            mat44[1, :] = [a00*b01, a00*b11 - 1, a10*b01, a10*b11]
+            mat44[2, :] = [a01*b00, a01*b10, a11*b00 - 1, a11*b10]
+            mat44[3, :] = [a01*b01, a01*b11, a11*b01, a11*b11 - 1]
+
+            return solve(mat44, -Yt.reshape(-1, 1)).reshape(2, 2)
+        else:
+            return solve(Al.T * Ar[0, 0] - i2, -Yt)
+
+    elif Ar.size == 4:
+        return solve(Ar.T * Al[0, 0] - i2, -Yt.T).T
+    else:
+        return -Yt / (Ar * Al - 1)
+
+
+def _lyapunov_recursive(Y, A, E=None, form='c'):
+    '''
+    Solves the Lyapunov equations with upper quasi-triangular A and upper
+    triangular E (identity if None)
+
+        A.T X E + E.T X A + Y = 0    (form='c')
+        A.T X A - E.T X E + Y = 0    (form='d')
+
+    by splitting the problem into halves
+
+        [A11 A12]  [X11  X12]
+        [    A22], [X12' X22]
+
+    X11 is solved recursively, then X12 from a Sylvester equation and X22
+    recursively after the contributions of X11 and X12 are moved to the
+    right hand side. Hence most of the work is done by matrix products.
+    Diagonal blocks of at most `_lyapunov_block_size` are solved by the
+    block-walking solvers.
+    '''
+    n = Y.shape[0]
+    if n <= _lyapunov_block_size:
+        if E is None:
+            if form == 'c':
+                return _solve_continuous_lyapunov_reduced(A, Y)
+            return _solve_discrete_lyapunov_reduced(A, Y)
+        if form == 'c':
+            return _solve_continuous_generalized_lyapunov_reduced(A, E, Y)
+        return _solve_discrete_generalized_lyapunov_reduced(A, E, Y)
+
+    k = _quasi_triangular_split(A)
+    M11, M12, M22 = _block_partition((A, E), k)
+    X11 = _lyapunov_recursive(Y[:k, :k], *M11, form=form)
+
+    # Right hand side of the Sylvester equation for X12
+    C12 = Y[:k, k:].copy()
+    for li, ri, sgn in _lyapunov_terms[form]:
+        if M12[ri] is not None:
+            C12 += sgn * _tr_product(M11[li], X11, M12[ri])
+    X12 = _sylvester_recursive(C12, M11, M22, form)
+
+    # Move the known parts of X to the right hand side of X22
+    Y22 = Y[k:, k:].copy()
+    for li, ri, sgn in _lyapunov_terms[form]:
+        if M12[li] is not None:
+            Y22 += sgn * _tr_product(M12[li], X12, M22[ri])
+            if M12[ri] is not None:
+                Y22 += sgn * _tr_product(M12[li], X11, M12[ri])
+        if M12[ri] is not None:
+            Y22 += sgn * _tr_product(M22[li], X12.T, M12[ri])
+    X22 = _lyapunov_recursive(Y22, *M22, form=form)
+
+    return np.block([[X11, X12], [X12.T, X22]])
+
+
+def _sylvester_recursive(C, ML, MR, form='c'):
+    '''
+    Solves the Sylvester equations that couple the diagonal blocks of the
+    Lyapunov equations with ML = (AL, EL) and MR = (AR, ER)
+
+        AL.T X ER + EL.T X AR + C = 0    (form='c')
+        AL.T X AR - EL.T X ER + C = 0    (form='d')
+
+    The larger dimension is split until the blocks are small enough to be
+    solved as a linear system in the Kronecker form.
+    '''
+    m, n = C.shape
+    terms = _lyapunov_terms[form]
+    if m <= 2 and n <= 2 and ML[1] is None and MR[1] is None:
+        # Single diagonal blocks of the regular equations
+        if form == 'c':
+            return _mini_sylvester_continuous(MR[0], C, ML[0])
+        return _mini_sylvester_discrete(ML[0], C, MR[0])
+
+    if m <= _sylvester_block_size and n <= _sylvester_block_size:
+        # K = sum of sgn * kron(R.T, L.T) formed via broadcasting
+        K = np.zeros((n, m, n, m), dtype=float)
+        im, in_ = np.eye(m), np.eye(n)
+        for li, ri, sgn in terms:
+            L = im if ML[li] is None else ML[li]
+            R = in_ if MR[ri] is None else MR[ri]
+            K += sgn * R.T[:, None, :, None] * L.T[None, :, None, :]
+        K = K.reshape(m*n, m*n)
+        x = solve(K, -C.reshape(-1, 1, order='F'))
+        return x.reshape(m, n, order='F')
+
+    if m >= n:
+        k = _quasi_triangular_split(ML[0])
+        L11, L12, L22 = _block_partition(ML, k)
+        X1 = _sylvester_recursive(C[:k, :], L11, MR, form)
+        C2 = C[k:, :].copy()
+        for li, ri, sgn in terms:
+            if L12[li] is not None:
+                C2 += sgn * _tr_product(L12[li], X1, MR[ri])
+        X2 = _sylvester_recursive(C2, L22, MR, form)
+        return np.vstack([X1, X2])
+    else:
+        k = _quasi_triangular_split(MR[0])
+        R11, R12, R22 = _block_partition(MR, k)
+        X1 = _sylvester_recursive(C[:, :k], ML, R11, form)
+        C2 = C[:, k:].copy()
+        for li, ri, sgn in terms:
+            if R12[ri] is not None:
+                C2 += sgn * _tr_product(ML[li], X1, R12[ri])
+        X2 = _sylvester_recursive(C2, ML, R22, form)
+        return np.hstack([X1, X2])
+
+
+# The Lyapunov operators as sums of L.T X R with (L, R, sign) where 0, 1
+# index into (A, E)
+_lyapunov_terms = {'c': ((0, 1, 1.), (1, 0, 1.)),
+                   'd': ((0, 0, 1.), (1, 1, -1.))}
+
+
+def _quasi_triangular_split(A):
+    '''
+    Returns the index that splits A roughly in half without cutting through
+    a 2x2 diagonal block.
+    '''
+    k = A.shape[0] // 2
+    return k + 1 if A[k, k-1] != 0. else k
+
+
+def _block_partition(M, k):
+    '''
+    Partitions each of the matrices in M at index k into the diagonal and
+    the upper off-diagonal blocks. None denotes the identity matrix hence
+    its off-diagonal block is zero which is also marked with None.
+    '''
+    M11 = tuple(None if m is None else m[:k, :k] for m in M)
+    M12 = tuple(None if m is None else m[:k, k:] for m in M)
+    M22 = tuple(None if m is None else m[k:, k:] for m in M)
+    return M11, M12, M22
+
+
+def _tr_product(L, X, R):
+    '''
+    Computes L.T @ X @ R where None stands for the identity matrix.
+    '''
+    X = X if L is None else L.T @ X
+    return X if R is None else X @ R
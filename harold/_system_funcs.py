@@ -27,6 +27,7 @@ from numpy.linalg import cond, eig, norm
 from scipy.linalg import svdvals, qr, block_diag
 from ._aux_linalg import haroldsvd, matrix_slice, e_i
 from ._classes import *
+from ._classes import _reject_sparse
 
 """
 TODO Though the descriptor code also works up-to-production, I truncated
@@ -331,6 +332,7 @@ def minimal_realization(G, tol=1e-6):
         if G._isgain:
             return G
 
+        _reject_sparse(G, 'minimal_realization')
         A, B, C, D = G.matrices
         Am, Bm, Cm = _minimal_realization_state(A, B, C, tol=tol)
         return State(Am, Bm, Cm, D, dt=G.SamplingPeriod)
@@ -21,14 +21,33 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
+import os
+import warnings
 import numpy as np
-from ._frequency_domain import frequency_response
-from ._classes import Transfer, State, transfer_to_state
-from ._solvers import lyapunov_eq_solver
-from ._system_funcs import minimal_realization
-from scipy.linalg import solve, eigvals
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from numpy.linalg import LinAlgError
+from ._frequency_domain import (FrequencyResponsePlan,
+                                _frequency_response_reduce)
+from ._classes import (Transfer, State, transfer_to_state, _reject_sparse,
+                       _rightmost_poles)
+from ._solvers import (lyapunov_eq_solver, lyapunov_lowrank_solver,
+                       lyapunov_cholesky_solver)
+from scipy.linalg import (solve, eigvals, lu_factor, lu_solve, svdvals,
+                          expm)
+from scipy.sparse.linalg import eigs, ArpackNoConvergence
+from scipy.optimize import minimize_scalar
 
-__all__ = ['system_norm']
+__all__ = ['system_norm', 'system_norm_batch', 'hankel_singular_values',
+           'dominant_poles']
+
+# Number of states up to which the dense Hamiltonian iteration is the default
+_hinf_dense_limit = 40
+
+# Points per decade of the coarse grid screening of the H-infinity peak
+_hinf_grid_density = 20
+
+# Number of states above which the H2 norm uses the low-rank gramian factors
+_h2_lowrank_limit = 1000
 
 
 def system_norm(state_or_transfer,
@@ -37,24 +56,43 @@ def system_norm(state_or_transfer,
                 verbose=False,
                 max_iter_limit=100,
                 hinf_tolerance=1e-10,
-                eig_tolerance=1e-12
+                eig_tolerance=1e-12,
+                hinf_method='auto',
+                warm_start=None,
+                return_frequency=False,
+                l1_tolerance=1e-6,
+                h2_method='auto'
                 ):
     """
     Computes the system p-norm. Currently, no balancing is done on the
     system, however in the future, a scaling of some sort will be introduced.
     Another short-coming is that while sounding general, only
     :math:`\\mathcal{H}_2` and :math:`\\mathcal{H}_\\infty`
-    norm are understood.
+    norm and the :math:`\\mathcal{L}_1` norm of the impulse response are
+    understood.
 
     For :math:`\\mathcal{H}_2` norm, the standard grammian definition via
-    controllability grammian, that can be found elsewhere is used.
+    controllability grammian, that can be found elsewhere is used. For
+    large continuous-time models, a low-rank factor of the gramian is
+    computed with the LR-ADI iteration instead of the dense solution.
 
-    Currently, the :math:`\\mathcal{H}_\\infty` norm is computed via
-    so-called Boyd-Balakhrishnan-Bruinsma-Steinbuch algorithm (See e.g. [2]).
+    The :math:`\\mathcal{H}_\\infty` norm is computed via either the
+    so-called Boyd-Balakhrishnan-Bruinsma-Steinbuch algorithm (See e.g. [2])
+    or, (with kind and generous help of Melina Freitag) the implicit
+    determinant method given in [1]. The Hamiltonian eigenvalue problems
+    of the former can be solved with the structure-preserving
+    square-reduced method of Van Loan [3]. For discrete-time systems, the
+    Hamiltonian is replaced with the symplectic pencil whose unit circle
+    eigenvalues give the level crossings, with the same convergence
+    controls.
 
-    However, (with kind and generous help of Melina Freitag) the algorithm
-    given in [1] is being implemented and depending on the speed benefit
-    might be replaced as the default.
+    The :math:`\\mathcal{L}_1` norm (``p=1``) is the induced peak-to-peak
+    gain, i.e., the largest row sum of the integrated (or summed for
+    discrete-time systems) absolute impulse responses including the
+    feedthrough term. It is estimated by stepping the impulse response
+    with the exact discretization of the model over a horizon that is
+    set by the decay rate of the slowest pole and extended until the
+    tail is negligible.
 
     [1] M.A. Freitag, A Spence, P. Van Dooren: Calculating the
     :math:`\\mathcal{H}_\\infty`-norm using the implicit determinant method.
@@ -64,6 +102,10 @@ def system_norm(state_or_transfer,
     :math:`\\mathcal{H}_\\infty`-norm of transfer function. System and Control
     Letters, 14, 1990
 
+    [3] C. Van Loan: A symplectic method for approximating all the
+    eigenvalues of a Hamiltonian matrix. Linear Algebra and its
+    Applications, 61, 1984
+
     Parameters
     ----------
     state_or_transfer : {State,Transfer}
@@ -92,7 +134,42 @@ def system_norm(state_or_transfer,
         The algorithm relies on checking the eigenvalues of the Hamiltonian
         being on the imaginary axis or not. This value is the threshold
         such that the absolute real value of the eigenvalues smaller than
-        this value will be accepted as pure imaginary eigenvalues.
+        this value will be accepted as pure imaginary eigenvalues. The
+        threshold is relative to the magnitude for eigenvalues larger
+        than one.
+
+    hinf_method: str
+        The algorithm used for the H-infinity norm of continuous-time
+        systems. 'bbbs' is the level set iteration with the dense
+        eigenvalue solver and 'hamiltonian' with the structure-preserving
+        one which gives exactly paired eigenvalues but is slower. 'implicit'
+        locates the peaks with the implicit determinant method and only
+        certifies the result with a Hamiltonian eigenvalue problem which is
+        typically several times faster for large models. The default
+        'auto' picks 'bbbs' for the models with at most 40 states and
+        'implicit' otherwise.
+
+    warm_start: float, array_like
+        For Hinf norm, the peak frequency (or frequencies) of a previous
+        computation, e.g., of a slowly varying model in a loop. These are
+        screened and locally refined together with the coarse grid hence
+        typically a single certification step suffices.
+
+    return_frequency: boolean
+        If True, for Hinf norm, the frequency of the peak is also returned
+        which can be passed as ``warm_start`` to the next computation.
+
+    l1_tolerance: float
+        For L1 norm, the relative accuracy that determines the time step
+        and the truncation of the impulse response.
+
+    h2_method: str
+        For H2 norm of continuous-time systems, 'dense' solves the
+        Lyapunov equation of the gramian and 'lowrank' computes a low-rank
+        factor of it via ``lyapunov_lowrank_solver``. The default 'auto'
+        picks 'lowrank' for the sparse models and the models with more
+        than 1000 states. Sparse models only support the H2 norm of
+        continuous-time models via 'lowrank'.
 
     Returns
     -------
@@ -100,8 +177,9 @@ def system_norm(state_or_transfer,
         Computed norm. In NumPy, infinity is also float-type
 
     omega : float
-        For Hinf norm, omega is the frequency where the maximum is attained
-        (technically this is a numerical approximation of the supremum).
+        For Hinf norm and if ``return_frequency`` is True, omega is the
+        frequency where the maximum is attained (technically this is a
+        numerical approximation of the supremum).
 
     """
     if not isinstance(state_or_transfer, (State, Transfer)):
@@ -109,11 +187,25 @@ def system_norm(state_or_transfer,
                         'I received {0}'.format(type(
                                     state_or_transfer).__qualname__))
 
+    if hinf_method not in ('auto', 'bbbs', 'hamiltonian', 'implicit'):
+        raise ValueError('The "hinf_method" keyword can only be "auto", '
+                         '"bbbs", "hamiltonian" or "implicit". I don\'t know '
+                         '"{0}".'.format(hinf_method))
+
     if isinstance(state_or_transfer, Transfer):
         now_state = transfer_to_state(state_or_transfer)
     else:
         now_state = state_or_transfer
 
+    if h2_method not in ('auto', 'dense', 'lowrank'):
+        raise ValueError('The "h2_method" keyword can only be "auto", '
+                         '"dense" or "lowrank". I don\'t know '
+                         '"{0}".'.format(h2_method))
+
+    if now_state._isstable is None:
+        raise ValueError('The stability of the sparse model is undecided '
+                         'hence its norm can not be computed.')
+
     if not isinstance(p, (int, float)):
         raise('The p in p-norm is not an integer or float.'
               'If you tried the string \'inf\', use Numpy.Inf instead')
@@ -133,110 +225,1019 @@ def system_norm(state_or_transfer,
 
         if now_state.SamplingSet == 'R':
             a, b, c = now_state.matrices[:3]
-            x = lyapunov_eq_solver(a, b.dot(b.T))
+            # Sparse models can only use the low-rank factors
+            if h2_method == 'lowrank' or (h2_method == 'auto' and (
+                    now_state._issparse or a.shape[0] > _h2_lowrank_limit)):
+                # Only the thin B and C matrices are needed as arrays
+                if now_state._issparse:
+                    b, c = b.toarray(), c.toarray()
+                # The cost grows with the columns of the factor hence the
+                # gramian with the thinner constant term is used.
+                if b.shape[1] <= c.shape[0]:
+                    z = lyapunov_lowrank_solver(a.T, b)
+                    return np.linalg.norm(c @ z)
+                else:
+                    z = lyapunov_lowrank_solver(a, c.T)
+                    return np.linalg.norm(z.T @ b)
+            _reject_sparse(now_state, 'system_norm')
+            # Controllability gramian A X + X A^T + B B^T = 0
+            x = lyapunov_eq_solver(a.T, b.dot(b.T))
             return np.sqrt(np.trace(c.dot(x.dot(c.T))))
+        elif h2_method == 'lowrank':
+            raise ValueError('The "lowrank" H2 method is only available for '
+                             'continuous-time models.')
         else:
+            _reject_sparse(now_state, 'system_norm')
             a, b, c, d = now_state.matrices
-            x = lyapunov_eq_solver(a, b.dot(b.T), form='d')
+            x = lyapunov_eq_solver(a.T, b.dot(b.T), form='d')
             return np.sqrt(np.trace(c.dot(x.dot(c.T))+d.dot(d.T)))
 
     elif np.isinf(p):
+        _reject_sparse(now_state, 'system_norm')
         if not now_state._isstable:
-            return np.Inf, None
+            return (np.Inf, None) if return_frequency else np.Inf
 
-        a, b, c, d = now_state.matrices
+        gamma, omega = _hinf_norm(now_state, method=hinf_method,
+                                  max_iter_limit=max_iter_limit,
+                                  hinf_tolerance=hinf_tolerance,
+                                  eig_tolerance=eig_tolerance,
+                                  verbose=verbose, warm_start=warm_start)
 
-        # Initial gamma0 guess
-        # Get the max of the largest svd of either
-        #   - feedthrough matrix
-        #   - G(iw) response at the pole with smallest damping
-        #   - G(iw) at w = 0
+        return (gamma, omega) if return_frequency else gamma
 
-        # We only need the svd vals hence call numpy svd
-        lb1 = np.max(np.linalg.svd(d, compute_uv=False))
+    elif p == 1:
+        _reject_sparse(now_state, 'system_norm')
+        if not now_state._isstable:
+            return np.Inf
 
-        # Formula (4.3) given in Bruinsma, Steinbuch Sys.Cont.Let. (1990)
-        if any(np.abs(np.imag(now_state.poles) > 1e-5)):
-            low_damp_freq = np.abs(now_state.poles[np.argmax([
-                                      np.abs(np.imag(x)/np.real(x)/np.abs(x)
-                                             ) for x in now_state.poles])])
-        else:
-            low_damp_freq = np.min(np.abs(now_state.poles))
+        return _l1_norm(now_state, tol=l1_tolerance)
+
+    else:
+        raise('I can only handle the cases for p=1,2,inf for now.')
+
+
+def hankel_singular_values(G):
+    """
+    Computes the Hankel singular values of a stable State() or Transfer()
+    model. The largest one is the Hankel norm of the model.
+
+    The Hankel singular values are the square roots of the eigenvalues of
+    the product of the controllability and observability gramians
+    :math:`PQ`. Instead of forming the product, the Cholesky factors
+    :math:`P = R^TR` and :math:`Q = L^TL` are directly computed with
+    ``lyapunov_cholesky_solver`` and the singular values of :math:`LR^T`
+    are computed which are equal to the Hankel singular values. This
+    square-root computation avoids the squaring of the condition number
+    hence the small singular values are computed more accurately.
+
+    Parameters
+    ----------
+    G : State, Transfer
+        The stable continuous- or discrete-time model
+
+    Returns
+    -------
+    hsv : ndarray
+        The Hankel singular values in descending order
+
+    """
+    if not isinstance(G, (State, Transfer)):
+        raise TypeError('The argument should be a State or Transfer. Instead '
+                        'I received {0}'.format(type(G).__qualname__))
+
+    if isinstance(G, Transfer):
+        G = transfer_to_state(G)
+
+    _reject_sparse(G, 'hankel_singular_values')
 
-        f, w = frequency_response(now_state, custom_grid=[0, low_damp_freq])
-        if now_state._isSISO:
-            lb2 = np.max(np.abs(f))
+    if G._isgain:
+        return np.array([])
+
+    if not G._isstable:
+        raise ValueError('The Hankel singular values are only defined for '
+                         'stable models.')
+
+    a, b, c = G.matrices[:3]
+    form = 'c' if G.SamplingSet == 'R' else 'd'
+    # The controllability gramian is the observability gramian of the dual
+    R = lyapunov_cholesky_solver(a.T, b, form=form)
+    L = lyapunov_cholesky_solver(a, c.T, form=form)
+
+    return svdvals(L @ R.T)
+
+
+def dominant_poles(G, k=6, sigma=None):
+    """
+    Computes a few poles of a large State() or Transfer() model for the
+    modal analysis without computing the full spectrum.
+
+    By default, the dominant poles are the k rightmost poles of the
+    continuous-time models and the k poles with the largest moduli of the
+    discrete-time models, i.e., the slowest modes that decide the
+    stability and the long-term behavior. For dense matrices, these are
+    picked from the full spectrum. For sparse matrices, they are computed
+    with the implicitly restarted Arnoldi iteration and, if it fails to
+    converge for a stiff continuous-time model, with the Arnoldi iteration
+    on the Cayley transform of A. If only a few unstable poles converge,
+    only these are returned. If nothing converges, a ValueError is
+    raised. Then ``sigma=0`` gives the poles closest to the origin which
+    are typically the slowest modes of a stiff model.
+
+    If ``sigma`` is given, the k poles closest to it are computed with the
+    shift-invert Arnoldi iteration instead, e.g., ``sigma=2j*np.pi*f``
+    gives the modes around the frequency ``f`` Hz of a continuous-time
+    model.
+
+    The system matrices can be sparse and only products and sparse LU
+    solves with A are used.
+
+    Parameters
+    ----------
+    G : State, Transfer
+        The model
+    k : int, optional
+        The number of poles
+    sigma : complex, optional
+        The shift around which the poles are sought
+
+    Returns
+    -------
+    poles : ndarray
+        The poles sorted with respect to the real parts or the moduli in
+        descending order, or with respect to the distance to ``sigma``.
+
+    """
+    if not isinstance(G, (State, Transfer)):
+        raise TypeError('The argument should be a State or Transfer. Instead '
+                        'I received {0}'.format(type(G).__qualname__))
+
+    if not isinstance(k, int) or k < 1:
+        raise ValueError('The number of poles "k" must be a positive '
+                         'integer.')
+
+    if isinstance(G, Transfer):
+        G = transfer_to_state(G)
+
+    if G._isgain:
+        return np.array([])
+
+    a = G.a
+    n = a.shape[0]
+    if sigma is None:
+        poles = _rightmost_poles(a, G.SamplingSet == 'Z', min(k, n))
+        if poles is None:
+            raise ValueError('The Arnoldi iteration did not converge to the '
+                             'dominant poles. Use the "sigma" keyword to '
+                             'compute the poles around a shift instead.')
+        return poles
+
+    # ARPACK needs k < n - 1 hence tiny matrices are handled densely
+    if n < k + 2:
+        poles = eigvals(a.toarray() if G._issparse else a)
+    else:
+        try:
+            # Complex shifts are handled in complex arithmetic
+            poles = eigs(a.astype(complex), k=k, sigma=complex(sigma),
+                         return_eigenvectors=False)
+        except ArpackNoConvergence:
+            raise ValueError('The shift-invert Arnoldi iteration did not '
+                             'converge to the poles around the shift.'
+                             ) from None
+        except RuntimeError as err:
+            # SuperLU reports the exact singularity of A - sigma*I
+            if 'singular' not in str(err):
+                raise
+            raise ValueError('The shift is a pole of the model, choose a '
+                             'different shift.') from None
+
+    return poles[np.argsort(np.abs(poles - sigma), kind='stable')][:k]
+
+
+def _l1_norm(G, tol=1e-6, max_steps=2**20):
+    """
+    Estimates the L1 norm of the impulse response of a stable model.
+
+    The impulse response is sampled with the step h as :math:`CA_d^kB` with
+    :math:`A_d = e^{Ah}` for continuous-time models and :math:`A_d = A` for
+    discrete-time models and the absolute values are integrated with the
+    trapezoidal rule (summed for discrete-time). The horizon is taken from
+    the decay rate of the slowest pole, and the sampling is continued
+    beyond it, e.g., for nonnormal transients, until the contribution of
+    the last block falls below the tolerance or max_steps are taken.
+
+    A RuntimeWarning is emitted if the step is coarsened to fit the horizon
+    into max_steps or if the sampling is stopped by max_steps before the
+    tolerance is met, since the estimate is then less accurate than tol.
+    """
+    a, b, c, d = G.matrices
+    l1 = np.abs(d)
+    if G._isgain:
+        return np.abs(d).sum(axis=1).max()
+
+    poles = G.poles
+    if G.SamplingSet == 'R':
+        decay = -poles.real.max()
+        # Step resolving the fastest mode to the trapezoidal accuracy unless
+        # it is too fine to cover the horizon; lightly damped or stiff
+        # models are then sampled coarser instead of being truncated.
+        T = np.log(1/tol) / decay
+        h = np.sqrt(tol) / np.abs(poles).max()
+        if 2 * T / max_steps > h:
+            h = 2 * T / max_steps
+            warnings.warn('The L1 norm sampling step is coarsened to {0:.3e} '
+                          'to cover the horizon {1:.3e} in {2} steps. The '
+                          'result may be less accurate than the tolerance.'
+                          ''.format(h, T, max_steps), RuntimeWarning)
+        horizon = int(np.ceil(T / h))
+        ad = expm(a*h)
+    else:
+        h, rho = 1, np.abs(poles).max()
+        # Nilpotent matrices have a finite impulse response
+        if rho == 0.:
+            horizon = a.shape[0] + 1
         else:
-            lb2 = [np.linalg.svd(f[:, :, x], compute_uv=0) for x in range(2)]
-            lb2 = np.max(lb2)
-
-        # Finally
-        gamma_lb = np.max([lb1, lb2])
-
-        # Constant part of the Hamiltonian to shave off a few flops
-        H_of_gam_const = np.c_[np.r_[a, np.zeros_like(a)],
-                               np.r_[c.T.dot(c), a.T]]
-        H_of_gam_lfact = np.r_[b, c.T.dot(d)]
-        H_of_gam_rfact = np.c_[-d.T.dot(c), b.T]
-
-        # Start a for loop with a definite end !
-        for x in range(max_iter_limit):
-
-            # (Step b1)
-            test_gamma = gamma_lb * (1 + 2*hinf_tolerance)
-
-            # (Step b2)
-            R_of_gam = d.T.dot(d) - test_gamma**2 * np.eye(d.shape[1])
-            # TODO : It might be good to implement the result of Benner et al.
-            # for the Hamiltonian later
-            try:
-                eigs_of_H = eigvals(H_of_gam_const - H_of_gam_lfact.dot(
-                                    solve(R_of_gam, H_of_gam_rfact)))
-            except np.linalg.linalg.LinAlgError as err:
-                if 'singular matrix' == str(err):
-                    at, bt, ct = minimal_realization(a, b, c)
-                    if at.size == 0:
-                        return lb1, None
-                    else:
-                        raise ValueError('The A matrix is/looks like stable '
-                                         'but somehow I managed to screw it '
-                                         'up. Please send an insulting mail '
-                                         'to ilhan together with this example'
-                                         '.')
-
-            # (Step b3)
-            #
-            if all(np.abs(np.real(eigs_of_H)) > eig_tolerance):
-                gamma_ub = test_gamma
-                break
+            horizon = int(np.ceil(np.log(tol) / np.log(rho)))
+        ad = a
+        # h[0] = D, h[k] = C A^(k-1) B
+        b = a @ b
+
+    horizon = min(horizon, max_steps)
+    n, m = b.shape
+    p = c.shape[0]
+
+    # Build the block [B, Ad B, ..., Ad^(K-1) B] by doubling such that the
+    # response is marched K steps at a time with a single product.
+    K = 1
+    X, adk = b, ad
+    while K < min(horizon, 1024):
+        X = np.hstack([X, adk @ X])
+        adk = adk @ adk
+        K *= 2
+
+    acc = np.zeros((p, m))
+    steps = 0
+    converged = False
+    while True:
+        blk = np.abs((c @ X).reshape(p, K, m))
+        part = blk.sum(axis=1)
+        if steps == 0 and G.SamplingSet == 'R':
+            part -= blk[:, 0, :] / 2
+        acc += part
+        steps += K
+        if steps >= horizon and part.max() <= tol * acc.max():
+            converged = True
+            break
+        if steps >= max_steps:
+            break
+        X = adk @ X
+
+    if not converged:
+        warnings.warn('The L1 norm sampling stopped at {0} steps before the '
+                      'impulse response decayed below the tolerance. The '
+                      'result is a lower bound.'.format(steps),
+                      RuntimeWarning)
+
+    if G.SamplingSet == 'R':
+        # Drop the half weight of the trapezoidal rule at the last sample
+        acc = h * (acc - blk[:, -1, :] / 2)
+    else:
+        # The first sample in this case is A B hence add C B separately
+        acc += np.abs(c @ G.b)
+
+    return (acc + l1).sum(axis=1).max()
+
+
+def system_norm_batch(models, p=np.inf, workers=None, executor='process',
+                      chunk_size=None, chain_warm_start=True, **kwargs):
+    """
+    Computes the system p-norms of a sequence of models on a pool of
+    workers.
+
+    The models are split into contiguous chunks that are processed by the
+    workers of a process or a thread pool. The same model object appearing
+    more than once in the sequence is computed only once. Moreover, for the
+    H-infinity norm, the peak frequency of a model is passed as the warm
+    start to the next model in the same chunk which speeds up the
+    computation of the slowly varying families of models, e.g., parameter
+    sweeps.
+
+    A failure of a model doesn't abort the batch. Instead, the exception
+    is reported together with the index of the model and its result is
+    set to None.::
+
+        >>>> norms, errors = system_norm_batch(plants, workers=8)
+        >>>> for ind, err in errors.items():
+        ....     print('Model {} failed: {}'.format(ind, err))
+
+    Parameters
+    ----------
+    models : iterable of State, Transfer
+        The models for which the norms are computed
+    p : {2, Inf}
+        The norm type. See ``system_norm()``.
+    workers : int, optional
+        The number of workers of the pool. If omitted, the number of the
+        CPUs is used.
+    executor : {'process', 'thread', None}, optional
+        The pool type. The process pool is not affected by the GIL, whereas
+        the thread pool avoids the pickling of the models and the results
+        and helps when most of the work is done in LAPACK. On the platforms
+        that spawn the processes, the process pool requires the calling
+        script to be guarded with ``if __name__ == '__main__':``. If None,
+        the models are computed one by one in the calling process.
+    chunk_size : int, optional
+        The number of consecutive models processed by a single task. The
+        default splits the models evenly over the workers.
+    chain_warm_start : bool, optional
+        If True, for the H-infinity norm, the peak frequency of each model
+        is used as a warm start for the next model in the same chunk.
+    kwargs : dict
+        The remaining keywords are passed to ``system_norm()``.
+
+    Returns
+    -------
+    norms : list
+        The results of ``system_norm()`` in the order of the models. The
+        entries of the failed models are None.
+    errors : dict
+        The exceptions raised by the failed models keyed by their indices.
+
+    """
+    if executor not in ('process', 'thread', None):
+        raise ValueError('The "executor" keyword can only be "process", '
+                         '"thread" or None. I don\'t know "{0}".'
+                         ''.format(executor))
+
+    models = list(models)
+    # Repeated model objects are computed once
+    first = {}
+    unique = [first.setdefault(id(x), ind) for ind, x in enumerate(models)]
+    todo = sorted(set(unique))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(todo) // workers))
+
+    chunks = [todo[x:x+chunk_size] for x in range(0, len(todo), chunk_size)]
+    args = (p, kwargs, chain_warm_start)
+    results = {}
+
+    if executor is None or workers == 1 or len(chunks) < 2:
+        for chunk in chunks:
+            results.update(zip(chunk, _system_norm_chunk(
+                                [models[x] for x in chunk], *args)))
+    else:
+        pool_type = (ProcessPoolExecutor if executor == 'process' else
+                     ThreadPoolExecutor)
+        with pool_type(max_workers=workers) as pool:
+            futures = [(chunk, pool.submit(_system_norm_chunk,
+                                           [models[x] for x in chunk], *args))
+                       for chunk in chunks]
+            for chunk, fut in futures:
+                try:
+                    res = fut.result()
+                except Exception as err:
+                    # The task itself failed, e.g., a broken pool
+                    res = [(None, err)]*len(chunk)
+                results.update(zip(chunk, res))
+
+    norms, errors = [], {}
+    for ind, x in enumerate(unique):
+        val, err = results[x]
+        norms.append(val)
+        if err is not None:
+            errors[ind] = err
+
+    return norms, errors
+
+
+def _system_norm_chunk(models, p, kwargs, chain_warm_start):
+    """
+    Computes the norms of a list of models one by one for
+    ``system_norm_batch``. Each entry of the returned list is a pair of
+    the result and the exception, if any.
+    """
+    out = []
+    return_frequency = kwargs.get('return_frequency', False)
+    chain = chain_warm_start and np.isinf(p)
+    kw = dict(kwargs, return_frequency=True) if chain else kwargs
+    w = kwargs.get('warm_start', None)
+
+    for G in models:
+        try:
+            if chain:
+                res = system_norm(G, p=p, **dict(kw, warm_start=w))
+                if res[1] is not None and np.isfinite(res[1]):
+                    w = res[1]
+                res = res if return_frequency else res[0]
             else:
-                # Pick up the ones with the tiny or zero real parts
-                # but leave out the euclidian ball around the origin
-                mix_imag_eigs = eigs_of_H[np.abs(
-                            np.real(eigs_of_H)) < eig_tolerance]
-                imag_eigs = np.unique(np.round(np.abs(
-                              mix_imag_eigs[
-                                  np.abs(np.imag(eigs_of_H)) > eig_tolerance]),
-                                  decimals=7))
-
-                m_i = [np.average(imag_eigs[x], imag_eigs[x+1])
-                       for x in range(len(imag_eigs))]
-
-                # TODO : Clean up this mess above with imag_eigs etc.
-                # TODO : Still needs five times speed-up
-
-                f, w = frequency_response(now_state, custom_grid=m_i)
-                if now_state._isSISO:
-                    gamma_lb = np.max(np.abs(f))
-                else:
-                    gamma_lb = [np.linalg.svd(
-                            f[::x], compute_uv=0) for x in range(len(m_i))]
-                    gamma_lb = np.max(lb2)
+                res = system_norm(G, p=p, **kw)
+            out.append((res, None))
+        except Exception as err:
+            out.append((None, err))
+
+    return out
+
+
+def _hinf_norm(G, method='auto', max_iter_limit=100, hinf_tolerance=1e-10,
+               eig_tolerance=1e-12, verbose=False, warm_start=None):
+    """
+    Computes the H-infinity norm of a stable State model.
+
+    The 'bbbs' and 'hamiltonian' methods are the level set iterations of
+    Boyd, Balakrishnan, Bruinsma and Steinbuch. At every iteration, the
+    imaginary eigenvalues of the Hamiltonian of the test level give the
+    frequency intervals on which the largest singular value exceeds the
+    level and the largest singular value at their midpoints is the next
+    lower bound. The 'bbbs' method uses the dense eigenvalue solver
+    whereas 'hamiltonian' uses the square-reduced method of Van Loan such
+    that the eigenvalues come in exact :math:`\\pm\\lambda` pairs.
+
+    For discrete-time models, the level crossings are the unit circle
+    eigenvalues of a symplectic pencil instead. The structure-preserving
+    'hamiltonian' method is applied to the bilinear transform of the model
+    that has the same norm.
+
+    The 'implicit' method is the implicit determinant method of Freitag,
+    Spence and Van Dooren applied to the Hermitian matrix
+
+    .. math::
+
+        \\Phi(\\gamma, \\omega) = \\begin{bmatrix}-\\gamma I & G(j\\omega) \\\\
+                                G(j\\omega)^* & -\\gamma I\\end{bmatrix}
+
+    which is singular if :math:`\\gamma` is a singular value of
+    :math:`G(j\\omega)`. The peak is a point at which the bordered
+    determinant function :math:`f(\\gamma, \\omega)` and its derivative
+    :math:`f_\\omega` vanish together and is found via Newton's method
+    using only the resolvents of A. Then a single dense Hamiltonian
+    eigenvalue problem certifies that the peak is global, otherwise
+    Newton's method is restarted from the interval in which the level is
+    exceeded.
+
+    Parameters
+    ----------
+    G : State
+        The stable model
+    method : {'auto', 'bbbs', 'hamiltonian', 'implicit'}, optional
+        The algorithm. 'auto' selects 'bbbs' for the models with at most
+        ``_hinf_dense_limit`` states and 'implicit' otherwise.
+    max_iter_limit : int, optional
+        The maximum number of level set iterations
+    hinf_tolerance : float, optional
+        The relative distance of the bounds on convergence
+    eig_tolerance : float, optional
+        The relative real part threshold for the imaginary eigenvalues
+    verbose : bool, optional
+        If True, the bounds are printed at each iteration.
+    warm_start : float, array_like, optional
+        Frequencies, e.g., of the peaks of a previous computation, that are
+        added to the initial screening.
+
+    Returns
+    -------
+    gamma : float
+        The H-infinity norm
+    omega : float
+        The frequency at which the lower bound is attained.
+
+    """
+    a, b, c, d = G.matrices
+    n = a.shape[0]
+    dt = G.SamplingPeriod if G.SamplingSet == 'Z' else None
+    sig_d = np.linalg.norm(d, 2) if d.size else 0.
+
+    if G._isgain or n == 0:
+        return sig_d, np.inf
+
+    if method == 'auto':
+        method = 'bbbs' if n <= _hinf_dense_limit else 'implicit'
+
+    if dt is not None and method == 'hamiltonian':
+        # The bilinear transform maps the unit circle to the imaginary
+        # axis with the same H-infinity norm, w_c = tan(w*dt/2).
+        if warm_start is not None:
+            warm_start = np.tan(np.minimum(np.abs(np.atleast_1d(warm_start)),
+                                           np.pi/dt)*dt/2)
+        gamma, omega = _hinf_norm(_hinf_bilinear(a, b, c, d), method,
+                                  max_iter_limit, hinf_tolerance,
+                                  eig_tolerance, verbose, warm_start)
+        return gamma, 2*np.arctan(omega)/dt
+
+    # Uncontrollable/unobservable modes are stable hence harmless
+    plan = FrequencyResponsePlan(G, minimal=False)
+
+    # D is the value at infinity which is not on the unit circle
+    gamma_lb, omega = _hinf_initial_bound(plan, G.poles,
+                                          sig_d if dt is None else 0.,
+                                          warm_start, dt)
+
+    if method == 'implicit':
+        resolvent = _hinf_resolvent_data(plan, a, b, c, d, dt)
+        gamma_lb, omega = _hinf_implicit_newton(resolvent, gamma_lb, omega)
+
+    gamma_ub = np.inf
+    for x in range(max_iter_limit):
+        test_gamma = gamma_lb * (1 + 2*hinf_tolerance)
+        ws = _hinf_level_crossings(a, b, c, d, test_gamma, dt,
+                                   method == 'hamiltonian', eig_tolerance)
+
+        if verbose:
+            print('Iteration {0}: lower bound {1}, {2} level crossings'
+                  ''.format(x, gamma_lb, ws.size))
+
+        if ws.size == 0:
+            gamma_ub = test_gamma
+            break
+
+        # The intervals at the ends, e.g., around zero or the Nyquist
+        # frequency, are also tested.
+        ws = np.unique(np.r_[0., ws] if dt is None else
+                       np.r_[0., ws, np.pi/dt])
+        w = (ws[:-1] + ws[1:]) / 2 if ws.size > 1 else ws
+        sv = _hinf_sigma_max(plan, w)
+        if np.max(sv) <= gamma_lb:
+            # The level can not be improved numerically any further
+            gamma_ub = test_gamma
+            break
+
+        if method == 'implicit':
+            gamma_lb, omega = _hinf_implicit_newton(resolvent, np.max(sv),
+                                                    w[np.argmax(sv)])
+        elif ws.size > 1:
+            ind = np.argmax(sv)
+            gamma_lb, omega = _hinf_local_peak(plan, ws[ind], ws[ind+1],
+                                               (np.max(sv), w[ind]))
+        else:
+            gamma_lb, omega = np.max(sv), w[np.argmax(sv)]
+
+    if not np.isfinite(gamma_ub):
+        gamma_ub = gamma_lb * (1 + 2*hinf_tolerance)
 
-        return np.mean([gamma_lb, gamma_ub])
+    return (gamma_lb + gamma_ub)/2, omega
 
-        #           [ A     0  ]  _ [  B  ] * [        -1 ] * [-C.T*D].T
-        #  H(gam) = [C.T*C  A.T]    [C.T*D]   [R_of_gam   ]   [   B  ]
 
+def _hinf_level_crossings(a, b, c, d, gamma, dt=None, structured=False,
+                          eig_tolerance=1e-12):
+    """
+    Computes the nonnegative frequencies at which gamma is a singular value
+    of the frequency response.
+
+    For continuous-time models these are the imaginary eigenvalues of the
+    Hamiltonian ``_hinf_hamiltonian``. For discrete-time models, these are
+    the unit circle eigenvalues of the symplectic pencil
+    ``_hinf_symplectic_pencil``.
+
+    Parameters
+    ----------
+    a, b, c, d : ndarray
+        The system matrices
+    gamma : float
+        The level
+    dt : float, optional
+        The sampling period of discrete-time models
+    structured : bool, optional
+        If True, the Hamiltonian eigenvalues are computed with the
+        structure-preserving ``_hamiltonian_eigvals``.
+    eig_tolerance : float, optional
+        The threshold of the distance to the imaginary axis or the unit
+        circle relative to the eigenvalue magnitudes larger than one.
+
+    Returns
+    -------
+    ws : ndarray
+        The sorted unique frequencies
+
+    """
+    # The nearly double imaginary eigenvalues near the peak are pushed off
+    # the axis by the square root of the perturbation of the unstructured
+    # solvers. A spurious crossing only costs an extra evaluation hence
+    # the threshold of the dense solvers is loose.
+    loose = np.sqrt(np.finfo(float).eps)
+
+    if dt is not None:
+        M, L = _hinf_symplectic_pencil(a, b, c, d, gamma)
+        eigs = eigvals(M, L)
+        eigs = eigs[np.isfinite(eigs)]
+        tol = np.maximum(eig_tolerance, loose)
+        on_circle = np.abs(np.abs(eigs) - 1) <= tol
+        return np.unique(np.abs(np.angle(eigs[on_circle]))) / dt
+
+    H = _hinf_hamiltonian(a, b, c, d, gamma)
+    if structured:
+        eigs = _hamiltonian_eigvals(H)
+        tol = eig_tolerance * np.maximum(1, np.abs(eigs))
+    else:
+        eigs = eigvals(H)
+        tol = np.maximum(eig_tolerance * np.maximum(1, np.abs(eigs)),
+                         loose * np.linalg.norm(H, 1))
+
+    return np.unique(np.abs(np.imag(eigs[np.abs(np.real(eigs)) <= tol])))
+
+
+def _hinf_symplectic_pencil(a, b, c, d, gamma):
+    """
+    Forms the symplectic pencil :math:`M - \\lambda L` of the level gamma
+    of a discrete-time model which has an eigenvalue :math:`e^{j\\theta}`
+    if and only if :math:`\\gamma` is a singular value of
+    :math:`G(e^{j\\theta})`.
+
+    If :math:`G(z)u = \\gamma w` and :math:`G(z)^*w = \\gamma u` on the
+    unit circle, then :math:`x = (zI-A)^{-1}Bu` and
+    :math:`q = (z^{-1}I-A^T)^{-1}C^Tw` satisfy
+
+    .. math::
+
+        z x = Ax + Bu, \\quad z(A^Tq + C^Tw) = q, \\quad
+        \\begin{bmatrix} D & -\\gamma I \\\\ -\\gamma I & D^T
+        \\end{bmatrix}
+        \\begin{bmatrix} u \\\\ w \\end{bmatrix} =
+        -\\begin{bmatrix} Cx \\\\ B^Tq \\end{bmatrix}
+
+    and eliminating u and w gives the 2n x 2n pencil acting on [x; q].
+    The eigenvalues come in :math:`(\\lambda, 1/\\bar{\\lambda})` pairs.
+    """
+    n, m, p = a.shape[0], b.shape[1], c.shape[0]
+    Z = np.block([[d, -gamma*np.eye(p)], [-gamma*np.eye(m), d.T]])
+    F = -solve(Z, np.block([[c, np.zeros((p, n))],
+                            [np.zeros((m, n)), b.T]]))
+    M = np.block([[a, np.zeros((n, n))], [np.zeros((n, n)), np.eye(n)]])
+    L = np.block([[np.eye(n), np.zeros((n, n))], [np.zeros((n, n)), a.T]])
+    M[:n] += b @ F[:m]
+    L[n:] += c.T @ F[m:]
+    return M, L
+
+
+def _hinf_bilinear(a, b, c, d):
+    """
+    Computes the continuous-time State model of
+    :math:`G_c(s) = G_d(\\frac{1+s}{1-s})` that has the same H-infinity
+    norm as the stable discrete-time model :math:`G_d`. The frequencies
+    are related by :math:`\\omega_c = \\tan(\\theta/2)`.
+    """
+    n = a.shape[0]
+    ai = solve(a + np.eye(n), np.c_[a - np.eye(n), b])
+    ca = solve((a + np.eye(n)).T, c.T).T
+    return State(ai[:, :n], np.sqrt(2)*ai[:, n:], np.sqrt(2)*ca,
+                 d - ca @ b)
+
+
+def _hinf_initial_bound(plan, poles, sig_d, warm_start=None, dt=None):
+    """
+    Computes the initial lower bound of the H-infinity norm by screening
+    the largest singular value on a coarse grid.
+
+    The grid consists of the natural and the damped natural frequencies of
+    the poles, zero and the warm start frequencies, if any, together with
+    a logarithmic grid of ``_hinf_grid_density`` points per decade spanning
+    a decade beyond the pole magnitudes. The response is evaluated at once
+    with the frequency response plan and the largest value is refined to
+    the local peak between its neighbors. The singular value at infinity
+    is also taken into account via the feedthrough matrix.
+
+    Parameters
+    ----------
+    plan : FrequencyResponsePlan
+        The plan of the model
+    poles : ndarray
+        The poles of the model
+    sig_d : float
+        The largest singular value of the feedthrough matrix
+    warm_start : float, array_like, optional
+        Additional frequencies to be screened
+    dt : float, optional
+        The sampling period of discrete-time models. The natural
+        frequencies are then computed from the logarithms of the poles and
+        the grid is clipped at the Nyquist frequency.
+
+    Returns
+    -------
+    gamma : float
+        The lower bound
+    omega : float
+        The frequency of the lower bound
+
+    """
+    if dt is None:
+        mags, damped = np.abs(poles), np.abs(np.imag(poles))
+    else:
+        poles = poles[poles != 0]
+        mags, damped = np.abs(np.log(poles))/dt, np.abs(np.angle(poles))/dt
+
+    mags = mags[mags > 0]
+    lo, hi = ((np.log10(np.min(mags)) - 1, np.log10(np.max(mags)) + 1)
+              if mags.size else (-2., 2.))
+    if dt is not None:
+        hi = np.log10(np.pi/dt)
+        lo = min(lo, hi - 2)
+
+    w = np.r_[0., np.logspace(lo, hi, int(np.ceil((hi - lo) *
+                                                  _hinf_grid_density)) + 1),
+              mags, damped]
+    if warm_start is not None:
+        warm = np.abs(np.atleast_1d(np.asarray(warm_start, dtype=float)))
+        w = np.r_[w, warm[np.isfinite(warm)]]
+
+    if dt is not None:
+        w = np.r_[w[w < np.pi/dt], np.pi/dt]
+
+    w = np.unique(w)
+    sv = _hinf_sigma_max(plan, w)
+    ind = np.argmax(sv)
+
+    if sig_d >= sv[ind]:
+        return sig_d, np.inf
+
+    return _hinf_local_peak(plan, w[max(ind-1, 0)], w[min(ind+1, w.size-1)],
+                            (sv[ind], w[ind]))
+
+
+def _hinf_local_peak(plan, lo, hi, best):
+    """
+    Locates the local maximum of the largest singular value in the
+    frequency interval [lo, hi] with the bounded Brent's method.
+
+    Parameters
+    ----------
+    plan : FrequencyResponsePlan
+        The plan of the model
+    lo, hi : float
+        The interval
+    best : tuple
+        The known (gamma, omega) pair in the interval
+
+    Returns
+    -------
+    gamma, omega : float
+        The peak if it is larger than the known value, otherwise ``best``
+
+    """
+    if not hi > lo:
+        return best
+
+    res = minimize_scalar(lambda x: -_hinf_sigma_max(plan, [x])[0],
+                          bounds=(lo, hi), method='bounded',
+                          options={'xatol': 1e-10*max(hi, 1e-10)})
+    return (-res.fun, res.x) if -res.fun > best[0] else best
+
+
+def _hinf_sigma_max(plan, w):
+    """
+    Computes the largest singular value of the frequency response of the
+    plan on the frequencies w.
+    """
+    return np.atleast_1d(_frequency_response_reduce(plan.evaluate(w),
+                                                    'maxsv'))
+
+
+def _hinf_hamiltonian(a, b, c, d, gamma):
+    """
+    Forms the Hamiltonian matrix of the level gamma
+
+    .. math::
+
+        H(\\gamma) = \\begin{bmatrix}
+                     A + BR^{-1}D^TC & BR^{-1}B^T \\\\
+                     -C^T(I+DR^{-1}D^T)C & -(A + BR^{-1}D^TC)^T
+                     \\end{bmatrix}
+
+    with :math:`R = \\gamma^2 I - D^TD` which has an eigenvalue
+    :math:`j\\omega` if and only if :math:`\\gamma` is a singular value of
+    :math:`G(j\\omega)`.
+    """
+    R = gamma**2 * np.eye(d.shape[1]) - d.T @ d
+    rb = solve(R, b.T, assume_a='sym')
+    rdc = solve(R, d.T @ c, assume_a='sym')
+    f = a + b @ rdc
+    return np.block([[f, b @ rb], [-c.T @ c - (c.T @ d) @ rdc, -f.T]])
+
+
+def _hamiltonian_eigvals(H):
+    """
+    Computes the eigenvalues of a real Hamiltonian matrix with the square-
+    reduced method of Van Loan.
+
+    The square :math:`H^2` is a skew-Hamiltonian matrix and is reduced by
+    orthogonal symplectic similarity transformations to the Paige/Van
+    Loan (PVL) form
+
+    .. math::
+
+        U^TH^2U = \\begin{bmatrix} W & X \\\\ 0 & W^T \\end{bmatrix}
+
+    with W upper Hessenberg. The eigenvalues of H are then the square
+    roots of the eigenvalues of the n x n matrix W with both signs.
+    Hence, the spectrum is exactly symmetric with respect to the
+    imaginary axis and a real negative eigenvalue of W gives exactly an
+    imaginary pair.
+
+    Parameters
+    ----------
+    H : ndarray
+        The 2n x 2n Hamiltonian matrix
+
+    Returns
+    -------
+    eigs : ndarray
+        The 2n eigenvalues of H
+
+    """
+    n = H.shape[0] // 2
+    W = _skew_hamiltonian_pvl(H @ H)[:n, :n]
+    lam = np.sqrt(eigvals(W).astype(complex))
+    return np.r_[lam, -lam]
+
+
+def _skew_hamiltonian_pvl(N):
+    """
+    Reduces a real skew-Hamiltonian matrix to the PVL form by orthogonal
+    symplectic Householder and Givens transformations (Van Loan, Lin.Alg.
+    Appl., 61, 1984).
+
+    For every column j, first a Householder reflector diag(P, P) zeros the
+    lower half of the column below the entry j+1, then a Givens rotation
+    between the rows j+1 and n+j+1 zeros the remaining entry and finally
+    another reflector reduces the upper half to the Hessenberg form. Due
+    to the skew-symmetry of the lower left block, the reduced columns of
+    the lower left block stay zero hence the updates are restricted to the
+    remaining parts.
+
+    Parameters
+    ----------
+    N : ndarray
+        The 2n x 2n skew-Hamiltonian matrix
+
+    Returns
+    -------
+    M : ndarray
+        The PVL form
+
+    """
+    M = np.array(N, dtype=float)
+    n = M.shape[0] // 2
+    # Views of the matrix in which the transformations act on both halves
+    # with a single operation
+    rows = M.reshape(2, n, 2*n)
+    cols = M.reshape(2*n, 2, n)
+
+    for j in range(n-1):
+        k = j + 1
+        for half in (1, 0):
+            y = rows[half, k:, j]
+            alpha = np.linalg.norm(y)
+            if alpha != 0.:
+                v = y.copy()
+                v[0] += np.copysign(alpha, y[0])
+                v *= np.sqrt(2.) / np.linalg.norm(v)
+                X = rows[:, k:, j:]
+                X -= v[None, :, None] * (v @ X)[:, None, :]
+                for rs in (slice(0, n), slice(n+j, None)):
+                    X = cols[rs, :, k:]
+                    X -= (X @ v)[:, :, None] * v
+
+            if half:
+                r = np.hypot(M[k, j], M[n+k, j])
+                if r != 0.:
+                    G = np.array([[M[k, j], M[n+k, j]],
+                                  [-M[n+k, j], M[k, j]]]) / r
+                    M[[k, n+k], :] = G @ M[[k, n+k], :]
+                    M[:, [k, n+k]] = M[:, [k, n+k]] @ G.T
+
+    return M
+
+
+def _hinf_resolvent_data(plan, a, b, c, d, dt=None):
+    """
+    Prepares the data for the evaluation of the frequency response and its
+    derivatives in ``_hinf_implicit_newton``. If the frequency response
+    plan uses the modal engine, its residues are reused. Otherwise, the
+    matrices are used directly.
+    """
+    if plan.engine == 'modal':
+        return ('modal', dt) + plan._data + (d,)
+
+    return 'direct', dt, a, b, c, d
+
+
+def _hinf_resolvent(data, w):
+    """
+    Computes :math:`G(z)` and its first two derivatives with respect to
+    :math:`\\omega` where :math:`z = j\\omega` for continuous-time and
+    :math:`z = e^{j\\omega dt}` for discrete-time models. With the
+    resolvent :math:`R = (zI-A)^{-1}`, we have
+    :math:`R' = -z'R^2` and :math:`R'' = -z''R^2 + 2z'^2R^3` hence the
+    derivatives are :math:`-z'CR^2B` and :math:`C(-z''R^2 + 2z'^2R^3)B`.
+    """
+    dt = data[1]
+    if dt is None:
+        z, z1, z2 = 1j*w, 1j, 0.
     else:
-        raise('I can only handle the cases for p=2,inf for now.')
+        z = np.exp(1j*w*dt)
+        z1, z2 = 1j*dt*z, -dt**2*z
+
+    if data[0] == 'modal':
+        lam, res, d = data[2:]
+        r = 1 / (z - lam)
+        r2 = res @ r**2
+        return res @ r + d, -z1*r2, -z2*r2 + 2*z1**2*(res @ r**3)
+
+    a, b, c, d = data[2:]
+    lu = lu_factor(z*np.eye(a.shape[0]) - a)
+    x1 = lu_solve(lu, b)
+    x2 = lu_solve(lu, x1)
+    x3 = lu_solve(lu, x2)
+    return c @ x1 + d, -z1*(c @ x2), -z2*(c @ x2) + 2*z1**2*(c @ x3)
+
+
+def _hinf_implicit_newton(data, gamma, w, maxiter=30, tol=1e-12):
+    """
+    Refines a lower bound of the H-infinity norm to a local peak of the
+    largest singular value with the implicit determinant method.
+
+    With the bordered matrix
+
+    .. math::
+
+        M(\\gamma, \\omega) = \\begin{bmatrix}\\Phi(\\gamma, \\omega) & c \\\\
+                                             c^* & 0\\end{bmatrix}
+
+    the solution of :math:`M[x; f] = [0; 1]` defines the real function
+    :math:`f(\\gamma, \\omega)` that vanishes if and only if
+    :math:`\\Phi` is singular. The peak satisfies :math:`f = f_\\omega = 0`
+    and the derivatives are obtained from the same factorization of M by
+    differentiating the bordered system. The border c is the singular
+    vector pair of the current iterate.
+
+    Parameters
+    ----------
+    data : tuple
+        The output of ``_hinf_resolvent_data``
+    gamma : float
+        The initial lower bound
+    w : float
+        The frequency at which the lower bound is attained
+    maxiter : int, optional
+        The maximum number of Newton steps
+    tol : float, optional
+        The relative step size on convergence
+
+    Returns
+    -------
+    gamma : float
+        The largest singular value at the peak or the initial lower bound
+        if it is not improved
+    w : float
+        The frequency of the peak
+
+    """
+    if not np.isfinite(w):
+        return gamma, w
+
+    best = (gamma, w)
+    g, w_k = gamma, w
+    for _ in range(maxiter):
+        G, G1, G2 = _hinf_resolvent(data, w_k)
+        u, s, vh = np.linalg.svd(G)
+        if s[0] > best[0]:
+            best = (s[0], w_k)
+
+        p, m = G.shape
+        Z = np.zeros((p, p))
+        phi = np.block([[-g*np.eye(p), G], [G.conj().T, -g*np.eye(m)]])
+        phi_w = np.block([[Z, G1], [G1.conj().T, np.zeros((m, m))]])
+        phi_ww = np.block([[Z, G2], [G2.conj().T, np.zeros((m, m))]])
+        bord = np.r_[u[:, 0], vh[0].conj()] / np.sqrt(2)
+        M = np.block([[phi, bord[:, None]], [bord.conj()[None, :], 0.]])
+
+        try:
+            lu = lu_factor(M)
+        except (ValueError, LinAlgError):
+            break
+
+        rhs = np.zeros(p+m+1, dtype=complex)
+        rhs[-1] = 1.
+        x = lu_solve(lu, rhs)
+        x_w = lu_solve(lu, np.r_[-phi_w @ x[:-1], 0.])
+        x_g = lu_solve(lu, np.r_[x[:-1], 0.])
+        x_ww = lu_solve(lu, np.r_[-phi_ww @ x[:-1] - 2*phi_w @ x_w[:-1], 0.])
+        x_gw = lu_solve(lu, np.r_[x_w[:-1] - phi_w @ x_g[:-1], 0.])
+
+        J = np.real([[x_g[-1], x_w[-1]], [x_gw[-1], x_ww[-1]]])
+        F = np.real([x[-1], x_w[-1]])
+        if not np.all(np.isfinite(J)) or np.linalg.cond(J) > 1e15:
+            break
+
+        dg, dw = np.linalg.solve(J, -F)
+        g, w_k = g + dg, abs(w_k + dw)
+        if data[1] is not None:
+            # Fold back to [0, pi/dt] by periodicity and symmetry
+            w_k %= 2*np.pi/data[1]
+            w_k = min(w_k, 2*np.pi/data[1] - w_k)
+        if not np.isfinite(g + w_k):
+            break
+        if abs(dg) <= tol*abs(g) and abs(dw) <= tol*max(1., w_k):
+            break
+
+    s = np.linalg.norm(_hinf_resolvent(data, w_k)[0], 2)
+    return (s, w_k) if s > best[0] else best
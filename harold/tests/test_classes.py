@@ -23,15 +23,20 @@ THE SOFTWARE.
 """
 
 import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import spsolve
 from harold import (Transfer, State, e_i, haroldcompanion,
                     transmission_zeros, state_to_transfer, transfer_to_state,
-                    concatenate_state_matrices)
+                    concatenate_state_matrices, system_norm,
+                    frequency_response)
 
 from numpy.testing import (assert_,
                            assert_equal,
                            assert_array_equal,
                            assert_raises,
-                           assert_almost_equal)
+                           assert_warns,
+                           assert_almost_equal,
+                           assert_allclose)
 
 
 def test_Transfer_Instantiations():
@@ -340,6 +345,137 @@ def test_State_algebra_mimo_siso():
                         2*np.eye(3))
 
 
+def test_State_algebra_matmul_different_orders():
+    G1 = State(-2*np.eye(2), [[1], [2]], [[1, 1]], 0.5)
+    G2 = State(-np.eye(3), [[1], [0], [1]], [[1, 0, 1]], 1.)
+    F = G1 @ G2
+    assert_almost_equal(F.a[:2, 2:], G1.b @ G2.c)
+    assert_almost_equal(F.a[2:, :2], np.zeros((3, 2)))
+    # Static gains of the factors multiply
+    assert_almost_equal(F.d - F.c @ np.linalg.solve(F.a, F.b), [[6.]])
+
+
+def test_State_sparse():
+    n = 50
+    A = sp.diags([1., -2.5, 1.], [-1, 0, 1], shape=(n, n), format='csc')
+    B = np.zeros((n, 2))
+    B[[0, -1], [0, 1]] = 1.
+    C = sp.eye(2, n)
+    G = State(A, B, C)
+    assert_(G._issparse)
+    assert_(all(sp.isspmatrix_csr(x) for x in G.matrices[:3]))
+    assert_(isinstance(G.d, np.ndarray))
+    assert_(G._isstable)
+    assert_raises(ValueError, getattr, G, 'poles')
+    assert_raises(ValueError, getattr, G, 'zeros')
+    assert_(not State(A + 3*sp.eye(n), B, C)._isstable)
+
+    Gd = State(A.toarray(), B, C.toarray())
+    for F, Fd in ((G + G, Gd + Gd), (G @ G, Gd @ Gd), (-G, -Gd),
+                  (G[1, :], Gd[1, :]), (G[:, 0], Gd[:, 0]),
+                  (np.ones((3, 2)) @ G @ np.eye(2), np.ones((3, 2)) @ Gd)):
+        assert_(F._issparse)
+        for x, y in zip(F.matrices, Fd.matrices):
+            assert_almost_equal(x.toarray() if sp.issparse(x) else x, y)
+    F = G @ G
+    assert_(F._issparse)
+    assert_almost_equal(F.a.toarray(),
+                        sp.bmat([[A, B @ C], [None, A]]).toarray())
+
+    M = concatenate_state_matrices(G)
+    assert_(sp.issparse(M))
+    assert_almost_equal(M.toarray(), concatenate_state_matrices(Gd))
+    # Dense-only operations are rejected instead of densifying
+    assert_raises(ValueError, state_to_transfer, G)
+    assert_raises(ValueError, G.__mul__, G)
+    # A sparse matrix turns the model into a sparse one
+    Gd.b = sp.csr_matrix(B)
+    assert_(Gd._issparse and sp.issparse(Gd.a))
+
+
+def test_State_sparse_pde():
+    # 2D heat equation on a 40 x 40 grid, heated at two corners
+    m = 40
+    L = sp.diags([1., -2., 1.], [-1, 0, 1], shape=(m, m)) * (m+1)**2
+    A = sp.kron(L, sp.eye(m)) + sp.kron(sp.eye(m), L)
+    n = m*m
+    B = np.zeros((n, 2))
+    B[[0, -1], [0, 1]] = 1.
+    C = np.ones((1, n))/n
+    G = State(A, B, C)
+    assert_(G._issparse and G._isstable)
+    # The slowest mode is 2 pi^2 with the grid correction
+    assert_allclose(G._rightmost[0], -8*(m+1)**2*np.sin(np.pi/(2*m+2))**2)
+    # The Lyapunov equation is diagonal in the eigenvectors of A which are
+    # the Kronecker products of the 1D ones
+    lam1, V1 = np.linalg.eigh(L.toarray())
+    lam, V = np.add.outer(lam1, lam1).ravel(), np.kron(V1, V1)
+    cb = (C @ V).T * (V.T @ B)
+    h2 = np.sqrt(np.sum((cb @ cb.T) / -(lam[:, None] + lam[None, :])))
+    assert_allclose(system_norm(G, 2), h2, rtol=1e-6)
+    w = [0., 1., 10.]
+    f, _ = frequency_response(G, custom_grid=w)
+    f_ref = [C @ spsolve((1j*x*sp.eye(n) - A).tocsc(), B) for x in w]
+    assert_allclose(np.moveaxis(f, -1, 0), f_ref)
+
+
+def test_State_rightmost_pole_stability():
+    np.random.seed(1234)
+    n = 250
+    # Stiff spectrum with an unstable pole far from the origin
+    d = np.r_[-np.logspace(-3, 6, n-1), 50.]
+    Q = np.linalg.qr(np.random.randn(n, n))[0]
+    G = State(Q @ np.diag(d) @ Q.T, np.ones((n, 1)), np.ones((1, n)))
+    assert_(not G._isstable)
+    assert_almost_equal(np.max(G._rightmost.real), 50.)
+    G = State(sp.diags(d), np.ones((n, 1)), np.ones((1, n)))
+    assert_(not G._isstable)
+    assert_almost_equal(G._rightmost[0], 50.)
+
+    # Equal moduli of the discrete-time poles
+    t = 0.3
+    R = 0.99*np.array([[np.cos(t), -np.sin(t)], [np.sin(t), np.cos(t)]])
+    G = State(np.kron(np.eye(n//2), R), np.ones((n, 1)), np.ones((1, n)),
+              dt=0.1)
+    assert_(G._isstable)
+    G = State(sp.kron(sp.eye(n//2), R), np.ones((n, 1)), np.ones((1, n)),
+              dt=0.1)
+    assert_(G._isstable)
+    assert_allclose(np.abs(G._rightmost), 0.99)
+
+    # Uniformly damped oscillators have equal real parts that the sparse
+    # models can't resolve without the full spectrum
+    L = sp.diags([1., -2., 1.], [-1, 0, 1], shape=(100, 100))
+    A = sp.bmat([[None, sp.eye(100)], [L, -0.01*sp.eye(100)]])
+    with assert_warns(RuntimeWarning):
+        G = State(A, np.eye(200, 1), np.eye(1, 200))
+    assert_(G._isstable is None)
+
+
+def test_State_sparse_large_stability():
+    # Stiff 1D Laplacians need the Cayley transform
+    for n in (500, 2000):
+        L = sp.diags([1., -2., 1.], [-1, 0, 1], shape=(n, n))
+        G = State(L, np.eye(n, 1), np.eye(1, n))
+        assert_(G._isstable)
+        assert_allclose(G._rightmost[0], -4*np.sin(np.pi/(2*n+2))**2,
+                        rtol=1e-6)
+        G = State(sp.block_diag([L, [[1e-3]]]), np.eye(n+1, 1),
+                  np.eye(1, n+1))
+        assert_(not G._isstable)
+        assert_allclose(G._rightmost[0], 1e-3)
+    # Repeated poles
+    G = State(sp.diags(-2.5*np.ones(500)), np.eye(500, 1), np.eye(1, 500))
+    assert_(G._isstable)
+    np.random.seed(0)
+    n = 3000
+    A = sp.random(n, n, density=2e-3, format='csr') - 3*sp.eye(n)
+    G = State(A, np.eye(n, 1), np.eye(1, n))
+    assert_(G._isstable)
+    assert_(not State(A + 0.1*sp.eye(n), np.eye(n, 1),
+                      np.eye(1, n))._isstable)
+
+
 def test_State_slicing():
     F = State(np.random.rand(4, 4))
     H = State(F.d, np.random.rand(4, 3), np.random.rand(5, 4))
@@ -0,0 +1,300 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2016 Ilhan Polat
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.linalg import block_diag
+from harold import (State, Transfer, staircase, frequency_response,
+                    frequency_response_chunks, FrequencyResponsePlan)
+from harold._frequency_domain import (_State_frequency_response_generator,
+                                      _frequency_response_reduce)
+
+from numpy.testing import (assert_, assert_allclose, assert_raises,
+                           assert_equal)
+
+
+def test_State_frequency_response_generator():
+    np.random.seed(1234)
+    n = 8
+    A = np.random.randn(n, n) - 5*np.eye(n)
+    B = np.random.randn(n, 2)
+    C = np.random.randn(1, n)
+    w = np.logspace(-2, 2, 57)
+    aa, bb, cc = staircase(A, B, C, form='o', invert=True)
+    r = _State_frequency_response_generator(aa, bb, cc[0, -1], w)
+    r_ref = np.array([C @ np.linalg.solve(1j*x*np.eye(n) - A, B)
+                      for x in w])[:, 0, :]
+    assert_allclose(r, r_ref)
+    # The chunk boundaries should not have any effect
+    r_c = _State_frequency_response_generator(aa, bb, cc[0, -1], w,
+                                              chunk_size=5)
+    assert_allclose(r_c, r)
+
+
+def test_frequency_response_State_SISO():
+    G = State(np.diag([-1., -2, -3]), np.ones((3, 1)), [[1, 2, 3]])
+    w = np.array([0., 1., 2.])
+    f, ww = frequency_response(G, custom_grid=w)
+    f_ref = 1/(1j*w + 1) + 2/(1j*w + 2) + 3/(1j*w + 3)
+    assert_allclose(f.ravel(), f_ref)
+
+
+def test_frequency_response_engines():
+    np.random.seed(4321)
+    n, p, m = 6, 3, 2
+    A = np.random.randn(n, n) - 4*np.eye(n)
+    G = State(A, np.random.randn(n, m), np.random.randn(p, n))
+    w = np.logspace(-1, 1, 11)
+    f_h, _ = frequency_response(G, custom_grid=w, engine='hessenberg')
+    f_m, _ = frequency_response(G, custom_grid=w, engine='modal')
+    f_a, _ = frequency_response(G, custom_grid=w)
+    assert_allclose(f_m, f_h)
+    assert_allclose(f_a, f_h)
+    assert_raises(ValueError, frequency_response, G, engine='fast')
+    # Jordan block is not diagonalizable
+    G = State([[-1, 1], [0, -1]], [[0], [1]], [[1, 0]])
+    assert_raises(ValueError, frequency_response, G, engine='modal')
+
+
+def test_frequency_response_auto_engine_nonnormal():
+    # Eigenvector condition number is about 6e5; the modal sum loses digits
+    np.random.seed(1)
+    n = 5
+    A = -np.diag(1 + 0.1*np.arange(n)) + 3*np.diag(np.ones(n-1), 1)
+    B, C = np.random.randn(n, 2), np.random.randn(2, n)
+    G = State(A, B, C)
+    w = np.logspace(-2, 2, 50)
+    f_ref = np.array([C @ np.linalg.solve(1j*x*np.eye(n) - A, B)
+                      for x in w]).transpose(1, 2, 0)
+    assert_equal(FrequencyResponsePlan(G).engine, 'hessenberg')
+    f_h, _ = frequency_response(G, custom_grid=w, engine='hessenberg')
+    f_a, _ = frequency_response(G, custom_grid=w)
+    assert_allclose(f_a, f_h, rtol=1e-14)
+    assert_allclose(f_a, f_ref, rtol=1e-13)
+
+
+def test_frequency_response_sparse():
+    np.random.seed(4321)
+    n, p, m = 30, 2, 3
+    A = sp.random(n, n, density=0.1, format='csr') - 3*sp.eye(n)
+    B, C = np.random.randn(n, m), sp.random(p, n, density=0.3)
+    G = State(A, B, C, np.ones((p, m)))
+    Gd = State(A.toarray(), B, C.toarray(), np.ones((p, m)))
+    w = np.logspace(-1, 1, 11)
+    assert_equal(FrequencyResponsePlan(G).engine, 'sparse')
+    f_s, _ = frequency_response(G, custom_grid=w)
+    f_d, _ = frequency_response(Gd, custom_grid=w)
+    assert_allclose(f_s, f_d)
+    assert_raises(ValueError, frequency_response, G, engine='modal')
+    G.SamplingPeriod, Gd.SamplingPeriod = 0.1, 0.1
+    f_s, _ = frequency_response(G, custom_grid=w)
+    f_d, _ = frequency_response(Gd, custom_grid=w)
+    assert_allclose(f_s, f_d)
+
+
+def test_frequency_response_State_MIMO():
+    np.random.seed(2468)
+    n, p, m = 7, 4, 3
+    A = np.random.randn(n, n) - 4*np.eye(n)
+    B, C = np.random.randn(n, m), np.random.randn(p, n)
+    D = np.random.randn(p, m)
+    G = State(A, B, C, D)
+    w = np.array([0., 0.1, 1., 10.])
+    f_ref = np.stack([C @ np.linalg.solve(1j*x*np.eye(n) - A, B) + D
+                      for x in w], axis=-1)
+    f, _ = frequency_response(G, custom_grid=w, engine='hessenberg')
+    assert_allclose(f, f_ref)
+
+
+def test_frequency_response_Transfer_MIMO():
+    num = [[[1, 2], 0], [3, [1, 0, 4]]]
+    den = [[[1, 3, 2], [1, 1]], [[1, 4], [1, 5, 6, 7]]]
+    G = Transfer(num, den)
+    w = np.array([0., 0.5, 2., 30.])
+    f, _ = frequency_response(G, custom_grid=w)
+    f_ref = np.array([[[np.polyval(np.atleast_1d(num[r][c]), 1j*x) /
+                        np.polyval(den[r][c], 1j*x) for x in w]
+                       for c in range(2)] for r in range(2)])
+    assert_allclose(f, f_ref)
+
+
+def test_frequency_response_Transfer_high_degree():
+    # Coefficients of the 30th degree polynomial are not reliable anymore
+    p = -np.arange(1, 31.)
+    G = Transfer(1, np.poly(p))
+    w = np.array([0., 0.5, 2., 30.])
+    f, _ = frequency_response(G, custom_grid=w)
+    f_ref = 1/np.prod(1j*w[:, None] - p, axis=1)
+    assert_allclose(f, f_ref)
+
+
+def test_FrequencyResponsePlan():
+    G = State([[0, 1], [-4, -5]], [[0], [1]], [[1, 0]])
+    P = FrequencyResponsePlan(G)
+    assert_equal(P.engine, 'modal')
+    assert_equal(P.shape, (1, 1))
+    w = np.logspace(-2, 2, 50)
+    f_ref = 1/((1j*w)**2 + 5j*w + 4)
+    assert_allclose(P.evaluate(w), f_ref)
+    assert_allclose(P(w[:10]), f_ref[:10])
+    assert_allclose(P.at(1.), 1/(3 + 5j))
+    f, _ = frequency_response(P, custom_grid=w)
+    assert_allclose(f, f_ref)
+    P = FrequencyResponsePlan(G, engine='hessenberg')
+    assert_allclose(P.evaluate(w), f_ref)
+    # Static gains
+    P = FrequencyResponsePlan(State(np.array([[1., 2.]])))
+    assert_equal(P.engine, 'gain')
+    assert_allclose(P.at(5.), [[1., 2.]])
+    assert_raises(ValueError, FrequencyResponsePlan, np.eye(2))
+
+
+def test_frequency_response_adaptive():
+    # Lightly damped resonance at 1 rad/s with the peak value 500
+    G = Transfer(1, [1, 0.002, 1])
+    f, w = frequency_response(G, adaptive=True)
+    assert_(w.size < 500)
+    assert_allclose(np.max(np.abs(f)), 500., rtol=1e-6)
+    assert_(np.all(np.diff(w) > 0))
+    G = State([[-0.01, 3, 0], [-3, -0.01, 0], [0, 0, -1]], np.ones((3, 2)),
+              [[1, 0, 1], [0, 1, 1]])
+    f, w = frequency_response(G, adaptive=True, samples=300)
+    assert_equal(f.shape, (2, 2, w.size))
+    assert_(w.size <= 300)
+    assert_allclose(f, frequency_response(G, custom_grid=w)[0])
+
+
+def test_frequency_response_chunks():
+    np.random.seed(1357)
+    n, p, m = 5, 3, 2
+    G = State(np.random.randn(n, n) - 3*np.eye(n), np.random.randn(n, m),
+              np.random.randn(p, n), np.random.randn(p, m))
+    f, w = frequency_response(G)
+    chunks = list(frequency_response_chunks(G, chunk_size=300))
+    assert_equal([x[0].size for x in chunks], [300, 300, 300, 100])
+    assert_allclose(np.concatenate([x[0] for x in chunks]), w)
+    assert_allclose(np.concatenate([x[1] for x in chunks], axis=-1), f)
+    out = np.empty((p, m, w.size), dtype=complex)
+    for wc, fc in frequency_response_chunks(G, chunk_size=300, out=out):
+        assert_(np.shares_memory(fc, out))
+    assert_allclose(out, f)
+    gen = frequency_response_chunks(G, out=np.empty((p, m, 3)))
+    assert_raises(ValueError, next, gen)
+
+
+def test_frequency_response_discrete_fft():
+    dt = 0.1
+    G = Transfer([[[1, .5, .2], [1, 0]], [[2, 0.1], [1, -.3, .1]]],
+                 [[[1, -.5, .06], [1, .4]], [[1, -.2], [1, .1, .02]]], dt=dt)
+    P = FrequencyResponsePlan(G)
+    w = np.arange(500)*np.pi/(500*dt)
+    z = np.exp(1j*w*dt)
+    f_fft = P.evaluate(w, use_fft=True)
+    assert_allclose(f_fft, P.evaluate(w, use_fft=False))
+    assert_allclose(f_fft[1, 1], np.polyval([1, -.3, .1], z) /
+                    np.polyval([1, .1, .02], z))
+    # Grid wrapping around the circle
+    w = (3 + np.arange(1500))*2*np.pi/(1000*dt)
+    assert_allclose(P.evaluate(w, use_fft=True), P.evaluate(w))
+    # Coefficients longer than the FFT
+    F = Transfer(np.arange(1., 41.), np.r_[1, np.zeros(39)], dt=dt)
+    w = np.arange(8)*2*np.pi/(16*dt)
+    f = frequency_response(F, custom_grid=w, use_fft=True)[0]
+    z = np.exp(1j*w*dt)
+    assert_allclose(f, np.polyval(np.arange(1., 41.), z)/z**39)
+    f, w = frequency_response(G, samples=64, use_fft=True)
+    assert_equal(f.shape, (2, 2, 64))
+    assert_raises(ValueError, P.evaluate, [0.1, 0.3, 0.4], use_fft=True)
+    S = State(np.array([[.5, .1], [0, .3]]), [[1], [1]], [[1, 0]], dt=dt)
+    assert_raises(ValueError, FrequencyResponsePlan(S).evaluate, [0., 1.],
+                  use_fft=True)
+    # State models are evaluated on the unit circle too
+    w = np.array([0., 1., 3.])
+    f = frequency_response(S, custom_grid=w)[0]
+    f_s = [np.linalg.solve(x*np.eye(2) - S.a, S.b)[0, 0]
+           for x in np.exp(1j*w*dt)]
+    assert_allclose(f, f_s)
+
+
+def test_frequency_response_zoom():
+    dt = 0.1
+    G = Transfer([[[1, .5, .2], [1, 0]], [[2, 0.1], [1, -.3, .1]]],
+                 [[[1, -.5, .06], [1, .4]], [[1, -.2], [1, .1, .02]]], dt=dt)
+    f, w = frequency_response(G, zoom=(2., 2.5), samples=777)
+    assert_allclose(w, np.linspace(2., 2.5, 777))
+    assert_allclose(f, frequency_response(G, custom_grid=w)[0])
+    np.random.seed(1)
+    S = State(np.diag([.9, .5, -.3, .2]) + 0.05*np.random.randn(4, 4),
+              np.random.randn(4, 2), np.random.randn(3, 4),
+              np.random.randn(3, 2), dt=dt)
+    f, w = frequency_response(S, zoom=(0.1, 31.), samples=500)
+    assert_allclose(f, frequency_response(S, custom_grid=w)[0])
+    P = FrequencyResponsePlan(S[0, 1])
+    assert_allclose(P.zoom(1., 2., 11), P.evaluate(np.linspace(1., 2., 11)))
+    assert_raises(ValueError, frequency_response, State(-1., 1., 1., 0.),
+                  zoom=(1, 2))
+
+
+def test_frequency_response_zoom_lightly_damped():
+    # Clustered modes with the pole radius 0.995 in a rotated basis; their
+    # characteristic polynomial coefficients do not carry the response
+    np.random.seed(2)
+    n, dt = 24, 0.1
+    blocks = [0.995*np.array([[np.cos(t), -np.sin(t)], [np.sin(t), np.cos(t)]])
+              for t in np.linspace(0.9, 1.1, n//2)]
+    Q, _ = np.linalg.qr(np.random.randn(n, n))
+    A = Q @ block_diag(*blocks) @ Q.T
+    G = State(A, np.random.randn(n, 2), np.random.randn(2, n), dt=dt)
+    w = np.linspace(9., 11., 801)
+    f_ref = np.array([G.c @ np.linalg.solve(np.exp(1j*x*dt)*np.eye(n) - A,
+                                            G.b)
+                      for x in w]).transpose(1, 2, 0)
+    f, _ = frequency_response(G, zoom=(9., 11.), samples=801)
+    assert_allclose(f, f_ref, rtol=0, atol=1e-10*np.abs(f_ref).max())
+
+
+def test_frequency_response_output():
+    np.random.seed(3)
+    n, p, m = 6, 4, 3
+    G = State(np.random.randn(n, n) - 4*np.eye(n), np.random.randn(n, m),
+              np.random.randn(p, n), np.random.randn(p, m))
+    f, w = frequency_response(G)
+    sv = np.linalg.svd(np.moveaxis(f, -1, 0), compute_uv=False).T
+    s, _ = frequency_response(G, output='sv')
+    assert_equal(s.shape, (3, w.size))
+    assert_allclose(s, sv)
+    assert_allclose(frequency_response(G, output='maxsv')[0], sv[0])
+    Gt = State(G.a.T, G.c.T, G.b.T, G.d.T)
+    assert_allclose(frequency_response(Gt, output='maxsv')[0], sv[0])
+    (mag, pha), _ = frequency_response(G, output='magphase')
+    assert_allclose(mag*np.exp(1j*pha), f)
+    plan = FrequencyResponsePlan(G)
+    assert_allclose(frequency_response(plan, output='maxsv')[0], sv[0])
+    # Tiny gains are not lost to the squaring of a Gram matrix
+    assert_allclose(_frequency_response_reduce(f*1e-160, 'maxsv'),
+                    sv[0]*1e-160)
+    g = Transfer([1, 2], [1, 3, 2])
+    assert_allclose(frequency_response(g, output='sv')[0],
+                    np.abs(frequency_response(g)[0])[None, :])
+    assert_raises(ValueError, frequency_response, g, output='real')
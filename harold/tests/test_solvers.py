@@ -24,8 +24,11 @@ THE SOFTWARE.
 import numpy as np
 from numpy.random import rand
 from numpy.testing import assert_almost_equal
-from numpy.testing import assert_raises
-from harold import lyapunov_eq_solver
+from numpy.testing import assert_raises, assert_warns
+from scipy.sparse import diags
+from harold import (lyapunov_eq_solver, lyapunov_lowrank_solver,
+                    lyapunov_cholesky_solver, LyapunovSolver,
+                    sylvester_eq_solver, lyapunov_batch_solver)
 
 
 def test_lyapunov_eq_arguments():
@@ -76,3 +79,145 @@ def test_lyapunov_eq_random_problems():
     X = lyapunov_eq_solver(A, Y, E, form='d')
     Res = A.T @ X @ A - E.T @ X @ E + Y
     assert_almost_equal(Res, np.zeros((n, n)))  # d, generalized
+
+
+def test_lyapunov_eq_large_problems():
+    # Large enough to be solved by the recursive blocked method
+    np.random.seed(1234)
+    n = 75
+    A = rand(n, n) - n/2*np.eye(n)
+    Y = rand(n, n)
+    Y = Y + Y.T
+    E = np.eye(n) + rand(n, n)/n
+    X = lyapunov_eq_solver(A, Y, form='c')
+    Res = A.T @ X + X @ A + Y
+    assert_almost_equal(Res, np.zeros((n, n)))  # c, regular
+    X = lyapunov_eq_solver(A, Y, E, form='c')
+    Res = A.T @ X @ E + E.T @ X @ A + Y
+    assert_almost_equal(Res, np.zeros((n, n)))  # c, generalized
+    A /= n
+    X = lyapunov_eq_solver(A, Y, form='d')
+    Res = A.T @ X @ A - X + Y
+    assert_almost_equal(Res, np.zeros((n, n)))  # d, regular
+    X = lyapunov_eq_solver(A, Y, E, form='d')
+    Res = A.T @ X @ A - E.T @ X @ E + Y
+    assert_almost_equal(Res, np.zeros((n, n)))  # d, generalized
+
+
+def test_lyapunov_lowrank_solver():
+    np.random.seed(1234)
+    n = 60
+    A = rand(n, n) - n*np.eye(n)
+    B = rand(n, 2)
+    Z = lyapunov_lowrank_solver(A, B)
+    X = lyapunov_eq_solver(A, B @ B.T)
+    assert_almost_equal(Z @ Z.T / np.abs(X).max(), X / np.abs(X).max())
+    # Sparse 1D Laplacian
+    n = 500
+    A = diags([np.ones(n-1), -2*np.ones(n), np.ones(n-1)], [-1, 0, 1],
+              format='csc') * (n+1)**2
+    B = np.zeros((n, 1))
+    B[n//3] = 1.
+    Z = lyapunov_lowrank_solver(A, B)
+    assert Z.shape[1] < 50
+    Ad = A.toarray()
+    Res = Ad.T @ Z @ Z.T + Z @ Z.T @ Ad + B @ B.T
+    assert_almost_equal(Res, np.zeros((n, n)))
+    assert_raises(ValueError, lyapunov_lowrank_solver, -A, B)
+    assert_raises(ValueError, lyapunov_lowrank_solver, A, B, shifts=[1.])
+    # A single poor shift can't converge in a few iterations
+    with assert_warns(RuntimeWarning):
+        lyapunov_lowrank_solver(A, B, shifts=[-1.], max_iter=3)
+
+
+def test_lyapunov_cholesky_solver():
+    np.random.seed(1234)
+    n = 40
+    A = rand(n, n) - n*np.eye(n)
+    B = rand(n, 3)
+    U = lyapunov_cholesky_solver(A, B)
+    X = lyapunov_eq_solver(A, B @ B.T)
+    assert_almost_equal(np.tril(U, -1), np.zeros((n, n)))
+    assert_almost_equal(U.T @ U / np.abs(X).max(), X / np.abs(X).max())
+    A /= 2*n
+    U = lyapunov_cholesky_solver(A, B, form='d')
+    X = lyapunov_eq_solver(A, B @ B.T, form='d')
+    assert_almost_equal(U.T @ U / np.abs(X).max(), X / np.abs(X).max())
+    # Singular solution of an uncontrollable pair
+    U = lyapunov_cholesky_solver(-np.eye(2), [[1.], [0.]])
+    assert_almost_equal(U, [[np.sqrt(0.5), 0.], [0., 0.]])
+    assert_raises(ValueError, lyapunov_cholesky_solver, np.eye(2), np.eye(2))
+    assert_raises(ValueError, lyapunov_cholesky_solver, -np.eye(2),
+                  np.eye(3))
+
+
+def test_lyapunov_solver_object():
+    np.random.seed(1234)
+    n = 40
+    A = rand(n, n)
+    E = np.eye(n) + rand(n, n)/n
+    Y = rand(3, n, n)
+    Y = Y + Y.transpose(0, 2, 1)
+    for form in ('c', 'd'):
+        for e in (None, E):
+            solver = LyapunovSolver(A, e, form=form)
+            X = solver.solve(Y)
+            assert X.shape == (3, n, n)
+            for Xk, Yk in zip(X, Y):
+                assert_almost_equal(Xk, lyapunov_eq_solver(A, Yk, e, form))
+            assert_almost_equal(solver.solve(Y[1]), X[1])
+    assert_raises(ValueError, LyapunovSolver, A, form='a')
+    assert_raises(ValueError, LyapunovSolver, A, np.eye(3))
+    assert_raises(ValueError, LyapunovSolver(A).solve, np.eye(3))
+
+
+def test_lyapunov_eq_doubling():
+    np.random.seed(1234)
+    n = 30
+    Y = rand(n, n)
+    Y = Y + Y.T
+    for rho in (0.5, 1.5):
+        A = rand(n, n)
+        A *= rho / np.max(np.abs(np.linalg.eigvals(A)))
+        X = lyapunov_eq_solver(A, Y, form='d', method='doubling')
+        Res = A.T @ X @ A - X + Y
+        assert_almost_equal(Res, np.zeros((n, n)))
+    assert_raises(ValueError, lyapunov_eq_solver, A, Y, method='doubling')
+    assert_raises(ValueError, lyapunov_eq_solver, A, Y, np.eye(n), form='d',
+                  method='doubling')
+    assert_raises(ValueError, lyapunov_eq_solver, A, Y, method='smith')
+
+
+def test_sylvester_eq_solver():
+    np.random.seed(1234)
+    for n, m in ((1, 1), (2, 1), (2, 2), (5, 3), (45, 20)):
+        A = rand(n, n)
+        B = rand(m, m)
+        C = rand(n, m)
+        X = sylvester_eq_solver(A, B, C)
+        assert_almost_equal(A @ X + X @ B, C)
+        A /= 2*np.max(np.abs(np.linalg.eigvals(A)))
+        X = sylvester_eq_solver(A, B, C, form='d')
+        assert_almost_equal(A @ X @ B - X, C)
+    assert_raises(ValueError, sylvester_eq_solver, A, B, C.T)
+    assert_raises(ValueError, sylvester_eq_solver, A, C, C)
+    assert_raises(ValueError, sylvester_eq_solver, A, B, C, form='a')
+
+
+def test_lyapunov_batch_solver():
+    np.random.seed(1234)
+    k, n = 20, 6
+    A = rand(k, n, n) - 3*np.eye(n)
+    Y = rand(k, n, n)
+    Y = Y + Y.transpose(0, 2, 1)
+    # Defective A is recomputed with the Schur method
+    A[3] = np.eye(n) * -2 + np.diag(np.ones(n-1), 1)
+    for form in ('c', 'd'):
+        Af = A if form == 'c' else A/4
+        X = lyapunov_batch_solver(Af, Y, form=form)
+        for Ak, Xk, Yk in zip(Af, X, Y):
+            assert_almost_equal(Xk, lyapunov_eq_solver(Ak, Yk, form=form))
+    X = lyapunov_batch_solver(A, np.eye(n))
+    assert_almost_equal(X[1], lyapunov_eq_solver(A[1], np.eye(n)))
+    assert_raises(ValueError, lyapunov_batch_solver, A[0], Y[0])
+    assert_raises(ValueError, lyapunov_batch_solver, A, Y[:3])
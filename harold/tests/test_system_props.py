@@ -0,0 +1,243 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2016 Ilhan Polat
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import warnings
+import numpy as np
+import scipy.sparse as sp
+from harold import (State, Transfer, system_norm, system_norm_batch,
+                    hankel_singular_values, frequency_response,
+                    dominant_poles, transfer_to_state)
+from harold._system_props import _hamiltonian_eigvals
+from scipy.linalg import (eigvals, solve_continuous_lyapunov,
+                          solve_discrete_lyapunov)
+from numpy.testing import (assert_allclose, assert_raises, assert_,
+                           assert_warns)
+
+
+def test_system_norm_hinf_siso():
+    # Resonance peak 1/(2*zeta*sqrt(1-zeta**2)*wn**2) with wn=2, zeta=0.1
+    G = Transfer(1, [1, 0.4, 4])
+    peak = 1/(0.8*np.sqrt(0.99))
+    for method in ('bbbs', 'hamiltonian', 'implicit'):
+        assert_allclose(system_norm(G, hinf_method=method), peak)
+    assert_allclose(system_norm(State(3.)), 3.)
+    assert_raises(ValueError, system_norm, G, hinf_method='grid')
+
+
+def test_system_norm_hinf_mimo():
+    np.random.seed(1234)
+    n, p, m = 20, 3, 2
+    A = np.random.randn(n, n)
+    A -= (np.max(np.linalg.eigvals(A).real) + 0.1)*np.eye(n)
+    G = State(A, np.random.randn(n, m), np.random.randn(p, n),
+              np.random.randn(p, m))
+    w = np.r_[0, np.logspace(-3, 3, 5000)]
+    grid_peak = frequency_response(G, custom_grid=w, output='maxsv')[0].max()
+    norms = [system_norm(G, hinf_method=x)
+             for x in ('bbbs', 'hamiltonian', 'implicit')]
+    assert_allclose(norms, norms[0], rtol=1e-8)
+    assert_(norms[0] >= grid_peak*(1 - 1e-10))
+
+
+def test_hamiltonian_eigvals():
+    np.random.seed(4321)
+    n = 6
+    A, G, Q = np.random.randn(3, n, n)
+    H = np.block([[A, G + G.T], [Q + Q.T, -A.T]])
+    e, e_d = _hamiltonian_eigvals(H), eigvals(H)
+    assert_allclose(np.min(np.abs(e[:, None] - e_d[None, :]), axis=1), 0.,
+                    atol=1e-8)
+    assert_allclose(np.min(np.abs(e_d[:, None] - e[None, :]), axis=1), 0.,
+                    atol=1e-8)
+
+
+def test_system_norm_hinf_warm_start():
+    G = Transfer(1, [1, 0.4, 4])
+    peak, w_peak = 1/(0.8*np.sqrt(0.99)), np.sqrt(4 - 2*0.04)
+    gam, w = system_norm(G, return_frequency=True)
+    assert_allclose([gam, w], [peak, w_peak], rtol=1e-7)
+    # A very sharp peak in between the grid points
+    G = Transfer(1, [1, 1e-6, 4])
+    for method in ('bbbs', 'implicit'):
+        gam = system_norm(G, hinf_method=method, warm_start=w)
+        assert_allclose(gam, 1/(2e-6*np.sqrt(1 - 6.25e-14)), rtol=1e-7)
+
+
+def test_system_norm_hinf_discrete():
+    G = Transfer(1, [1, -0.5], dt=1)
+    for method in ('bbbs', 'hamiltonian', 'implicit'):
+        assert_allclose(system_norm(G, hinf_method=method), 2.)
+    # Resonance at 0.6 rad/sample on a 0.1 sec grid
+    r, th, dt = 0.995, 0.6, 0.1
+    G = State([[2*r*np.cos(th), -r**2], [1, 0]], [[1], [0]], [[0, 1]], 0.5,
+              dt=dt)
+    w = np.linspace(0, np.pi/dt, 100001)
+    grid_peak = frequency_response(G, custom_grid=w, output='maxsv')[0].max()
+    for method in ('bbbs', 'hamiltonian', 'implicit'):
+        gam, w_p = system_norm(G, hinf_method=method, return_frequency=True)
+        assert_(gam >= grid_peak*(1 - 1e-10))
+        assert_allclose(gam, np.abs(frequency_response(
+                                    G, custom_grid=[w_p])[0][0]), rtol=1e-8)
+        assert_allclose(w_p*dt, th, rtol=1e-2)
+
+
+def test_system_norm_batch():
+    np.random.seed(2468)
+    models = []
+    for x in range(6):
+        A = np.random.randn(8, 8)
+        A -= (np.max(np.linalg.eigvals(A).real) + 0.5)*np.eye(8)
+        models.append(State(A, np.random.randn(8, 2), np.random.randn(2, 8)))
+    models += [State(1., 1., 1., 0.), models[0], Transfer(1, [1, 0.4, 4]),
+               'not a model']
+    for p in (2, np.inf):
+        ref = [system_norm(G, p=p) for G in models[:-1]]
+        for executor in ('process', 'thread', None):
+            norms, errors = system_norm_batch(models, p=p, workers=2,
+                                              executor=executor)
+            assert_allclose(norms[:-1], ref, rtol=1e-8)
+            assert_(norms[-1] is None)
+            assert_(list(errors) == [9])
+            assert_(isinstance(errors[9], TypeError))
+    assert_raises(ValueError, system_norm_batch, models, executor='mpi')
+
+
+def test_hankel_singular_values_and_h2():
+    np.random.seed(4321)
+    n, p, m = 6, 3, 2
+    A = np.random.randn(n, n)
+    A -= (np.max(eigvals(A).real) + 0.5)*np.eye(n)
+    B, C = np.random.randn(n, m), np.random.randn(p, n)
+    P = solve_continuous_lyapunov(A, -B @ B.T)
+    Q = solve_continuous_lyapunov(A.T, -C.T @ C)
+    hsv = np.sqrt(np.sort(eigvals(P @ Q).real)[::-1])
+    G = State(A, B, C)
+    assert_allclose(hankel_singular_values(G), hsv)
+    assert_allclose(system_norm(G, p=2), np.sqrt(np.trace(C @ P @ C.T)))
+
+    Ad = A / (1.1*np.max(np.abs(eigvals(A))))
+    D = np.random.randn(p, m)
+    P = solve_discrete_lyapunov(Ad, B @ B.T)
+    Q = solve_discrete_lyapunov(Ad.T, C.T @ C)
+    hsv = np.sqrt(np.sort(eigvals(P @ Q).real)[::-1])
+    G = State(Ad, B, C, D, dt=0.1)
+    assert_allclose(hankel_singular_values(G), hsv)
+    assert_allclose(system_norm(G, p=2),
+                    np.sqrt(np.trace(C @ P @ C.T + D @ D.T)))
+
+    # First order lag 1/(s+1) has the single Hankel singular value 1/2
+    assert_allclose(hankel_singular_values(Transfer(1, [1, 1])), [0.5])
+    assert_raises(ValueError, hankel_singular_values, Transfer(1, [1, -1]))
+
+
+def test_system_norm_l1():
+    # Nonnegative impulse responses have the DC gain as the L1 norm
+    assert_allclose(system_norm(Transfer(1, [1, 3, 2]), p=1), 0.5, rtol=1e-5)
+    # |exp(-at)sin(bt)| integrates to b/(a^2+b^2) coth(a pi/(2b))
+    a, b = 0.5, 3.
+    G = Transfer(b, [1, 2*a, a**2 + b**2])
+    assert_allclose(system_norm(G, p=1),
+                    b/(a**2 + b**2)/np.tanh(a*np.pi/(2*b)), rtol=1e-5)
+    # Feedthrough enters the row sums of MIMO models
+    G = State(-np.eye(2), np.eye(2), [[1, 1]], [[1, -1]])
+    assert_allclose(system_norm(G, p=1), 4., rtol=1e-5)
+    assert_(np.isinf(system_norm(Transfer(1, [1, -1]), p=1)))
+    # Discrete-time responses are summed
+    assert_allclose(system_norm(Transfer(1, [1, 0.5], dt=0.1), p=1), 2.)
+    assert_allclose(system_norm(Transfer([1, 2, 3], [1, 0, 0], dt=0.1),
+                                p=1), 6.)
+
+
+def test_l1_norm_step_limit_warns():
+    from harold._system_props import _l1_norm
+    # Lightly damped fast mode: the horizon does not fit into the steps
+    G = transfer_to_state(Transfer(1, [1, 2e-3, 1e4]))
+    assert_warns(RuntimeWarning, _l1_norm, G, max_steps=2**10)
+    # Slowly decaying discrete mode is cut by max_steps
+    G = transfer_to_state(Transfer(1, [1, -0.999], dt=0.1))
+    assert_warns(RuntimeWarning, _l1_norm, G, max_steps=2**8)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', RuntimeWarning)
+        _l1_norm(transfer_to_state(Transfer(1, [1, 3, 2])))
+
+
+def test_system_norm_h2_lowrank():
+    np.random.seed(2345)
+    n = 30
+    A = np.random.randn(n, n)
+    A -= (np.max(eigvals(A).real) + 0.5)*np.eye(n)
+    for p, m in ((3, 1), (1, 3)):
+        G = State(A, np.random.randn(n, m), np.random.randn(p, n))
+        assert_allclose(system_norm(G, p=2, h2_method='lowrank'),
+                        system_norm(G, p=2, h2_method='dense'))
+    G = State(A/(2*np.max(np.abs(eigvals(A)))), np.ones((n, 1)),
+              np.ones((1, n)), dt=0.1)
+    assert_raises(ValueError, system_norm, G, p=2, h2_method='lowrank')
+    assert_raises(ValueError, system_norm, G, p=2, h2_method='svd')
+    # Stiff sparse 1D heat equation
+    n = 1000
+    L = sp.diags([1., -2., 1.], [-1, 0, 1], shape=(n, n)) * (n+1)**2
+    B, C = np.ones((n, 1)), np.ones((1, n))
+    H = State(L, B, C)
+    assert_(H._isstable)
+    # The Lyapunov equation is diagonal in the eigenvectors of symmetric A
+    lam, V = np.linalg.eigh(L.toarray())
+    cb = (C @ V).T * (V.T @ B)
+    h2 = np.sqrt(np.sum((cb @ cb.T) / -(lam[:, None] + lam[None, :])))
+    assert_allclose(system_norm(H, 2), h2, rtol=1e-6)
+
+
+def test_dominant_poles():
+    np.random.seed(1234)
+    n = 40
+    A = np.random.randn(n, n)/np.sqrt(n) - 2*np.eye(n)
+    G = State(A, np.ones((n, 1)), np.ones((1, n)))
+    ev = eigvals(A)
+    # The conjugate pairs can come in any order
+    p, e = dominant_poles(G, 3), ev[np.argsort(-ev.real)][:3]
+    assert_allclose(p.real, e.real)
+    assert_allclose(np.abs(p.imag), np.abs(e.imag))
+    s = -2 + 0.5j
+    assert_allclose(dominant_poles(G, 2, sigma=s),
+                    ev[np.argsort(np.abs(ev - s))][:2])
+    G = State(A, np.ones((n, 1)), np.ones((1, n)), dt=0.1)
+    assert_allclose(np.abs(dominant_poles(G, 2)),
+                    np.sort(np.abs(ev))[::-1][:2])
+    assert_allclose(dominant_poles(Transfer(1, [1, 3, 2]), 1), [-1])
+    assert_raises(ValueError, dominant_poles, G, 0)
+    # Stiff sparse model, the slowest modes of a 1D heat equation are the
+    # ones closest to the origin and found via the Cayley transform
+    n = 1000
+    L = sp.diags([1., -2., 1.], [-1, 0, 1], shape=(n, n)) * (n+1)**2
+    H = State(L, np.ones((n, 1)), np.ones((1, n)))
+    assert_(H._isstable)
+    assert_allclose(dominant_poles(H, 2), -(np.pi*np.arange(1, 3))**2,
+                    rtol=1e-3)
+    assert_allclose(dominant_poles(H, 2, sigma=0.),
+                    -(np.pi*np.arange(1, 3))**2, rtol=1e-3)
+    # Uniformly damped oscillators are not resolved
+    L = sp.diags([1., -2., 1.], [-1, 0, 1], shape=(100, 100))
+    A = sp.bmat([[None, sp.eye(100)], [L, -0.01*sp.eye(100)]])
+    with assert_warns(RuntimeWarning):
+        H = State(A, np.eye(200, 1), np.eye(1, 200))
+    assert_raises(ValueError, dominant_poles, H, 2)